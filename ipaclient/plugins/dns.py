@@ -32,7 +32,7 @@ from ipalib.dns import (get_record_rrtype,
                         part_name_format,
                         record_name_format)
 from ipalib.frontend import Command
-from ipalib.parameters import Bool, Str
+from ipalib.parameters import Bool, File, Str
 from ipalib.plugable import Registry
 from ipalib import _, ngettext
 from ipalib import util
@@ -130,6 +130,15 @@ class dnszone_mod(DNSZoneMethodOverride):
     pass
 
 
+@register(override=True, no_fail=True)
+class dnszone_import(MethodOverride):
+    def get_options(self):
+        for option in super(dnszone_import, self).get_options():
+            if option.name == 'file':
+                option = option.clone_retype(option.name, File)
+            yield option
+
+
 # Support old servers without dnsrecord_split_parts
 # Do not add anything new here!
 @register(no_fail=True)
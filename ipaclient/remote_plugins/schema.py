@@ -6,11 +6,13 @@ from collections.abc import Mapping, Sequence
 import errno
 import json
 import logging
+import mmap
 import os
+import struct
 import sys
 import tempfile
 import types
-import zipfile
+import zlib
 
 from cryptography import x509 as crypto_x509
 
@@ -30,7 +32,14 @@ from ipapython.dnsutil import DNSName
 
 logger = logging.getLogger(__name__)
 
-FORMAT = '1'
+FORMAT = '2'
+
+# Schema file starts with a header (magic, length of the index) followed by
+# a JSON index and zlib compressed JSON members. The index maps every member
+# to its offset and length relative to the end of the index and contains the
+# help, so that only the members actually used have to be read and decoded.
+_MAGIC = b'IPASCHM2'
+_HEADER = struct.Struct('<8sQ')
 
 if six.PY3:
     unicode = str
@@ -373,6 +382,7 @@ class Schema:
         self._dict = {}
         self._namespaces = {}
         self._help = None
+        self._data = None
 
         for ns in self.namespaces:
             self._dict[ns] = {}
@@ -437,16 +447,32 @@ class Schema:
         return (fp, ttl,)
 
     def _read_schema(self, fingerprint):
-        # It's more efficient to read zip file members at once than to open
-        # the zip file a couple of times, see #6690.
+        # Only the index is read here, members are decompressed from the
+        # memory mapped file when they are first accessed.
         filename = os.path.join(self._DIR, fingerprint)
-        with zipfile.ZipFile(filename, 'r') as schema:
-            for name in schema.namelist():
-                ns, _slash, key = name.partition('/')
-                if ns in self.namespaces:
-                    self._dict[ns][key] = schema.read(name)
-                elif name == '_help':
-                    self._help = schema.read(name)
+        with open(filename, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, index_length = _HEADER.unpack_from(data)
+            if magic != _MAGIC:
+                raise ValueError("unknown schema file format")
+            start = _HEADER.size + index_length
+            index = json.loads(data[_HEADER.size:start].decode('utf-8'))
+
+            for ns in self.namespaces:
+                self._dict[ns] = {
+                    key: (start + offset, length)
+                    for key, (offset, length) in index['members'][ns].items()
+                }
+            for key, value in index['values'].items():
+                self._dict[key] = value
+            self._help = index['help']
+        except Exception:
+            data.close()
+            raise
+
+        self._data = data
 
     def __getitem__(self, key):
         try:
@@ -495,27 +521,41 @@ class Schema:
                 os.rename(f.name, os.path.join(self._DIR, fingerprint))
 
     def _write_schema_data(self, fileobj):
-        with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED) as schema:
-            for key, value in self._dict.items():
-                if key in self.namespaces:
-                    ns = value
-                    for member in ns:
-                        path = '{}/{}'.format(key, member)
-                        s = json.dumps(ns[member], default=json_default)
-                        schema.writestr(path, s.encode('utf-8'))
-                else:
-                    schema.writestr(key, json.dumps(value).encode('utf-8'))
-
-            schema.writestr(
-                '_help',
-                json.dumps(self._help, default=json_default).encode('utf-8')
-            )
+        members = {}
+        values = {}
+        chunks = []
+        offset = 0
+        for key, value in self._dict.items():
+            if key not in self.namespaces:
+                values[key] = value
+                continue
+            members[key] = {}
+            for member in value:
+                chunk = zlib.compress(
+                    json.dumps(value[member], default=json_default).encode(
+                        'utf-8'))
+                members[key][member] = (offset, len(chunk))
+                chunks.append(chunk)
+                offset += len(chunk)
+
+        index = json.dumps(
+            dict(members=members, values=values, help=self._help),
+            default=json_default
+        ).encode('utf-8')
+
+        fileobj.write(_HEADER.pack(_MAGIC, len(index)))
+        fileobj.write(index)
+        for chunk in chunks:
+            fileobj.write(chunk)
 
     def read_namespace_member(self, namespace, member):
         value = self._dict[namespace][member]
 
-        if isinstance(value, bytes):
-            value = json.loads(value.decode('utf-8'))
+        if isinstance(value, tuple):
+            offset, length = value
+            value = json.loads(
+                zlib.decompress(self._data[offset:offset + length]).decode(
+                    'utf-8'))
             self._dict[namespace][member] = value
 
         return value
@@ -524,14 +564,32 @@ class Schema:
         return iter(self._dict[namespace])
 
     def get_help(self, namespace, member):
-        if isinstance(self._help, bytes):
-            self._help = json.loads(
-                self._help.decode('utf-8')
-            )
-
         return self._help[namespace][member]
 
 
+class _SchemaTopicModule(types.ModuleType):
+    """
+    Topic module which reads its docstring from schema on first access
+    """
+    def __init__(self, name, schema=None, full_name=None):
+        super(_SchemaTopicModule, self).__init__(name)
+        self._schema = schema
+        self._full_name = full_name
+
+    @property
+    def __doc__(self):
+        if self._schema is not None:
+            topic = self._schema['topics'][self._full_name]
+            self.__dict__['_doc'] = topic.get('doc')
+            self._schema = None
+        return self.__dict__.get('_doc')
+
+    @__doc__.setter
+    def __doc__(self, value):
+        self.__dict__['_doc'] = value
+        self._schema = None
+
+
 def get_package(server_info, client):
     NO_FINGERPRINT = object()
 
@@ -588,15 +646,19 @@ def get_package(server_info, client):
             plugin = module.register()(plugin)
     sys.modules[module_name] = module
 
-    for full_name, topic in six.iteritems(schema['topics']):
+    # topic docs are read only when the help of a topic is displayed
+    for full_name in schema['topics']:
+        topic = schema['topics'].get_help(full_name)
         name = str(topic['name'])
         module_name = '.'.join((package_name, name))
         try:
             module = sys.modules[module_name]
         except KeyError:
-            module = sys.modules[module_name] = types.ModuleType(module_name)
+            module = sys.modules[module_name] = _SchemaTopicModule(
+                module_name, schema, full_name)
             module.__file__ = os.path.join(package_dir, '{}.py'.format(name))
-        module.__doc__ = topic.get('doc')
+        else:
+            module.__doc__ = schema['topics'][full_name].get('doc')
         if 'topic_topic' in topic:
             s = topic['topic_topic']
             if isinstance(s, bytes):
@@ -167,10 +167,24 @@ DEFAULT_CONFIG = (
     # ('ldap_uri', 'ldap://localhost:389'),
 
     ('rpc_protocol', 'jsonrpc'),
+    # Ask the server to stream large JSON-RPC results
+    ('jsonrpc_stream', False),
 
     ('ldap_cache', True),
     ('ldap_cache_size', 100),
     ('ldap_cache_debug', False),
+    # Process-wide LDAP entry cache shared between requests
+    ('ldap_shared_cache', False),
+    ('ldap_shared_cache_size', 1000),
+    ('ldap_shared_cache_ttl', 30),
+    ('ldap_shared_cache_psearch', False),
+    # Reuse GSSAPI bound LDAP connections of a principal between requests
+    ('ldap_connection_reuse', False),
+    ('ldap_connection_pool_size', 10),
+    ('ldap_connection_idle_timeout', 60),
+
+    # Maximum number of threads executing a parallel batch
+    ('batch_max_workers', 4),
 
     # Define an inclusive range of SSL/TLS version support
     ('tls_version_min', TLS_VERSION_DEFAULT_MIN),
@@ -213,6 +227,10 @@ DEFAULT_CONFIG = (
     # For the following ports, None means a default specific to the installed
     # Dogtag version.
     ('ca_install_port', None),
+    # Keep-alive connections to the CA kept per process and their idle
+    # timeout in seconds
+    ('ca_connection_pool_size', 4),
+    ('ca_connection_idle_timeout', 15),
 
     # Topology plugin
     ('recommended_max_agmts', 4),  # Recommended maximum number of replication
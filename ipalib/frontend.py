@@ -37,6 +37,7 @@ from ipalib.errors import (ZeroArgumentError, MaxArgumentError, OverlapError,
     VersionError, OptionError,
     ValidationError, ConversionError)
 from ipalib import errors, messages
+from ipalib.metrics import CommandTimer
 from ipalib.request import context, context_frame
 from ipalib.util import classproperty, classobjectproperty, json_serialize
 
@@ -414,6 +415,9 @@ class Command(HasParam):
     obj = None
 
     use_output_validation = True
+    # the command has no side effects, batch may execute it concurrently
+    # with other read-only commands
+    read_only = False
     output = Plugin.finalize_attr('output')
     has_output = ('result',)
     output_params = Plugin.finalize_attr('output_params')
@@ -466,11 +470,13 @@ class Command(HasParam):
         XML-RPC and the executed an the nearest IPA server.
         """
         self.ensure_finalized()
-        with context_frame():
+        with context_frame(), CommandTimer(self.name) as timer:
             self.context.principal = getattr(context, 'principal', None)
+            self.context.timer = timer
             return self.__do_call(*args, **options)
 
     def __do_call(self, *args, **options):
+        timer = self.context.timer
         self.context.__messages = []
         if 'version' in options:
             self.verify_client_version(unicode(options['version']))
@@ -488,15 +494,20 @@ class Command(HasParam):
         )
         if self.api.env.in_server:
             params.update(self.get_default(**params))
+        timer.phase('args')
         params = self.normalize(**params)
+        timer.phase('normalize')
         params = self.convert(**params)
+        timer.phase('convert')
         logger.debug(
             '%s(%s)', self.name, ', '.join(self._repr_iter(**params))
         )
         if self.api.env.in_server:
             self.validate(**params)
         (args, options) = self.params_2_args_options(**params)
+        timer.phase('validate')
         ret = self.run(*args, **options)
+        timer.phase('execute')
         if isinstance(ret, dict):
             for message in self.context.__messages:
                 messages.add_message(options['version'], ret, message)
@@ -508,6 +519,7 @@ class Command(HasParam):
             ret['summary'] = self.get_summary_default(ret)
         if self.use_output_validation and (self.output or ret is not None):
             self.validate_output(ret, options['version'])
+        timer.phase('validate_output')
         return ret
 
     def add_message(self, message):
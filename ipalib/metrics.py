@@ -0,0 +1,167 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Per-process command metrics
+
+Every command call is timed by phase (parameter parsing, normalization,
+conversion, validation, execution and output validation) and the LDAP
+operations, LDAP cache lookups, Dogtag requests and Dogtag connection pool
+events it causes are counted.
+The numbers are aggregated per command in the process which executes
+the commands, e.g. an httpd worker on the server.
+"""
+
+import bisect
+import collections
+import threading
+import time
+
+from ipalib.request import context
+
+# upper bounds of the latency histogram buckets in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+           2.5, 5.0, 10.0)
+
+PHASES = ('args', 'normalize', 'convert', 'validate', 'execute',
+          'validate_output')
+
+OPERATIONS = ('ldap_operations', 'ldap_cache_hits', 'ldap_cache_misses',
+              'dogtag_requests', 'dogtag_connections_created',
+              'dogtag_connections_reused', 'dogtag_connections_discarded',
+              'dogtag_retries')
+
+
+def count_operation(name, value=1):
+    """Count an operation done for the command which is being executed
+
+    Does nothing outside of a command call.
+    """
+    operations = getattr(context, 'metrics_operations', None)
+    if operations is not None:
+        operations[name] += value
+
+
+class _CommandMetrics:
+    __slots__ = ('calls', 'errors', 'phases', 'buckets', 'total', 'max',
+                 'operations')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.phases = collections.Counter()
+        # the last bucket counts calls slower than BUCKETS[-1]
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+        self.operations = collections.Counter()
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket containing the given percentile"""
+        rank = fraction * self.calls
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    """Thread-safe aggregation of command metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._commands = {}
+        self.since = time.time()
+
+    def record(self, command, phases, total, operations, error=False):
+        with self._lock:
+            try:
+                metrics = self._commands[command]
+            except KeyError:
+                metrics = self._commands[command] = _CommandMetrics()
+            metrics.calls += 1
+            if error:
+                metrics.errors += 1
+            for phase, duration in phases:
+                metrics.phases[phase] += duration
+            metrics.buckets[bisect.bisect_left(BUCKETS, total)] += 1
+            metrics.total += total
+            metrics.max = max(metrics.max, total)
+            metrics.operations.update(operations)
+
+    def reset(self):
+        with self._lock:
+            self._commands.clear()
+            self.since = time.time()
+
+    def stats(self):
+        """Return a list of per-command statistics, slowest first
+
+        Times are in milliseconds, phase times are means per call.
+        """
+        def ms(seconds):
+            return round(seconds * 1000, 3)
+
+        result = []
+        with self._lock:
+            for command, metrics in self._commands.items():
+                calls = metrics.calls
+                entry = dict(
+                    command=command,
+                    calls=calls,
+                    errors=metrics.errors,
+                    time_total=ms(metrics.total),
+                    time_mean=ms(metrics.total / calls),
+                    time_p95=ms(metrics.percentile(0.95)),
+                    time_max=ms(metrics.max),
+                    buckets=list(metrics.buckets),
+                )
+                for phase in PHASES:
+                    entry['time_%s' % phase] = ms(
+                        metrics.phases[phase] / calls)
+                for name in OPERATIONS:
+                    entry[name] = metrics.operations[name]
+                result.append(entry)
+        result.sort(key=lambda e: e['time_total'], reverse=True)
+        return result
+
+
+metrics = Metrics()
+
+
+class CommandTimer:
+    """Measure a command call and record it in `metrics` when done
+
+    Operations counted with count_operation() during a nested command call
+    are counted for the outer command as well.
+    """
+    __slots__ = ('command', 'phases', 'operations', '_outer', '_start',
+                 '_last')
+
+    def __init__(self, command):
+        self.command = command
+        self.phases = []
+        self.operations = collections.Counter()
+
+    def __enter__(self):
+        self._outer = getattr(context, 'metrics_operations', None)
+        context.metrics_operations = self.operations
+        self._start = self._last = time.perf_counter()
+        return self
+
+    def phase(self, name):
+        """End the phase name, the next phase starts now"""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        total = time.perf_counter() - self._start
+        context.metrics_operations = self._outer
+        if self._outer is not None:
+            self._outer.update(self.operations)
+        metrics.record(self.command, self.phases, total, self.operations,
+                       error=exc_type is not None)
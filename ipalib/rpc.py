@@ -449,6 +449,109 @@ def json_decode_binary(val):
     return json.loads(val, object_hook=_ipa_obj_hook)
 
 
+JSON_STREAM_CONTENT_TYPE = 'application/x-ndjson'
+
+
+def json_encode_stream(response, version, chunk_size=64 * 1024):
+    """Serialize a JSON-RPC response with a list of entries incrementally
+
+    The list of entries in response['result']['result'] is sent as newline
+    delimited JSON: the first line is the response without the entries and
+    with their number in the 'stream' member, every following line is one
+    entry. Entries are encoded one by one and removed from the list once
+    encoded, so neither a primed copy nor the JSON text of the whole result
+    is ever held in memory.
+
+    :param dict response: JSON-RPC response
+    :param str version: client version
+    :param int chunk_size: approximate size of the yielded chunks
+    :return: generator of UTF-8 encoded chunks
+    :see: JSONStreamParser
+    """
+    primer = _JSONPrimer(version)
+    entries = response['result']['result']
+    header = dict(response, stream=len(entries))
+    header['result'] = dict(response['result'], result=None)
+
+    lines = [json.dumps(primer.convert(header)) + '\n']
+    size = len(lines[0])
+    for i, entry in enumerate(entries):
+        line = json.dumps(primer.convert(entry)) + '\n'
+        entries[i] = None
+        lines.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+            size = 0
+    if lines:
+        yield ''.join(lines).encode('utf-8')
+
+
+class JSONStreamParser:
+    """Incremental parser of responses serialized by json_encode_stream()
+
+    Every line is decoded as soon as it has been received, so only the
+    decoded entries and one line of JSON text are held in memory.
+    close() returns the decoded response.
+    """
+    def __init__(self):
+        self._pending = []
+        self._response = None
+        self._entries = []
+        self._closed = False
+
+    def feed(self, data):
+        start = 0
+        while True:
+            end = data.find(b'\n', start)
+            if end < 0:
+                break
+            self._pending.append(data[start:end])
+            line = b''.join(self._pending)
+            self._pending = []
+            if line:
+                self._parse_line(line)
+            start = end + 1
+        if start < len(data):
+            self._pending.append(data[start:])
+
+    def _parse_line(self, line):
+        try:
+            value = json_decode_binary(line)
+        except ValueError as e:
+            raise JSONError(error=str(e))
+        if self._response is None:
+            self._response = value
+        else:
+            self._entries.append(value)
+
+    def close(self):
+        # xmlrpc.client.Transport.parse_response() closes the parser and
+        # then the unmarshaller, which is the same object
+        if self._closed:
+            return self._response
+        if self._pending:
+            line = b''.join(self._pending)
+            self._pending = []
+            self._parse_line(line)
+
+        response = self._response
+        if response is None:
+            raise JSONError(error=_('Empty response'))
+        count = response.pop('stream', 0)
+        if len(self._entries) != count:
+            raise JSONError(
+                error=_('Incomplete response: received %(received)d of '
+                        '%(count)d entries') % dict(
+                            received=len(self._entries), count=count))
+        if response.get('result') is not None:
+            # lists are decoded as tuples, see _ipa_obj_hook
+            response['result']['result'] = tuple(self._entries)
+        self._closed = True
+        return response
+
+
 def decode_fault(e, encoding='UTF-8'):
     assert isinstance(e, Fault)
     if isinstance(e.faultString, bytes):
@@ -502,17 +605,33 @@ class MultiProtocolTransport(Transport):
     def __init__(self, *args, **kwargs):
         Transport.__init__(self)
         self.protocol = kwargs.get('protocol', None)
+        self.stream = kwargs.get('stream', False) and self.protocol == 'json'
+        self._streamed_response = False
 
     def getparser(self):
-        if self.protocol == 'json':
+        if self._streamed_response:
+            parser = JSONStreamParser()
+            return parser, parser
+        elif self.protocol == 'json':
             parser = DummyParser()
             return parser, parser
         else:
             return Transport.getparser(self)
 
+    def parse_response(self, response):
+        content_type = response.getheader('Content-Type', '')
+        self._streamed_response = (
+            self.stream and content_type.startswith(JSON_STREAM_CONTENT_TYPE)
+        )
+        return Transport.parse_response(self, response)
+
     def send_content(self, connection, request_body):
         if self.protocol == 'json':
             connection.putheader("Content-Type", "application/json")
+            if self.stream:
+                connection.putheader(
+                    "Accept",
+                    "%s, application/json" % JSON_STREAM_CONTENT_TYPE)
         else:
             connection.putheader("Content-Type", "text/xml")
 
@@ -1049,7 +1168,8 @@ class RPCClient(Connectible):
                 else:
                     transport_class = LanguageAwareTransport
                 proxy_kw['transport'] = transport_class(
-                    protocol=self.protocol, service='HTTP', ccache=ccache)
+                    protocol=self.protocol, service='HTTP', ccache=ccache,
+                    stream=self.api.env.jsonrpc_stream)
                 logger.debug('trying %s', url)
                 setattr(context, 'request_url', url)
                 serverproxy = self.server_proxy_class(url, **proxy_kw)
@@ -1243,16 +1363,24 @@ class JSONServerProxy:
             verbose=self.__verbose >= 3,
         )
 
-        if print_json:
-            logger.info(
-                'Response: %s',
-                json.dumps(json.loads(response), sort_keys=True, indent=4)
-            )
+        if isinstance(response, dict):
+            # streamed response, already decoded by JSONStreamParser
+            if print_json:
+                logger.info(
+                    'Response: %s',
+                    json_encode_binary(response, version, pretty_print=True)
+                )
+        else:
+            if print_json:
+                logger.info(
+                    'Response: %s',
+                    json.dumps(json.loads(response), sort_keys=True, indent=4)
+                )
 
-        try:
-            response = json_decode_binary(response)
-        except ValueError as e:
-            raise JSONError(error=str(e))
+            try:
+                response = json_decode_binary(response)
+            except ValueError as e:
+                raise JSONError(error=str(e))
 
         error = response.get('error')
         if error:
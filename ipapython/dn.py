@@ -544,6 +544,24 @@ def rdn_key(rdn):
     return (len(rdn),) + tuple(ava_key(k) for k in rdn)
 
 
+@functools.lru_cache(maxsize=8192)
+def _str2rdns(value):
+    """
+    Parse a DN string into a list of RDNs with sorted AVAs.
+
+    Results are cached because the same DN strings, e.g. member values of
+    large groups, are parsed over and over again. The returned RDNs are
+    shared and must not be modified.
+    """
+    try:
+        rdns = str2dn(val_encode(value))
+    except DECODING_ERROR:
+        raise ValueError("malformed RDN string = \"%s\"" % value)
+    for rdn in rdns:
+        sort_avas(rdn)
+    return rdns
+
+
 if six.PY2:
     # Python 2: Input/output is unicode; we store UTF-8 bytes
     def val_encode(s):
@@ -1109,9 +1127,29 @@ class DN:
     AVA_type = AVA
     RDN_type = RDN
 
+    # DN objects are immutable, the normalized RDNs and the hash are
+    # computed once on first use
+    _rdn_keys = None
+    _hash = None
+
     def __init__(self, *args, **kwds):
         self.rdns = self._rdns_from_sequence(args)
 
+    def _get_rdn_keys(self):
+        keys = self._rdn_keys
+        if keys is None:
+            keys = tuple(rdn_key(rdn) for rdn in self.rdns)
+            self._rdn_keys = keys
+        return keys
+
+    def __getstate__(self):
+        # the cached hash depends on the per-process string hash seed, it
+        # must not travel with a pickled DN
+        state = self.__dict__.copy()
+        state.pop('_hash', None)
+        state.pop('_rdn_keys', None)
+        return state
+
     def _copy_rdns(self, rdns=None):
         if not rdns:
             rdns = self.rdns
@@ -1119,14 +1157,7 @@ class DN:
 
     def _rdns_from_value(self, value):
         if isinstance(value, str):
-            try:
-                if isinstance(value, str):
-                    value = val_encode(value)
-                rdns = str2dn(value)
-            except DECODING_ERROR:
-                raise ValueError("malformed RDN string = \"%s\"" % value)
-            for rdn in rdns:
-                sort_avas(rdn)
+            rdns = _str2rdns(value)
         elif isinstance(value, DN):
             rdns = value._copy_rdns()
         elif isinstance(value, (tuple, list, AVA)):
@@ -1192,6 +1223,8 @@ class DN:
             cls = self.__class__
             new_dn = cls.__new__(cls)
             new_dn.rdns = self.rdns[key]
+            if self._rdn_keys is not None:
+                new_dn._rdn_keys = self._rdn_keys[key]
             return new_dn
         elif isinstance(key, str):
             for rdn in self.rdns:
@@ -1204,19 +1237,16 @@ class DN:
                                 (key.__class__.__name__))
 
     def __hash__(self):
-        # Hash is computed from DN's string representation.
+        # Hash is computed from the normalized RDNs.
         #
         # Because attrs & values are comparison case-insensitive the
         # hash value between two objects which compare as equal but
         # differ in case must yield the same hash value.
-
-        str_dn = ';,'.join([
-            '++'.join([
-                '=='.join((atype, avalue or ''))
-                for atype, avalue, _dummy in rdn
-            ]) for rdn in self.rdns
-        ])
-        return hash(str_dn.lower())
+        value = self._hash
+        if value is None:
+            value = hash(self._get_rdn_keys())
+            self._hash = value
+        return value
 
     def __eq__(self, other):
         # Try coercing to DN, if successful compare to coerced object
@@ -1231,11 +1261,16 @@ class DN:
         if not isinstance(other, DN):
             return False
 
-        if len(self) != len(other):
+        if self is other:
+            return True
+        if len(self.rdns) != len(other.rdns):
+            return False
+        if (self._hash is not None and other._hash is not None and
+                self._hash != other._hash):
             return False
 
         # Perform comparison between objects of same type
-        return self._cmp_sequence(other, 0, len(self)) == 0
+        return self._get_rdn_keys() == other._get_rdn_keys()
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -1250,14 +1285,13 @@ class DN:
         return self._cmp_sequence(other, 0, len(self)) < 0
 
     def _cmp_sequence(self, pattern, self_start, pat_len):
-        self_idx = self_start
-        pat_idx = 0
-        while pat_idx < pat_len:
-            r = cmp_rdns(self.rdns[self_idx], pattern.rdns[pat_idx])
-            if r != 0:
-                return r
-            self_idx += 1
-            pat_idx += 1
+        self_keys = self._get_rdn_keys()
+        pat_keys = pattern._get_rdn_keys()
+        for pat_idx in range(pat_len):
+            key_a = self_keys[self_start + pat_idx]
+            key_b = pat_keys[pat_idx]
+            if key_a != key_b:
+                return -1 if key_a < key_b else 1
         return 0
 
     def __add__(self, other):
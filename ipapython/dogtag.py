@@ -22,6 +22,9 @@ import gzip
 import io
 import json
 import logging
+import select
+import threading
+import time
 from urllib.parse import urlencode
 import xml.dom.minidom
 import zlib
@@ -32,6 +35,7 @@ import six
 from ipalib import api, errors
 from ipalib.util import create_https_connection
 from ipalib.errors import NetworkError
+from ipalib.metrics import count_operation
 from ipalib.text import _
 # pylint: enable=ipa-forbidden-import
 from ipapython import ipautil
@@ -188,13 +192,128 @@ def acme_status(ca_host=None):
         return False
 
 
+class HTTPSConnectionPool:
+    """
+    Per-process pool of idle keep-alive HTTPS connections.
+
+    Connections are grouped by a key identifying the server and the TLS
+    parameters (CA file, client certificate and key, TLS versions), so a
+    connection authenticated with one client certificate is never handed
+    out for requests which should use another one. At most ``maxsize`` idle
+    connections are kept per key; connections returned to a full pool
+    are closed. Idle connections older than ``idle_timeout`` seconds or
+    whose socket became readable (the server closed it) are discarded on
+    checkout.
+
+    The events are also counted for the command being executed, see
+    ipalib.metrics.
+    """
+
+    def __init__(self, maxsize=4, idle_timeout=15):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle = collections.defaultdict(collections.deque)
+        self._stats = collections.Counter()
+
+    def configure(self, maxsize=None, idle_timeout=None):
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if idle_timeout is not None:
+                self.idle_timeout = idle_timeout
+
+    def _is_usable(self, conn, last_used):
+        if conn.sock is None:
+            return False
+        if time.monotonic() - last_used > self.idle_timeout:
+            return False
+        try:
+            readable, _w, _x = select.select([conn.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        # an idle keep-alive connection has nothing to read unless the
+        # server has closed it
+        return not readable
+
+    def acquire(self, key, connection_factory):
+        """
+        :return: ``(connection, reused)``
+
+        Get an idle connection for ``key`` or create a new one using
+        ``connection_factory``.
+        """
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                if not idle:
+                    break
+                conn, last_used = idle.pop()
+            if self._is_usable(conn, last_used):
+                with self._lock:
+                    self._stats['reused'] += 1
+                count_operation('dogtag_connections_reused')
+                return conn, True
+            self.discard(conn)
+
+        conn = connection_factory()
+        with self._lock:
+            self._stats['created'] += 1
+        count_operation('dogtag_connections_created')
+        return conn, False
+
+    def release(self, key, conn):
+        """Return a connection with a fully read response to the pool"""
+        with self._lock:
+            idle = self._idle[key]
+            if len(idle) < self.maxsize:
+                idle.append((conn, time.monotonic()))
+                return
+        self.discard(conn)
+
+    def discard(self, conn):
+        with self._lock:
+            self._stats['discarded'] += 1
+        count_operation('dogtag_connections_discarded')
+        conn.close()
+
+    def record_retry(self):
+        with self._lock:
+            self._stats['retried'] += 1
+        count_operation('dogtag_retries')
+
+    def clear(self):
+        with self._lock:
+            idle = [conn for conns in self._idle.values()
+                    for conn, _last_used in conns]
+            self._idle.clear()
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                created=self._stats['created'],
+                reused=self._stats['reused'],
+                discarded=self._stats['discarded'],
+                retried=self._stats['retried'],
+                idle=sum(len(conns) for conns in self._idle.values()),
+                maxsize=self.maxsize,
+            )
+
+
+connection_pool = HTTPSConnectionPool()
+
+
 def https_request(
         host, port, url, cafile, client_certfile, client_keyfile,
-        method='POST', headers=None, body=None, **kw):
+        method='POST', headers=None, body=None, pooled=False, **kw):
     """
     :param method: HTTP request method (defalut: 'POST')
     :param url: The path (not complete URL!) to post to.
     :param body: The request body (encodes kw if None)
+    :param pooled: Reuse a keep-alive connection from ``connection_pool``
+        instead of opening a new TLS connection for the request.
     :param kw:  Keyword arguments to encode into POST body.
     :return:   (http_status, http_headers, http_body)
                as (integer, dict, str)
@@ -213,6 +332,17 @@ def https_request(
 
     if body is None:
         body = urlencode(kw)
+    count_operation('dogtag_requests')
+    if pooled:
+        connection_pool.configure(
+            maxsize=api.env.ca_connection_pool_size,
+            idle_timeout=api.env.ca_connection_idle_timeout)
+        pool_key = (
+            host, port, cafile, client_certfile, client_keyfile,
+            api.env.tls_version_min, api.env.tls_version_max)
+        return _pooled_httplib_request(
+            'https', host, port, url, connection_factory, body,
+            pool_key, method=method, headers=headers)
     return _httplib_request(
         'https', host, port, url, connection_factory, body,
         method=method, headers=headers)
@@ -255,6 +385,79 @@ def _httplib_request(
     if connection_options is None:
         connection_options = {}
 
+    uri, headers = _prepare_request(
+        protocol, host, port, path, request_body, method, headers)
+
+    try:
+        conn = connection_factory(host, port, **connection_options)
+        res, http_body = _send_request(
+            conn, method, path, request_body, headers)
+        conn.close()
+    except Exception as e:
+        logger.debug("httplib request failed:", exc_info=True)
+        raise NetworkError(uri=uri, error=str(e))
+
+    return _process_response(res, http_body)
+
+
+# methods which are safe to send again after a lost connection
+_RETRY_METHODS = frozenset(['GET', 'HEAD'])
+
+
+def _pooled_httplib_request(
+        protocol, host, port, path, connection_factory, request_body,
+        pool_key, method='POST', headers=None):
+    """
+    :param pool_key: Key of the connection in ``connection_pool``
+
+    Perform a HTTP(s) request over a pooled keep-alive connection.
+
+    A request which fails on a reused connection because the server has
+    dropped it in the meantime is retried once on a new connection. Only
+    idempotent requests are retried, the server may have acted on the
+    others before the connection was lost.
+    """
+    uri, headers = _prepare_request(
+        protocol, host, port, path, request_body, method, headers)
+
+    def factory():
+        return connection_factory(host, port)
+
+    retry = True
+    while True:
+        conn, reused = None, False
+        try:
+            conn, reused = connection_pool.acquire(pool_key, factory)
+            res, http_body = _send_request(
+                conn, method, path, request_body, headers)
+        except (httplib.RemoteDisconnected, ConnectionResetError,
+                BrokenPipeError) as e:
+            if conn is not None:
+                connection_pool.discard(conn)
+            if reused and retry and method in _RETRY_METHODS:
+                logger.debug("stale pooled connection to %s, retrying", uri)
+                connection_pool.record_retry()
+                retry = False
+                continue
+            logger.debug("httplib request failed:", exc_info=True)
+            raise NetworkError(uri=uri, error=str(e))
+        except Exception as e:
+            if conn is not None:
+                connection_pool.discard(conn)
+            logger.debug("httplib request failed:", exc_info=True)
+            raise NetworkError(uri=uri, error=str(e))
+        break
+
+    if res.will_close:
+        connection_pool.discard(conn)
+    else:
+        connection_pool.release(pool_key, conn)
+
+    return _process_response(res, http_body)
+
+
+def _prepare_request(protocol, host, port, path, request_body, method,
+                     headers):
     uri = u'%s://%s%s' % (protocol, ipautil.format_netloc(host, port), path)
     logger.debug('request %s %s', method, uri)
     logger.debug('request body %r', request_body)
@@ -266,18 +469,18 @@ def _httplib_request(
     ):
         headers['content-type'] = 'application/x-www-form-urlencoded'
 
-    try:
-        conn = connection_factory(host, port, **connection_options)
-        conn.request(method, path, body=request_body, headers=headers)
-        res = conn.getresponse()
+    return uri, headers
 
-        http_status = res.status
-        http_headers = res.msg
-        http_body = res.read()
-        conn.close()
-    except Exception as e:
-        logger.debug("httplib request failed:", exc_info=True)
-        raise NetworkError(uri=uri, error=str(e))
+
+def _send_request(conn, method, path, request_body, headers):
+    conn.request(method, path, body=request_body, headers=headers)
+    res = conn.getresponse()
+    return res, res.read()
+
+
+def _process_response(res, http_body):
+    http_status = res.status
+    http_headers = res.msg
 
     encoding = res.getheader('Content-Encoding')
     if encoding == 'gzip':
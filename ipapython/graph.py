@@ -16,10 +16,12 @@ class Graph:
         self.vertices = set()
         self.edges = []
         self._adj = dict()
+        self._radj = dict()
 
     def add_vertex(self, vertex):
         self.vertices.add(vertex)
         self._adj[vertex] = []
+        self._radj[vertex] = []
 
     def add_edge(self, tail, head):
         if tail not in self.vertices:
@@ -30,15 +32,17 @@ class Graph:
 
         self.edges.append((tail, head))
         self._adj[tail].append(head)
+        self._radj[head].append(tail)
 
     def remove_edge(self, tail, head):
         try:
             self.edges.remove((tail, head))
-        except KeyError:
+        except ValueError:
             raise ValueError(
                 "graph does not contain edge: ({0}, {1})".format(tail, head)
             )
         self._adj[tail].remove(head)
+        self._radj[head].remove(tail)
 
     def remove_vertex(self, vertex):
         try:
@@ -50,8 +54,10 @@ class Graph:
 
         # delete _adjacencies
         del self._adj[vertex]
-        for adj in self._adj.values():
-            adj[:] = [v for v in adj if v != vertex]
+        del self._radj[vertex]
+        for adjacencies in (self._adj, self._radj):
+            for adj in adjacencies.values():
+                adj[:] = [v for v in adj if v != vertex]
 
         # delete edges
         self.edges = [
@@ -62,13 +68,13 @@ class Graph:
         """
         Get list of vertices where a vertex is on the right side of an edge
         """
-        return [e[0] for e in self.edges if e[1] == head]
+        return list(self._radj.get(head, []))
 
     def get_heads(self, tail):
         """
         Get list of vertices where a vertex is on the left side of an edge
         """
-        return [e[1] for e in self.edges if e[0] == tail]
+        return list(self._adj.get(tail, []))
 
     def bfs(self, start=None):
         """
@@ -86,3 +92,167 @@ class Graph:
                 visited.add(vertex)
                 queue.extend(set(self._adj.get(vertex, [])) - visited)
         return visited
+
+    def is_symmetric(self):
+        """
+        Return True if for every edge (tail, head) the graph contains also
+        the edge (head, tail)
+        """
+        edges = set(self.edges)
+        return all((head, tail) in edges for tail, head in edges)
+
+    def strongly_connected_components(self):
+        """
+        Find strongly connected components of the graph (Tarjan's algorithm)
+
+        Return a list of sets of vertices. Components are listed in reverse
+        topological order: every component reachable from a component is
+        listed before it.
+        """
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        components = []
+
+        for root in self.vertices:
+            if root in index:
+                continue
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self._adj[root]))]
+
+            while work:
+                vertex, heads = work[-1]
+                for head in heads:
+                    if head not in index:
+                        index[head] = lowlink[head] = len(index)
+                        stack.append(head)
+                        on_stack.add(head)
+                        work.append((head, iter(self._adj[head])))
+                        break
+                    elif head in on_stack:
+                        lowlink[vertex] = min(lowlink[vertex], index[head])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(
+                            lowlink[parent], lowlink[vertex])
+                    if lowlink[vertex] == index[vertex]:
+                        component = set()
+                        while True:
+                            v = stack.pop()
+                            on_stack.discard(v)
+                            component.add(v)
+                            if v == vertex:
+                                break
+                        components.append(component)
+
+        return components
+
+    def reachable_sets(self):
+        """
+        Return a dictionary mapping every vertex to the frozenset of vertices
+        reachable from it (including the vertex itself).
+
+        Vertices of one strongly connected component share the same set.
+        """
+        component_of = {}
+        reachable = []
+        for i, component in enumerate(self.strongly_connected_components()):
+            for vertex in component:
+                component_of[vertex] = i
+            reached = set(component)
+            successors = set()
+            for vertex in component:
+                for head in self._adj[vertex]:
+                    j = component_of[head]
+                    if j != i and j not in successors:
+                        successors.add(j)
+                        reached |= reachable[j]
+            reachable.append(frozenset(reached))
+
+        return {v: reachable[component_of[v]] for v in self.vertices}
+
+    def _undirected_neighbors(self):
+        neighbors = {v: set() for v in self.vertices}
+        for tail, head in self.edges:
+            if tail != head:
+                neighbors[tail].add(head)
+                neighbors[head].add(tail)
+        return neighbors
+
+    def weakly_connected_components(self, removed=None):
+        """
+        Find connected components of the graph with edge directions ignored
+
+        :param removed: vertex to leave out as if it was removed from the
+            graph
+        :returns: list of sets of vertices
+        """
+        neighbors = self._undirected_neighbors()
+        visited = {removed}
+        components = []
+        for start in self.vertices:
+            if start in visited:
+                continue
+            visited.add(start)
+            component = {start}
+            stack = [start]
+            while stack:
+                vertex = stack.pop()
+                for v in neighbors[vertex]:
+                    if v not in visited:
+                        visited.add(v)
+                        component.add(v)
+                        stack.append(v)
+            components.append(component)
+        return components
+
+    def articulation_points(self):
+        """
+        Find articulation points of the graph with edge directions ignored
+
+        An articulation point is a vertex whose removal splits its connected
+        component. All of them are found by a single depth-first search
+        (Hopcroft-Tarjan algorithm).
+
+        :returns: set of vertices
+        """
+        neighbors = self._undirected_neighbors()
+        disc = {}
+        low = {}
+        points = set()
+
+        for root in self.vertices:
+            if root in disc:
+                continue
+            disc[root] = low[root] = len(disc)
+            root_children = 0
+            work = [(root, None, iter(neighbors[root]))]
+
+            while work:
+                vertex, parent, adjacent = work[-1]
+                for v in adjacent:
+                    if v not in disc:
+                        disc[v] = low[v] = len(disc)
+                        work.append((v, vertex, iter(neighbors[v])))
+                        break
+                    elif v != parent:
+                        low[vertex] = min(low[vertex], disc[v])
+                else:
+                    work.pop()
+                    if parent is None:
+                        continue
+                    low[parent] = min(low[parent], low[vertex])
+                    if parent == root:
+                        root_children += 1
+                    elif low[vertex] >= disc[parent]:
+                        points.add(parent)
+
+            if root_children > 1:
+                points.add(root)
+
+        return points
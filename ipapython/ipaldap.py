@@ -29,9 +29,10 @@ from copy import deepcopy
 import contextlib
 import os
 import pwd
+import threading
 import warnings
 
-from collections import OrderedDict
+from collections import OrderedDict, deque
 
 from cryptography import x509 as crypto_x509
 from cryptography.hazmat.primitives import serialization
@@ -39,13 +40,17 @@ from cryptography.hazmat.primitives import serialization
 import ldap
 import ldap.sasl
 import ldap.filter
-from ldap.controls import SimplePagedResultsControl, GetEffectiveRightsControl
+from ldap.controls import (
+    SimplePagedResultsControl, GetEffectiveRightsControl, MatchedValuesControl)
+from ldap.controls.psearch import (PersistentSearchControl,
+                                   EntryChangeNotificationControl)
 import ldapurl
 import six
 
 # pylint: disable=ipa-forbidden-import
 from ipalib import errors, x509, _
 from ipalib.constants import LDAP_GENERALIZED_TIME_FORMAT
+from ipalib.metrics import count_operation
 # pylint: enable=ipa-forbidden-import
 from ipaplatform.paths import paths
 from ipapython.ipautil import format_netloc, CIDict
@@ -77,6 +82,9 @@ TRUNCATED_SIZE_LIMIT = object()
 TRUNCATED_TIME_LIMIT = object()
 TRUNCATED_ADMIN_LIMIT = object()
 
+# Default number of add operations add_entries() keeps in flight
+ADD_ENTRIES_WINDOW = 32
+
 DIRMAN_DN = DN(('cn', 'directory manager'))
 
 
@@ -285,7 +293,7 @@ class LDAPEntry(MutableMapping):
 
         if isinstance(_obj, LDAPEntry):
             self._not_list = set(_obj._not_list)
-            self._orig_raw = dict(_obj._orig_raw)
+            self._orig_raw = dict(_obj._get_orig_raw())
             if _obj.conn is _conn:
                 self._names = CIDict(_obj._names)
                 self._nice = dict(_obj._nice)
@@ -328,9 +336,63 @@ class LDAPEntry(MutableMapping):
         data.update((k, v) for k, v in self._nice.items() if v is not None)
         return '%s(%r, %r)' % (type(self).__name__, self._dn, data)
 
+    @classmethod
+    def _from_raw(cls, conn, dn, attrs):
+        """
+        Create an entry from raw attribute values received from the server.
+
+        Values are decoded only when an attribute is accessed. No snapshot
+        of the original values is taken until the raw values are accessed
+        or the entry is modified (see _get_orig_raw()), and even then the
+        value lists are shared with the snapshot until they are handed out
+        or modified (see _unshare_raw()), so an entry which is only read
+        never keeps a second copy of its values.
+
+        attrs is a mapping of attribute names to lists of bytes, it must not
+        be used by the caller afterwards.
+        """
+        self = cls.__new__(cls)
+        self._conn = conn
+        self._dn = dn
+        self._names = CIDict()
+        self._nice = {}
+        self._raw = {}
+        self._sync = {}
+        self._not_list = set()
+        self._orig_raw = None
+        self._raw_view = None
+        self._single_value_view = None
+
+        for name, values in attrs.items():
+            name = self._add_attr_name(name)
+            self._raw[name] = values
+            self._nice[name] = None
+
+        return self
+
     def copy(self):
         return LDAPEntry(self)
 
+    def _get_orig_raw(self):
+        """
+        Get the original raw values, taking the snapshot of the current
+        values if there is none yet. Must be called before the raw values
+        are changed.
+        """
+        if self._orig_raw is None:
+            self._orig_raw = dict(self._raw)
+        return self._orig_raw
+
+    def _unshare_raw(self, name):
+        """
+        Copy the raw values of name if they are shared with the original
+        values, before they are handed out or modified.
+        """
+        raw = self._raw[name]
+        if raw is not None and self._get_orig_raw().get(name) is raw:
+            raw = self._raw[name] = list(raw)
+        return raw
+
     def _sync_attr(self, name):
         nice = self._nice[name]
         assert isinstance(nice, list)
@@ -342,6 +404,21 @@ class LDAPEntry(MutableMapping):
         if nice == nice_sync and raw == raw_sync:
             return
 
+        if not nice and not nice_sync and not raw_sync:
+            # first access to the raw values, decode them all
+            for value in dict.fromkeys(raw):
+                try:
+                    nice.append(self._conn.decode(value, name))
+                except ValueError as e:
+                    raise ValueError("{error} in LDAP entry '{dn}'".format(
+                        error=e, dn=self._dn))
+            self._sync[name] = (deepcopy(nice), list(raw))
+            if len(nice) > 1:
+                self._not_list.discard(name)
+            return
+
+        raw = self._unshare_raw(name)
+
         nice_adds = set(nice) - set(nice_sync)
         nice_dels = set(nice_sync) - set(nice)
         raw_adds = set(raw) - set(raw_sync)
@@ -379,7 +456,7 @@ class LDAPEntry(MutableMapping):
                 continue
             nice.append(value)
 
-        self._sync[name] = (deepcopy(nice), deepcopy(raw))
+        self._sync[name] = (deepcopy(nice), list(raw))
 
         if len(nice) > 1:
             self._not_list.discard(name)
@@ -399,22 +476,12 @@ class LDAPEntry(MutableMapping):
         if name in self._names:
             return self._names[name]
 
-        if self._conn.schema is not None:
-            if six.PY2:
-                encoded_name = name.encode('utf-8')
-            else:
-                encoded_name = name
-            attrtype = self._conn.schema.get_obj(
-                ldap.schema.AttributeType, encoded_name)
-            if attrtype is not None:
-                for altname in attrtype.names:
-                    if six.PY2:
-                        altname = altname.decode('utf-8')
-                    self._names[altname] = name
+        for altname in self._conn.get_attribute_names(name):
+            self._names[altname] = name
 
         self._names[name] = name
 
-        for oldname in list(self._orig_raw):
+        for oldname in list(self._orig_raw or ()):
             if self._names.get(oldname) == name:
                 self._orig_raw[name] = self._orig_raw.pop(oldname)
                 break
@@ -434,6 +501,7 @@ class LDAPEntry(MutableMapping):
         else:
             self._not_list.discard(name)
 
+        self._get_orig_raw()
         if self._nice.get(name) is not value:
             self._nice[name] = value
             self._raw[name] = None
@@ -457,6 +525,7 @@ class LDAPEntry(MutableMapping):
 
         name = self._add_attr_name(name)
 
+        self._get_orig_raw()
         if self._raw.get(name) is not value:
             self._raw[name] = value
             self._nice[name] = None
@@ -496,14 +565,15 @@ class LDAPEntry(MutableMapping):
     def _get_raw(self, name):
         name = self._get_attr_name(name)
 
-        value = self._raw[name]
-        if value is None:
-            value = self._raw[name] = []
-        assert isinstance(value, list)
+        if self._raw[name] is None:
+            self._raw[name] = []
 
         if self._nice[name] is not None:
             self._sync_attr(name)
 
+        value = self._unshare_raw(name)
+        assert isinstance(value, list)
+
         return value
 
     def __getitem__(self, name):
@@ -516,12 +586,14 @@ class LDAPEntry(MutableMapping):
             if keyname == name:
                 del self._names[altname]
 
+        self._get_orig_raw()
         del self._nice[name]
         del self._raw[name]
         self._sync.pop(name, None)
         self._not_list.discard(name)
 
     def clear(self):
+        self._get_orig_raw()
         self._names.clear()
         self._nice.clear()
         self._raw.clear()
@@ -551,16 +623,20 @@ class LDAPEntry(MutableMapping):
         if other is None:
             other = self
         assert isinstance(other, LDAPEntry)
-        self._orig_raw = deepcopy(dict(other.raw))
+        # raw values are lists of bytes, copying the lists is enough
+        self._orig_raw = {
+            name: list(values) for name, values in other.raw.items()
+        }
 
     def generate_modlist(self):
         modlist = []
 
+        orig_raw = self._get_orig_raw()
         names = set(self)
-        names.update(self._orig_raw)
+        names.update(orig_raw)
         for name in names:
             new = self.raw.get(name, [])
-            old = self._orig_raw.get(name, [])
+            old = orig_raw.get(name, [])
             if old and not new:
                 modlist.append((ldap.MOD_DELETE, name, None))
                 continue
@@ -798,6 +874,7 @@ class LDAPClient:
 
         self._has_schema = False
         self._schema = None
+        self._attribute_names = {}
 
         if ldap_uri is not None:
             self._conn = self._connect()
@@ -852,6 +929,7 @@ class LDAPClient:
         assert isinstance(dn, DN)
         dn = str(dn)
         modlist = [(a, b, self.encode(c)) for a, b, c in modlist]
+        count_operation('ldap_operations')
         return self.conn.modify_s(dn, modlist)
 
     @property
@@ -911,6 +989,7 @@ class LDAPClient:
         # bypass ldap2's locking
         object.__setattr__(self, '_has_schema', False)
         object.__setattr__(self, '_schema', None)
+        self._attribute_names.clear()
 
     def get_attribute_type(self, name_or_oid):
         if not self._decode_attrs:
@@ -941,6 +1020,33 @@ class LDAPClient:
         """
         return self.get_attribute_type(name_or_oid) is DN
 
+    def get_attribute_names(self, name):
+        """Get all names of an attribute type
+
+        Returns an empty tuple if the attribute type is not in the schema.
+        The names are cached until the schema is flushed.
+        """
+        try:
+            return self._attribute_names[name]
+        except KeyError:
+            pass
+
+        names = ()
+        schema = self._get_schema()
+        if schema is not None:
+            if six.PY2:
+                encoded_name = name.encode('utf-8')
+            else:
+                encoded_name = name
+            attrtype = schema.get_obj(ldap.schema.AttributeType, encoded_name)
+            if attrtype is not None:
+                names = tuple(attrtype.names)
+                if six.PY2:
+                    names = tuple(n.decode('utf-8') for n in names)
+
+        self._attribute_names[name] = names
+        return names
+
     def get_attribute_single_value(self, name_or_oid):
         """
         Check the schema to see if the attribute is single-valued.
@@ -1066,11 +1172,8 @@ class LDAPClient:
 
                 continue
 
-            ipa_entry = LDAPEntry(self, DN(original_dn))
-
-            for attr, original_values in original_attrs.items():
-                ipa_entry.raw[attr] = original_values
-            ipa_entry.reset_modlist()
+            ipa_entry = LDAPEntry._from_raw(
+                self, DN(original_dn), original_attrs)
 
             ipa_result.append(ipa_entry)
 
@@ -1491,12 +1594,74 @@ class LDAPClient:
         :raises: errors.NotFound if result set is empty
                                  or base_dn doesn't exist
         """
+        res = []
+        search = self._search_entries(
+            filter, attrs_list, base_dn, scope, time_limit, size_limit,
+            paged_search, get_effective_rights, None)
+        while True:
+            try:
+                res.append(next(search))
+            except StopIteration as e:
+                truncated = e.value
+                break
+
+        if not res and not truncated:
+            raise errors.EmptyResult(reason='no matching entry found')
+
+        return (res, truncated)
+
+    def iter_entries(
+            self, filter=None, attrs_list=None, base_dn=None,
+            scope=ldap.SCOPE_SUBTREE, time_limit=None, size_limit=None,
+            paged_search=True, get_effective_rights=False,
+            matched_values=None):
+        """
+        Iterate over entries matching specified search parameters.
+
+        Unlike find_entries(), entries are yielded as they are received from
+        the server, so that a consumer which processes them one at a time
+        never holds the whole result set in memory. Paged search is used by
+        default. Closing the iterator before it is exhausted abandons the
+        search and cancels the paged search on the server.
+
+        An empty result set yields no entries.
+
+        The parameters have the same meaning as for find_entries().
+
+        :param matched_values: values return filter (RFC 3876), e.g.
+            ``((member=cn=a)(member=cn=b))``; only attribute values matching
+            it are returned, if the server supports the control
+
+        :raises: errors.LimitsExceeded after the last entry was yielded
+                 if the result set was truncated by the server
+        :raises: errors.NotFound if base_dn doesn't exist
+        """
+        truncated = yield from self._search_entries(
+            filter, attrs_list, base_dn, scope, time_limit, size_limit,
+            paged_search, get_effective_rights, matched_values)
+        try:
+            self.handle_truncated_result(truncated)
+        except errors.LimitsExceeded as e:
+            logger.error(
+                "%s while iterating entries (base DN: %s, filter: %s)",
+                e, base_dn, filter
+            )
+            raise
+
+    def _search_entries(
+            self, filter, attrs_list, base_dn, scope, time_limit, size_limit,
+            paged_search, get_effective_rights, matched_values):
+        """
+        Generator doing the actual search for find_entries() and
+        iter_entries().
+
+        Yields converted entries and returns the truncated flag.
+        """
         if base_dn is None:
             base_dn = DN()
         assert isinstance(base_dn, DN)
         if not filter:
             filter = '(objectClass=*)'
-        res = []
         truncated = False
 
         if time_limit is None:
@@ -1518,12 +1683,27 @@ class LDAPClient:
         base_sctrls = []
         if get_effective_rights:
             base_sctrls.append(self.__get_effective_rights_control())
+        if matched_values:
+            base_sctrls.append(
+                MatchedValuesControl(criticality=False,
+                                     filterstr=matched_values))
 
         cookie = ''
         page_size = (size_limit if size_limit > 0 else 2000) - 1
         if page_size == 0:
             paged_search = False
 
+        def cancel_paged_search():
+            sctrls = [SimplePagedResultsControl(0, 0, cookie)]
+            try:
+                self.conn.search_ext_s(
+                    str(base_dn), scope, filter, attrs_list,
+                    serverctrls=sctrls, timeout=time_limit,
+                    sizelimit=size_limit)
+            except ldap.LDAPError as e2:
+                logger.warning(
+                    "Error cancelling paged search: %s", e2)
+
         # pass arguments to python-ldap
         with self.error_handler():
             if six.PY2:
@@ -1538,7 +1718,9 @@ class LDAPClient:
                 else:
                     sctrls = base_sctrls or None
 
+                id = None
                 try:
+                    count_operation('ldap_operations')
                     id = self.conn.search_ext(
                         str(base_dn), scope, filter, attrs_list,
                         serverctrls=sctrls, timeout=time_limit,
@@ -1551,7 +1733,8 @@ class LDAPClient:
                             break
                         res_list = self._convert_result(res_list)
                         if res_list:
-                            res.append(res_list[0])
+                            yield res_list[0]
+                    id = None
 
                     if paged_search:
                         # Get cookie for the next page
@@ -1573,15 +1756,7 @@ class LDAPClient:
                 except ldap.LDAPError as e:
                     # If paged search is in progress, try to cancel it
                     if paged_search and cookie:
-                        sctrls = [SimplePagedResultsControl(0, 0, cookie)]
-                        try:
-                            self.conn.search_ext_s(
-                                str(base_dn), scope, filter, attrs_list,
-                                serverctrls=sctrls, timeout=time_limit,
-                                sizelimit=size_limit)
-                        except ldap.LDAPError as e2:
-                            logger.warning(
-                                "Error cancelling paged search: %s", e2)
+                        cancel_paged_search()
                         cookie = ''
 
                     try:
@@ -1590,14 +1765,22 @@ class LDAPClient:
                             ldap.SIZELIMIT_EXCEEDED):
                         truncated = True
                         break
+                except GeneratorExit:
+                    # The consumer stopped iterating, abandon the search in
+                    # progress and release the paged search on the server
+                    if id is not None:
+                        try:
+                            self.conn.abandon(id)
+                        except ldap.LDAPError as e2:
+                            logger.warning("Error abandoning search: %s", e2)
+                    if paged_search and cookie:
+                        cancel_paged_search()
+                    raise
 
                 if not paged_search or not cookie:
                     break
 
-        if not res and not truncated:
-            raise errors.EmptyResult(reason='no matching entry found')
-
-        return (res, truncated)
+        return truncated
 
     def __get_effective_rights_control(self):
         """Construct a GetEffectiveRights control for current user."""
@@ -1657,10 +1840,59 @@ class LDAPClient:
 
         with self.error_handler():
             attrs = self.encode(attrs)
+            count_operation('ldap_operations')
             self.conn.add_s(str(entry.dn), list(attrs.items()))
 
         entry.reset_modlist()
 
+    def add_entries(self, entries, window=ADD_ENTRIES_WINDOW):
+        """Create new entries, pipelining the add operations.
+
+        Up to ``window`` add requests are sent to the server before the
+        result of the oldest one is awaited. ``entries`` may be a lazy
+        iterable, it is consumed only as far as the window allows.
+
+        Yields an ``(entry, error)`` tuple for every entry in the order the
+        entries were sent. ``error`` is None when the entry was added or the
+        errors.ExecutionError the add operation failed with. Other operations
+        may be run on the connection while the iteration is suspended.
+        """
+        pending = deque()
+
+        def complete():
+            msgid, entry = pending.popleft()
+            try:
+                with self.error_handler():
+                    self.conn.result3(msgid)
+            except errors.ExecutionError as e:
+                return entry, e
+            entry.reset_modlist()
+            return entry, None
+
+        try:
+            for entry in entries:
+                attrs = dict((k, v) for k, v in entry.raw.items() if v)
+                try:
+                    with self.error_handler():
+                        attrs = self.encode(attrs)
+                        count_operation('ldap_operations')
+                        msgid = self.conn.add_ext(
+                            str(entry.dn), list(attrs.items()))
+                except errors.ExecutionError as e:
+                    yield entry, e
+                    continue
+                pending.append((msgid, entry))
+                if len(pending) >= window:
+                    yield complete()
+
+            while pending:
+                yield complete()
+        finally:
+            # the iteration was abandoned, collect the outstanding results
+            # so that they do not linger on the connection
+            while pending:
+                complete()
+
     def move_entry(self, dn, new_dn, del_old=True):
         """
         Move an entry (either to a new superior or/and changing relative distinguished name)
@@ -1688,6 +1920,7 @@ class LDAPClient:
             new_superior = str(DN(*new_dn[1:]))
 
         with self.error_handler():
+            count_operation('ldap_operations')
             self.conn.rename_s(str(dn), str(new_rdn), newsuperior=new_superior,
                                delold=int(del_old))
             time.sleep(.3)  # Give memberOf plugin a chance to work
@@ -1707,6 +1940,7 @@ class LDAPClient:
         with self.error_handler():
             modlist = [(a, str(b), self.encode(c))
                        for a, b, c in modlist]
+            count_operation('ldap_operations')
             self.conn.modify_s(str(entry.dn), modlist)
 
         entry.reset_modlist()
@@ -1719,6 +1953,7 @@ class LDAPClient:
             dn = entry_or_dn.dn
 
         with self.error_handler():
+            count_operation('ldap_operations')
             self.conn.delete_s(str(dn))
 
     def entry_exists(self, dn):
@@ -1764,13 +1999,340 @@ class CacheEntry:
         self.all = all
 
 
+class SharedLDAPCache:
+    """Process-wide LRU cache of LDAP entries with expiration
+
+    The cache is shared by all LDAPCache connections of a process and
+    therefore outlives a single request. Entries are stored per bind
+    identity so that an entry retrieved by one principal is never returned
+    to another one and ACIs keep being enforced by the server.
+
+    Entries expire ``ttl`` seconds after they were stored and the least
+    recently used entries are evicted when there are more than
+    ``max_entries`` of them. A write to an entry through any LDAPCache
+    connection of the process invalidates it for all identities. Writes
+    which may make server plugins (memberOf, referential integrity, managed
+    entries) change other entries invalidate the whole cache. Changes made
+    by other processes or replicas are picked up after expiration, or
+    immediately when a persistent search watcher is running.
+    """
+
+    def __init__(self, max_entries=1000, ttl=30):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._identities = {}
+        self._watcher = None
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def configure(self, max_entries, ttl):
+        with self._lock:
+            self.max_entries = max_entries
+            self.ttl = ttl
+            self._shrink()
+
+    def _drop(self, key):
+        del self._entries[key]
+        dn, identity = key
+        identities = self._identities[dn]
+        identities.discard(identity)
+        if not identities:
+            del self._identities[dn]
+
+    def _shrink(self):
+        while len(self._entries) > self.max_entries:
+            key = next(iter(self._entries))
+            self._drop(key)
+            self.evictions += 1
+
+    def get(self, identity, dn):
+        """Return the CacheEntry of dn stored for identity or None"""
+        key = (dn, identity)
+        with self._lock:
+            try:
+                expires, cache_entry = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            if expires < time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cache_entry
+
+    def put(self, identity, dn, cache_entry):
+        key = (dn, identity)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, cache_entry)
+            self._entries.move_to_end(key)
+            self._identities.setdefault(dn, set()).add(identity)
+            self._shrink()
+
+    def invalidate(self, dn):
+        """Drop dn for all identities"""
+        with self._lock:
+            for identity in list(self._identities.get(dn, ())):
+                self._drop((dn, identity))
+                self.invalidations += 1
+
+    def invalidate_all(self):
+        """Drop all entries, a write may have changed any of them"""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._identities.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._identities.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                size=len(self._entries),
+                max_entries=self.max_entries,
+                ttl=self.ttl,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                expirations=self.expirations,
+                invalidations=self.invalidations,
+                watcher=self.watcher_running,
+            )
+
+    @property
+    def watcher_running(self):
+        return self._watcher is not None and self._watcher.is_alive()
+
+    def start_watcher(self, client, base_dn):
+        """Invalidate entries changed on the server as soon as possible
+
+        Runs a persistent search for changes below base_dn on the bound
+        LDAPClient client in a daemon thread. The client must not be used
+        for anything else. If the persistent search fails, the whole cache
+        is flushed, because changes may have been missed, and entries are
+        again invalidated by expiration only.
+        """
+        if self.watcher_running:
+            return
+        self._watcher = threading.Thread(
+            target=self._watch, args=(client, base_dn),
+            name='SharedLDAPCache watcher', daemon=True)
+        self._watcher.start()
+
+    def _watch(self, client, base_dn):
+        psc = PersistentSearchControl(changesOnly=True, returnECs=True)
+        ecnc_classes = {
+            EntryChangeNotificationControl.controlType:
+                EntryChangeNotificationControl
+        }
+        try:
+            msgid = client.conn.search_ext(
+                str(base_dn), ldap.SCOPE_SUBTREE, '(objectClass=*)',
+                attrlist=['1.1'], serverctrls=[psc])
+            while True:
+                _type, res_list, _id, _ctrls = client.conn.result4(
+                    msgid, all=0, timeout=None, add_ctrls=1,
+                    resp_ctrl_classes=ecnc_classes)
+                for dn, _attrs, ctrls in res_list:
+                    if dn is None:
+                        continue
+                    self.invalidate(DN(dn))
+                    for ctrl in ctrls:
+                        previous_dn = getattr(ctrl, 'previousDN', None)
+                        if previous_dn:
+                            self.invalidate(DN(previous_dn))
+        except Exception as e:
+            logger.warning(
+                'SharedLDAPCache watcher stopped, flushing cache: %s', e)
+            self.clear()
+        finally:
+            client.close()
+
+
+shared_ldap_cache = SharedLDAPCache()
+
+
+class LDAPConnectionPool:
+    """Process-wide pool of idle bound LDAP connections
+
+    Connections are stored per bind identity and a connection is only
+    ever handed out again for the identity it was bound as, so the server
+    keeps evaluating ACIs exactly as for a fresh bind.
+
+    A connection is dropped when it has been idle for ``idle_timeout``
+    seconds or when the deadline passed to release() is reached, whichever
+    comes first. At most ``max_connections`` idle connections are kept;
+    the least recently used ones are closed first. Connections handed out
+    are checked with a Who am I? operation, which also detects
+    connections closed by the server.
+    """
+
+    def __init__(self, max_connections=10, idle_timeout=60):
+        self._lock = threading.Lock()
+        self._idle = OrderedDict()
+        self._size = 0
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.created = 0
+        self.reused = 0
+        self.expired = 0
+        self.evicted = 0
+        self.broken = 0
+
+    def configure(self, max_connections, idle_timeout):
+        with self._lock:
+            self.max_connections = max_connections
+            self.idle_timeout = idle_timeout
+            closed = self._shrink()
+        self._close(closed)
+
+    def _shrink(self):
+        closed = []
+        while self._size > max(self.max_connections, 0):
+            identity = next(iter(self._idle))
+            closed.append(self._pop(identity, 0)[0])
+            self.evicted += 1
+        return closed
+
+    def _pop(self, identity, index=-1):
+        conns = self._idle[identity]
+        item = conns.pop(index)
+        if not conns:
+            del self._idle[identity]
+        self._size -= 1
+        return item
+
+    @staticmethod
+    def _close(conns):
+        for conn in conns:
+            try:
+                conn.unbind_s()
+            except ldap.LDAPError:
+                pass
+
+    def acquire(self, identity):
+        """Return (conn, deadline) of an idle connection of identity or None
+
+        Expired and broken connections on the way are closed.
+        """
+        while True:
+            closed = []
+            item = None
+            with self._lock:
+                now = time.monotonic()
+                while identity in self._idle:
+                    conn, expires, deadline = self._pop(identity)
+                    if expires > now:
+                        item = (conn, deadline)
+                        break
+                    closed.append(conn)
+                    self.expired += 1
+            self._close(closed)
+            if item is None:
+                return None
+
+            conn = item[0]
+            try:
+                alive = bool(conn.whoami_s())
+            except ldap.LDAPError:
+                alive = False
+            if alive:
+                with self._lock:
+                    self.reused += 1
+                return item
+
+            self._close([conn])
+            with self._lock:
+                self.broken += 1
+
+    def created_connection(self):
+        """Count a connection bound because none could be reused"""
+        with self._lock:
+            self.created += 1
+
+    def release(self, identity, conn, deadline):
+        """Keep conn bound as identity until deadline (monotonic time)"""
+        with self._lock:
+            now = time.monotonic()
+            expires = min(now + self.idle_timeout, deadline)
+            if expires <= now or self.max_connections <= 0:
+                closed = [conn]
+                self.expired += 1
+            else:
+                self._idle.setdefault(identity, []).append(
+                    (conn, expires, deadline))
+                self._idle.move_to_end(identity)
+                self._size += 1
+                closed = self._shrink()
+        self._close(closed)
+
+    def clear(self):
+        with self._lock:
+            closed = [
+                item[0] for conns in self._idle.values() for item in conns
+            ]
+            self._idle.clear()
+            self._size = 0
+        self._close(closed)
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                idle=self._size,
+                identities=len(self._idle),
+                max_connections=self.max_connections,
+                idle_timeout=self.idle_timeout,
+                created=self.created,
+                reused=self.reused,
+                expired=self.expired,
+                evicted=self.evicted,
+                broken=self.broken,
+            )
+
+
+ldap_connection_pool = LDAPConnectionPool()
+
+
 class LDAPCache(LDAPClient):
-    """A very basic LRU Cache using an OrderedDict"""
+    """A very basic LRU Cache using an OrderedDict
+
+    With shared_cache set to a SharedLDAPCache, the per-connection cache
+    is backed by the process-wide cache for connections whose bind
+    identity is known (see get_cache_identity()).
+    """
+
+    # idnsname - caching prevents delete when mod value to None
+    # cospriority - in a Class of Service object, uncacheable
+    # usercertificate* - caching subtypes is tricky, trade less
+    #                    complexity for performance
+    #
+    # TODO: teach the cache about subtypes
+    cache_excluded_attrs = frozenset({
+        'idnsname',
+        'cospriority',
+        'usercertificate',
+        'usercertificate;binary'
+    })
+    cache_excluded_subtrees = (
+        DN('cn=config'),
+        DN('cn=kerberos'),
+        DN('o=ipaca'),
+    )
 
     def __init__(self, ldap_uri, start_tls=False, force_schema_updates=False,
                  no_schema=False, decode_attrs=True, cacert=None,
                  sasl_nocanon=True, enable_cache=True, cache_size=100,
-                 debug_cache=False):
+                 debug_cache=False, shared_cache=None):
 
         self.cache = OrderedDict()
         self._enable_cache = True  # initialize to zero to satisfy pylint
@@ -1778,10 +2340,12 @@ class LDAPCache(LDAPClient):
 
         object.__setattr__(self, '_cache_misses', 0)
         object.__setattr__(self, '_cache_hits', 0)
+        object.__setattr__(self, '_modify_count', 0)
         object.__setattr__(self, '_enable_cache',
                            enable_cache and cache_size > 0)
         object.__setattr__(self, '_debug_cache', debug_cache)
         object.__setattr__(self, '_cache_size', cache_size)
+        object.__setattr__(self, '_shared_cache', shared_cache)
 
         super(LDAPCache, self).__init__(
             ldap_uri, start_tls, force_schema_updates, no_schema,
@@ -1796,67 +2360,84 @@ class LDAPCache(LDAPClient):
     def miss(self):
         return self._cache_misses  # pylint: disable=no-member
 
+    @property
+    def modify_count(self):
+        """Number of entries written over this connection"""
+        return self._modify_count  # pylint: disable=no-member
+
     @property
     def max_entries(self):
         return self._cache_size  # pylint: disable=no-member
 
+    @property
+    def shared_cache(self):
+        return self._shared_cache  # pylint: disable=no-member
+
+    def get_cache_identity(self):
+        """Return the bind identity entries are shared under
+
+        Entries are only shared with other connections through the
+        process-wide cache if the identity of the connection is known.
+        """
+        return None
+
+    def _get_shared_cache_entry(self, dn):
+        if self.shared_cache is None:
+            return None
+        identity = self.get_cache_identity()
+        if identity is None:
+            return None
+        entry = self.shared_cache.get(identity, dn)
+        if entry is not None:
+            self.emit("SHARED HIT: %s", dn)
+        return entry
+
     def emit(self, msg, *args, **kwargs):
         if self._enable_cache and self._debug_cache:
             logger.debug(msg, *args, **kwargs)
 
     def copy_entry(self, dn, entry, attrs=[]):
-        new_entry = LDAPEntry(self, DN(dn))
-
         # Return either the whole entry or only those attrs requested
         if not attrs:
-            new_entry.raw.update(deepcopy(dict(entry.raw)))
+            raw = {
+                attr: list(values) for attr, values in entry.raw.items()
+            }
         else:
-            for attr, original_values in entry.raw.items():
-                if attr.lower() not in attrs:
-                    continue
-                new_entry.raw[attr.lower()] = deepcopy(original_values)
-        new_entry._orig_raw = deepcopy(dict(entry.raw))
-        new_entry.reset_modlist()
+            raw = {
+                attr.lower(): list(values)
+                for attr, values in entry.raw.items()
+                if attr.lower() in attrs
+            }
 
-        return new_entry
+        return LDAPEntry._from_raw(self, DN(dn), raw)
 
     def add_cache_entry(self, dn, attrs_list=None, get_all=False,
                         entry=None, exception=None):
-        # idnsname - caching prevents delete when mod value to None
-        # cospriority - in a Class of Service object, uncacheable
-        # usercertificate* - caching subtypes is tricky, trade less
-        #                    complexity for performance
-        #
-        # TODO: teach the cache about subtypes
-
-        BANNED_ATTRS = {
-            'idnsname',
-            'cospriority',
-            'usercertificate',
-            'usercertificate;binary'
-        }
         if not self._enable_cache:
             return
 
-        self.remove_cache_entry(dn)
+        # a fresh read is not a write, keep the entry cached for other
+        # identities in the shared cache
+        self.cache.pop(dn, None)
 
-        if (
-            DN('cn=config') in dn
-            or DN('cn=kerberos') in dn
-            or DN('o=ipaca') in dn
-        ):
+        if any(subtree in dn for subtree in self.cache_excluded_subtrees):
             return
 
         if exception:
             self.emit("EXC: Caching exception %s", exception)
             self.cache[dn] = CacheEntry(exception=exception)
         else:
-            if not BANNED_ATTRS.intersection(attrs_list):
+            if not self.cache_excluded_attrs.intersection(attrs_list):
                 self.cache[dn] = CacheEntry(
                     entry=entry.copy(),
                     attrs_list=attrs_list.copy(),
                     all=get_all,
                 )
+                # negative results are not shared, an entry added by
+                # another process must be visible on the next request
+                identity = self.get_cache_identity()
+                if self.shared_cache is not None and identity is not None:
+                    self.shared_cache.put(identity, dn, self.cache[dn])
             else:
                 return
 
@@ -1878,9 +2459,30 @@ class LDAPCache(LDAPClient):
         self.emit("%s: Hits %d Misses %d Size %d",
                   type, self.hit, self.miss, len(self.cache))
 
-    def remove_cache_entry(self, dn):
+    def _has_side_effects(self, attrs):
+        """Whether a change of attrs may make server plugins change other
+        entries
+
+        The memberOf and referential integrity plugins follow DN-valued
+        attributes such as member.
+        """
+        return any(self.has_dn_syntax(attr) for attr in attrs)
+
+    def remove_cache_entry(self, dn, side_effects=False):
+        """Drop dn from the cache before it is written
+
+        With side_effects, the write may make server plugins change other
+        entries and the whole shared cache is dropped.
+        """
         assert isinstance(dn, DN)
         self.emit('DROP: %s', dn)
+        object.__setattr__(self, '_modify_count', self.modify_count + 1)
+        if self.shared_cache is not None:
+            if side_effects:
+                self.emit('DROP: shared cache')
+                self.shared_cache.invalidate_all()
+            else:
+                self.shared_cache.invalidate(dn)
         if dn in self.cache:
             del self.cache[dn]
         else:
@@ -1890,12 +2492,26 @@ class LDAPCache(LDAPClient):
 
     def add_entry(self, entry):
         self.emit('add_entry')
-        self.remove_cache_entry(entry.dn)
+        self.remove_cache_entry(entry.dn, side_effects=True)
         super(LDAPCache, self).add_entry(entry)
 
+    def add_entries(self, entries, window=ADD_ENTRIES_WINDOW):
+        self.emit('add_entries')
+
+        def invalidate(entries):
+            for entry in entries:
+                self.remove_cache_entry(entry.dn, side_effects=True)
+                yield entry
+
+        return super(LDAPCache, self).add_entries(invalidate(entries), window)
+
     def update_entry(self, entry):
         self.emit('update_entry')
-        self.remove_cache_entry(entry.dn)
+        side_effects = False
+        if self.shared_cache is not None:
+            side_effects = self._has_side_effects(
+                attr for _op, attr, _values in entry.generate_modlist())
+        self.remove_cache_entry(entry.dn, side_effects)
         super(LDAPCache, self).update_entry(entry)
 
     def delete_entry(self, entry_or_dn):
@@ -1905,13 +2521,13 @@ class LDAPCache(LDAPClient):
         else:
             dn = entry_or_dn.dn
 
-        self.remove_cache_entry(dn)
+        self.remove_cache_entry(dn, side_effects=True)
 
         super(LDAPCache, self).delete_entry(dn)
 
     def move_entry(self, dn, new_dn, del_old=True):
         self.emit('move_entry')
-        self.remove_cache_entry(dn)
+        self.remove_cache_entry(dn, side_effects=True)
         self.remove_cache_entry(new_dn)
 
         super(LDAPCache, self).move_entry(dn, new_dn, del_old)
@@ -1933,7 +2549,11 @@ class LDAPCache(LDAPClient):
                         self.remove_cache_entry(d)
 
         self.emit('modify_s %s', dn)
-        self.remove_cache_entry(dn)
+        side_effects = False
+        if self.shared_cache is not None:
+            side_effects = self._has_side_effects(
+                attr for _op, attr, _values in modlist)
+        self.remove_cache_entry(dn, side_effects)
 
         return super(LDAPCache, self).modify_s(dn, modlist)
 
@@ -1946,6 +2566,8 @@ class LDAPCache(LDAPClient):
         self.emit("Cache lookup: %s", dn)
 
         entry = self.cache.get(dn)
+        if entry is None:
+            entry = self._get_shared_cache_entry(dn)
         if get_effective_rights and entry:
             # We don't cache this so do the query but don't drop the
             # entry.
@@ -1954,6 +2576,7 @@ class LDAPCache(LDAPClient):
         if entry and entry.exception:
             hits = self._cache_hits + 1  # pylint: disable=no-member
             object.__setattr__(self, '_cache_hits', hits)
+            count_operation('ldap_cache_hits')
             self.emit("HIT: Re-raising %s", entry.exception)
             self.cache_status('HIT')
             raise entry.exception
@@ -1978,6 +2601,7 @@ class LDAPCache(LDAPClient):
         if entry and entry.all and get_all:
             hits = self._cache_hits + 1  # pylint: disable=no-member
             object.__setattr__(self, '_cache_hits', hits)
+            count_operation('ldap_cache_hits')
             self.cache_status('HIT')
             return self.copy_entry(dn, entry.entry)
 
@@ -1989,6 +2613,7 @@ class LDAPCache(LDAPClient):
             if req_attrs.issubset(cache_attrs):
                 hits = self._cache_hits + 1  # pylint: disable=no-member
                 object.__setattr__(self, '_cache_hits', hits)
+                count_operation('ldap_cache_hits')
                 self.cache_status('HIT')
 
                 return self.copy_entry(dn, entry.entry, req_attrs)
@@ -2002,6 +2627,7 @@ class LDAPCache(LDAPClient):
             self.add_cache_entry(dn, exception=e)
             misses = self._cache_misses + 1  # pylint: disable=no-member
             object.__setattr__(self, '_cache_misses', misses)
+            count_operation('ldap_cache_misses')
             self.cache_status('MISS: %s' % e)
             raise
         # pylint: disable=try-except-raise
@@ -2019,5 +2645,6 @@ class LDAPCache(LDAPClient):
             )
         misses = self._cache_misses + 1  # pylint: disable=no-member
         object.__setattr__(self, '_cache_misses', misses)
+        count_operation('ldap_cache_misses')
         self.cache_status('MISS')
         return entry
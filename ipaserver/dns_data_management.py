@@ -4,12 +4,14 @@
 
 from __future__ import absolute_import
 
+import concurrent.futures
 import logging
 
 import six
 
 from collections import defaultdict, OrderedDict
 from dns import (
+    exception,
     rdata,
     rdataclass,
     rdatatype,
@@ -20,7 +22,7 @@ from time import sleep, time
 
 from ipalib import errors
 from ipalib.constants import IPA_CA_RECORD
-from ipalib.dns import record_name_format
+from ipalib.dns import get_record_rrtype, record_name_format
 from ipapython.dnsutil import DNSName
 from ipaserver.install import installutils
 
@@ -76,6 +78,7 @@ IPA_DEFAULT_KRB_TXT_REC = (
 )
 
 CA_RECORDS_DNS_TIMEOUT = 15  # timeout in seconds
+CA_RECORDS_RESOLVE_WORKERS = 8  # host names resolved concurrently
 
 
 class IPADomainIsNotManagedByIPAError(Exception):
@@ -186,9 +189,8 @@ class IPASystemRecords:
                 r_name, rdatatype.URI, create=True)
             rdataset.add(rd, ttl=self.TTL)
 
-    def __add_ca_records_from_hostname(self, zone_obj, hostname):
-        assert isinstance(hostname, DNSName) and hostname.is_absolute()
-        r_name = DNSName(IPA_CA_RECORD) + self.domain_abs
+    @staticmethod
+    def __resolve_ca_hostname(hostname):
         rrsets = None
         end_time = time() + CA_RECORDS_DNS_TIMEOUT
         while True:
@@ -203,6 +205,30 @@ class IPASystemRecords:
             if time() >= end_time:
                 break
             sleep(3)
+        return rrsets or []
+
+    def __resolve_ca_hostnames(self, hostnames):
+        """
+        Resolve host names of CA servers concurrently, so that unresolvable
+        servers do not wait for their timeouts one after another
+        :return: {hostname: rrsets, ...}, rrsets are empty for host names
+        which cannot be resolved
+        """
+        if not hostnames:
+            return {}
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(len(hostnames), CA_RECORDS_RESOLVE_WORKERS)
+        ) as executor:
+            return dict(zip(
+                hostnames, executor.map(self.__resolve_ca_hostname, hostnames)
+            ))
+
+    def __add_ca_records_from_hostname(self, zone_obj, hostname,
+                                       rrsets=None):
+        assert isinstance(hostname, DNSName) and hostname.is_absolute()
+        r_name = DNSName(IPA_CA_RECORD) + self.domain_abs
+        if rrsets is None:
+            rrsets = self.__resolve_ca_hostname(hostname)
 
         if not rrsets:
             logger.error('unable to resolve host name %s to IP address, '
@@ -232,15 +258,18 @@ class IPASystemRecords:
         )
         rdataset.add(rd, ttl=self.TTL)
 
+    def __get_effective_roles(self, hostname, roles=None):
+        server = self.servers_data[hostname]
+        if roles:
+            return server['roles'] & set(roles)
+        return server['roles']
+
     def _add_base_dns_records_for_server(
             self, zone_obj, hostname, roles=None, include_master_role=True,
-            include_kerberos_realm=True,
+            include_kerberos_realm=True, ca_rrsets=None,
     ):
         server = self.servers_data[hostname]
-        if roles:
-            eff_roles = server['roles'] & set(roles)
-        else:
-            eff_roles = server['roles']
+        eff_roles = self.__get_effective_roles(hostname, roles)
         hostname_abs = DNSName(hostname).make_absolute()
 
         if include_kerberos_realm:
@@ -262,7 +291,9 @@ class IPASystemRecords:
             )
 
         if 'CA server' in eff_roles:
-            self.__add_ca_records_from_hostname(zone_obj, hostname_abs)
+            self.__add_ca_records_from_hostname(
+                zone_obj, hostname_abs,
+                rrsets=(ca_rrsets or {}).get(hostname_abs))
 
         if 'AD trust controller' in eff_roles:
             self.__add_srv_records(
@@ -350,6 +381,85 @@ class IPASystemRecords:
                 update_dict[option_name].append(unicode(rdata.to_text()))
         return update_dict
 
+    def __get_cname_template(self, record_name):
+        return (
+            r'%s.\{substitutionvariable_ipalocation\}._locations' %
+            record_name.relativize(self.domain_abs)
+        )
+
+    def __get_existing_records(self, record_names):
+        """
+        Read the record entries of the given names with a single search
+        :return: {record_name: LDAPEntry, ...}
+        """
+        ldap = self.api_instance.Backend.ldap2
+        zone_dn = self.api_instance.Object.dnszone.get_dn(self.domain_abs)
+        search_filter = ldap.make_filter_from_attr(
+            'idnsname',
+            [DNSName(name).relativize(self.domain_abs).ToASCII()
+             for name in record_names],
+            rules=ldap.MATCH_ANY)
+
+        existing = {}
+        try:
+            for entry in ldap.iter_entries(
+                    search_filter, ['*'], zone_dn, ldap.SCOPE_ONELEVEL,
+                    size_limit=-1, time_limit=-1):
+                record_name = entry.single_value['idnsname']
+                existing[record_name.derelativize(self.domain_abs)] = entry
+        except errors.NotFound:
+            pass
+        return existing
+
+    def __get_entry_rdatas(self, entry, rdtypes):
+        rdatas = {}
+        for rdtype in rdtypes:
+            attr = record_name_format % rdatatype.to_text(rdtype).lower()
+            rdatas[rdtype] = set(
+                rdata.from_text(rdataclass.IN, rdtype, value,
+                                origin=self.domain_abs, relativize=False)
+                for value in entry.get(attr, [])
+            )
+        return rdatas
+
+    def __records_changed(self, record_name, entry, node,
+                          set_cname_template=True, all_types=False):
+        """
+        Compare the generated records of a name with its LDAP entry
+        :param all_types: records of types which are not generated are
+        considered a change too
+        """
+        if entry is None:
+            return True
+
+        if set_cname_template:
+            objectclasses = [oc.lower() for oc in entry.get('objectclass', [])]
+            if ('idnstemplateobject' not in objectclasses or
+                    entry.get('idnsTemplateAttribute;cnamerecord') !=
+                    [self.__get_cname_template(record_name)]):
+                return True
+
+        generated = {
+            rdataset.rdtype: set(rdataset) for rdataset in node
+        }
+        rdtypes = set(generated)
+        try:
+            if all_types:
+                for attr in entry:
+                    rrtype = get_record_rrtype(attr.lower())
+                    if rrtype and ';' not in attr and entry[attr]:
+                        rdtypes.add(rdatatype.from_text(rrtype))
+            existing = self.__get_entry_rdatas(entry, rdtypes)
+        except exception.DNSException as e:
+            # unparsable records are replaced
+            logger.debug("Cannot parse records of %s: %s", entry.dn, e)
+            return True
+
+        return any(
+            generated.get(rdtype, set()) != existing[rdtype]
+            for rdtype in rdtypes
+        )
+
     def __update_dns_records(
             self, record_name, nodes, set_cname_template=True
     ):
@@ -357,9 +467,8 @@ class IPASystemRecords:
         cname_template = {
             'addattr': ['objectclass=idnsTemplateObject'],
             'setattr': [
-                r'idnsTemplateAttribute;cnamerecord=%s'
-                r'.\{substitutionvariable_ipalocation\}._locations' %
-                record_name.relativize(self.domain_abs)
+                r'idnsTemplateAttribute;cnamerecord=%s' %
+                self.__get_cname_template(record_name)
             ]
         }
         try:
@@ -408,10 +517,16 @@ class IPASystemRecords:
         if servers is None:
             servers = list(self.servers_data)
 
+        ca_rrsets = self.__resolve_ca_hostnames([
+            DNSName(server).make_absolute() for server in servers
+            if 'CA server' in self.__get_effective_roles(server, roles)
+        ])
+
         for server in servers:
             self._add_base_dns_records_for_server(zone_obj, server,
                 roles=roles, include_master_role=include_master_role,
-                include_kerberos_realm=include_kerberos_realm
+                include_kerberos_realm=include_kerberos_realm,
+                ca_rrsets=ca_rrsets
             )
         return zone_obj
 
@@ -444,13 +559,7 @@ class IPASystemRecords:
                 include_kerberos_realm=include_kerberos_realm)
         return zone_obj
 
-    def update_base_records(self):
-        """
-        Update base DNS records for IPA services
-        :return: [(record_name, node), ...], [(record_name, node, error), ...]
-        where the first list contains successfully updated records, and the
-        second list contains failed updates with particular exceptions
-        """
+    def __update_base_records(self, base_zone, existing):
         fail = []
         success = []
         names_requiring_cname_templates = set(
@@ -463,51 +572,87 @@ class IPASystemRecords:
             )
         )
 
-        # Remove the ipa-ca record(s). They will be reconstructed in
-        # get_base_records().
+        # The ipa-ca record(s) are reconstructed from scratch, records of
+        # servers which are not CA servers anymore must not be kept.
         r_name = DNSName(IPA_CA_RECORD) + self.domain_abs
-        try:
-            self.api_instance.Command.dnsrecord_del(
-                self.domain_abs, r_name, del_all=True)
-        except errors.NotFound:
-            pass
-        base_zone = self.get_base_records()
+        if r_name in existing and r_name not in base_zone:
+            try:
+                self.api_instance.Command.dnsrecord_del(
+                    self.domain_abs, r_name, del_all=True)
+            except errors.NotFound:
+                pass
+
         for record_name, node in base_zone.items():
             set_cname_template = record_name in names_requiring_cname_templates
+            is_ca_record = record_name == r_name
             try:
-                self.__update_dns_records(
-                    record_name, node, set_cname_template)
+                if self.__records_changed(
+                        record_name, existing.get(record_name), node,
+                        set_cname_template, all_types=is_ca_record):
+                    if is_ca_record and record_name in existing:
+                        self.api_instance.Command.dnsrecord_del(
+                            self.domain_abs, record_name, del_all=True)
+                    self.__update_dns_records(
+                        record_name, node, set_cname_template)
             except errors.PublicError as e:
                 fail.append((record_name, node, e))
             else:
                 success.append((record_name, node))
         return success, fail
 
-    def update_locations_records(self):
-        """
-        Update locations DNS records for IPA services
-        :return: [(record_name, node), ...], [(record_name, node, error), ...]
-        where the first list contains successfully updated records, and the
-        second list contains failed updates with particular exceptions
-        """
+    def __update_locations_records(self, location_zone, existing):
         fail = []
         success = []
 
-        location_zone = self.get_locations_records()
         for record_name, nodes in location_zone.items():
             try:
-                self.__update_dns_records(
-                    record_name, nodes,
-                    set_cname_template=False)
+                if self.__records_changed(
+                        record_name, existing.get(record_name), nodes,
+                        set_cname_template=False):
+                    self.__update_dns_records(
+                        record_name, nodes,
+                        set_cname_template=False)
             except errors.PublicError as e:
                 fail.append((record_name, nodes, e))
             else:
                 success.append((record_name, nodes))
         return success, fail
 
+    def update_base_records(self):
+        """
+        Update base DNS records for IPA services
+
+        Only records which differ from the records stored in LDAP are
+        written.
+        :return: [(record_name, node), ...], [(record_name, node, error), ...]
+        where the first list contains successfully updated records, and the
+        second list contains failed updates with particular exceptions
+        """
+        base_zone = self.get_base_records()
+        existing = self.__get_existing_records(
+            list(base_zone) + [DNSName(IPA_CA_RECORD) + self.domain_abs])
+        return self.__update_base_records(base_zone, existing)
+
+    def update_locations_records(self):
+        """
+        Update locations DNS records for IPA services
+
+        Only records which differ from the records stored in LDAP are
+        written.
+        :return: [(record_name, node), ...], [(record_name, node, error), ...]
+        where the first list contains successfully updated records, and the
+        second list contains failed updates with particular exceptions
+        """
+        location_zone = self.get_locations_records()
+        existing = self.__get_existing_records(list(location_zone))
+        return self.__update_locations_records(location_zone, existing)
+
     def update_dns_records(self):
         """
         Update all IPA DNS records
+
+        Records are generated first and compared with the existing records
+        read by a single search, only records which differ are written.
         :return: (sucessfully_updated_base_records, failed_base_records,
         sucessfully_updated_locations_records, failed_locations_records)
         For format see update_base_records or update_locations_method
@@ -519,9 +664,15 @@ class IPASystemRecords:
         except errors.NotFound:
             raise IPADomainIsNotManagedByIPAError()
 
+        base_zone = self.get_base_records()
+        location_zone = self.get_locations_records()
+        existing = self.__get_existing_records(
+            list(base_zone) + list(location_zone) +
+            [DNSName(IPA_CA_RECORD) + self.domain_abs])
+
         return (
-            self.update_base_records(),
-            self.update_locations_records()
+            self.__update_base_records(base_zone, existing),
+            self.__update_locations_records(location_zone, existing)
         )
 
     def remove_location_records(self, location):
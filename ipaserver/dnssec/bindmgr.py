@@ -178,17 +178,7 @@ class BINDMgr:
         # strip trailing period
         return ''.join(escaped[:-1])
 
-    def sync_zone(self, zone):
-        logger.info('Synchronizing zone %s', zone)
-        zone_path = os.path.join(paths.BIND_LDAP_DNS_ZONE_WORKDIR,
-                self.get_zone_dir_name(zone))
-        try:
-            os.mkdir(zone_path, 0o770)
-        except FileExistsError:
-            pass
-
-        # fix HSM permissions
-        # TODO: move out
+    def fix_hsm_permissions(self):
         for prefix, dirs, files in os.walk(paths.DNSSEC_TOKENS_DIR, topdown=True):
             for name in dirs:
                 fpath = os.path.join(prefix, name)
@@ -198,7 +188,15 @@ class BINDMgr:
                 fpath = os.path.join(prefix, name)
                 logger.debug('Fixing file permissions: %s', fpath)
                 os.chmod(fpath, FILE_PERM)
-        # TODO: move out
+
+    def sync_zone(self, zone):
+        logger.info('Synchronizing zone %s', zone)
+        zone_path = os.path.join(paths.BIND_LDAP_DNS_ZONE_WORKDIR,
+                self.get_zone_dir_name(zone))
+        try:
+            os.mkdir(zone_path, 0o770)
+        except FileExistsError:
+            pass
 
         with TemporaryDirectory(zone_path) as tempdir:
             for uuid, attrs in self.ldap_keys[zone].items():
@@ -224,12 +222,20 @@ class BINDMgr:
         This filter is useful in cases where LDAP contains DNS zones which
         have old metadata objects and DNSSEC disabled. Such zones must be
         ignored to prevent errors while calling dnssec-keyfromlabel or rndc.
+
+        Only the zones modified since the last sync are touched, HSM
+        permissions are fixed once for all of them.
         """
         logger.debug('Key metadata in LDAP: %s', self.ldap_keys)
         logger.debug('Zones modified but skipped during bindmgr.sync: %s',
                      self.modified_zones - dnssec_zones)
-        for zone in self.modified_zones.intersection(dnssec_zones):
+        zones = self.modified_zones.intersection(dnssec_zones)
+        if zones:
+            self.fix_hsm_permissions()
+        for zone in zones:
             self.sync_zone(zone)
+        logger.info('%d of %d DNSSEC zones synchronized with BIND',
+                    len(zones), len(dnssec_zones))
 
         self.modified_zones = set()
 
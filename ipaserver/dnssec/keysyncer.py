@@ -4,7 +4,9 @@
 
 from __future__ import absolute_import
 
+import collections
 import logging
+import time
 
 import ldap.dn
 import os
@@ -23,6 +25,58 @@ logger = logging.getLogger(__name__)
 SIGNING_ATTR = 'idnsSecInlineSigning'
 OBJCLASS_ATTR = 'objectClass'
 
+# Syncs requested by LDAP events run once no event arrived for SYNC_DELAY
+# seconds, but at most SYNC_MAX_DELAY seconds after the first request.
+SYNC_DELAY = 2
+SYNC_MAX_DELAY = 30
+# keys have to be in the local HSM before BIND can use them
+SYNC_ORDER = ('ods', 'hsm_replica', 'hsm_master', 'bind')
+
+
+class SyncScheduler:
+    """Coalesce the syncs requested by a burst of LDAP events.
+
+    Every sync is done once per burst, no matter how many events asked
+    for it.
+    """
+    def __init__(self, delay=SYNC_DELAY, max_delay=SYNC_MAX_DELAY,
+                 clock=time.monotonic):
+        self.delay = delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.pending = set()
+        self.events = 0
+        self.syncs = collections.Counter()
+        self._first_request = None
+        self._last_request = None
+
+    def event(self):
+        """Count a received LDAP event"""
+        self.events += 1
+
+    def request(self, name):
+        """Ask for the sync name to be done after the current burst"""
+        now = self.clock()
+        if not self.pending:
+            self._first_request = now
+        self._last_request = now
+        self.pending.add(name)
+
+    def timeout(self):
+        """Seconds until the pending syncs are due, None if there are none"""
+        if not self.pending:
+            return None
+        deadline = min(self._last_request + self.delay,
+                       self._first_request + self.max_delay)
+        return max(deadline - self.clock(), 0)
+
+    def take(self):
+        """Return the pending syncs in SYNC_ORDER and forget them"""
+        pending = [name for name in SYNC_ORDER if name in self.pending]
+        self.pending = set()
+        self.syncs.update(pending)
+        return pending
+
 
 class KeySyncer(SyncReplConsumer):
     def __init__(self, *args, **kwargs):
@@ -41,6 +95,7 @@ class KeySyncer(SyncReplConsumer):
         self.bindmgr = BINDMgr(self.api)
         self.init_done = False
         self.dnssec_zones = set()
+        self.scheduler = SyncScheduler()
         SyncReplConsumer.__init__(self, *args, **kwargs)
 
     def _get_objclass(self, attrs):
@@ -77,6 +132,7 @@ class KeySyncer(SyncReplConsumer):
         return vals[0].startswith(b'dnssec-replica:')
 
     def application_add(self, uuid, dn, attributes):
+        self.scheduler.event()
         objclass = self._get_objclass(attributes)
         if objclass == b'idnszone':
             self.zone_add(uuid, dn, attributes)
@@ -84,9 +140,10 @@ class KeySyncer(SyncReplConsumer):
             self.key_meta_add(uuid, dn, attributes)
         elif objclass == b'ipk11publickey' and \
                 self.__is_replica_pubkey(attributes):
-            self.hsm_master_sync()
+            self.scheduler.request('hsm_master')
 
     def application_del(self, uuid, dn, previous_attributes):
+        self.scheduler.event()
         objclass = self._get_objclass(previous_attributes)
         if objclass == b'idnszone':
             self.zone_del(uuid, dn, previous_attributes)
@@ -94,9 +151,10 @@ class KeySyncer(SyncReplConsumer):
             self.key_meta_del(uuid, dn, previous_attributes)
         elif objclass == b'ipk11publickey' and \
                 self.__is_replica_pubkey(previous_attributes):
-            self.hsm_master_sync()
+            self.scheduler.request('hsm_master')
 
     def application_sync(self, uuid, dn, attributes, previous_attributes):
+        self.scheduler.event()
         objclass = self._get_objclass(previous_attributes)
         if objclass == b'idnszone':
             olddn = ldap.dn.str2dn(previous_attributes['dn'])
@@ -116,38 +174,62 @@ class KeySyncer(SyncReplConsumer):
 
         elif objclass == b'ipk11publickey' and \
                 self.__is_replica_pubkey(attributes):
-            self.hsm_master_sync()
+            self.scheduler.request('hsm_master')
 
     def syncrepl_refreshdone(self):
         logger.info('Initial LDAP dump is done, sychronizing with ODS and '
                     'BIND')
         self.init_done = True
-        self.ods_sync()
-        self.hsm_replica_sync()
-        self.hsm_master_sync()
-        self.bindmgr.sync(self.dnssec_zones)
+        for name in SYNC_ORDER:
+            self.scheduler.request(name)
+        self.sync_pending(force=True)
+
+    def sync_timeout(self):
+        """Seconds to wait for further LDAP events before sync_pending()
+        is due, None if no sync is pending."""
+        if not self.init_done:
+            return None
+        return self.scheduler.timeout()
+
+    def sync_pending(self, force=False):
+        """Do the syncs requested by LDAP events once they are due."""
+        if not self.init_done:
+            return
+        if not force and self.scheduler.timeout() != 0:
+            return
+
+        for name in self.scheduler.take():
+            if name == 'ods':
+                self.ods_sync()
+            elif name == 'hsm_replica':
+                self.hsm_replica_sync()
+            elif name == 'hsm_master':
+                self.hsm_master_sync()
+            elif name == 'bind':
+                self.bindmgr.sync(self.dnssec_zones)
+
+        logger.info('%d LDAP events received, syncs executed: %s',
+                    self.scheduler.events,
+                    ', '.join('%s=%d' % (name, self.scheduler.syncs[name])
+                              for name in SYNC_ORDER))
 
     # idnsSecKey wrapper
     # Assumption: metadata points to the same key blob all the time,
     # i.e. it is not necessary to re-download blobs because of change in DNSSEC
     # metadata - DNSSEC flags or timestamps.
     def key_meta_add(self, uuid, dn, newattrs):
-        self.hsm_replica_sync()
+        self.scheduler.request('hsm_replica')
         self.bindmgr.ldap_event('add', uuid, newattrs)
-        self.bindmgr_sync(self.dnssec_zones)
+        self.scheduler.request('bind')
 
     def key_meta_del(self, uuid, dn, oldattrs):
         self.bindmgr.ldap_event('del', uuid, oldattrs)
-        self.bindmgr_sync(self.dnssec_zones)
-        self.hsm_replica_sync()
+        self.scheduler.request('bind')
+        self.scheduler.request('hsm_replica')
 
     def key_metadata_sync(self, uuid, dn, oldattrs, newattrs):
         self.bindmgr.ldap_event('mod', uuid, newattrs)
-        self.bindmgr_sync(self.dnssec_zones)
-
-    def bindmgr_sync(self, dnssec_zones):
-        if self.init_done:
-            self.bindmgr.sync(dnssec_zones)
+        self.scheduler.request('bind')
 
     # idnsZone wrapper
     def zone_add(self, uuid, dn, newattrs):
@@ -162,7 +244,7 @@ class KeySyncer(SyncReplConsumer):
 
         if self.__is_dnssec_enabled(newattrs):
             self.odsmgr.ldap_event('add', uuid, newattrs)
-        self.ods_sync()
+        self.scheduler.request('ods')
 
     def zone_del(self, uuid, dn, oldattrs):
         zone = dns.name.from_text(oldattrs['idnsname'][0])
@@ -173,7 +255,7 @@ class KeySyncer(SyncReplConsumer):
 
         if self.__is_dnssec_enabled(oldattrs):
             self.odsmgr.ldap_event('del', uuid, oldattrs)
-        self.ods_sync()
+        self.scheduler.request('ods')
 
     def ods_sync(self):
         if not self.ismaster:
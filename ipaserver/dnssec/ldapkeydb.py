@@ -130,6 +130,7 @@ class Key(MutableMapping):
     def __init__(self, entry, ldap, ldapkeydb):
         self.entry = entry
         self._delentry = None  # indicates that object was deleted
+        self._modified = False  # has to be written back to LDAP
         self.ldap = ldap
         self.ldapkeydb = ldapkeydb
 
@@ -148,10 +149,12 @@ class Key(MutableMapping):
     def __setitem__(self, key, value):
         self.__assert_not_deleted()
         self.entry[key] = value
+        self._modified = True
 
     def __delitem__(self, key):
         self.__assert_not_deleted()
         del self.entry[key]
+        self._modified = True
 
     def __iter__(self):
         """generates list of ipa names of all PKCS#11 attributes present in the object"""
@@ -184,17 +187,24 @@ class Key(MutableMapping):
                 del self[attr]
 
     def _update_key(self):
-        """remove default values from LDAP entry and write back changes"""
+        """remove default values from LDAP entry and write back changes
+
+        Keys which were not modified since they were read are skipped.
+        """
         if self._delentry:
             self._delete_key()
             return
 
+        if not self._modified:
+            return
+
         self._cleanup_key()
 
         try:
             self.ldap.update_entry(self.entry)
         except ipalib.errors.EmptyModlist:
             pass
+        self._modified = False
 
     def _delete_key(self):
         """remove key metadata entry from LDAP
@@ -224,6 +234,7 @@ class Key(MutableMapping):
             "Key.schedule_deletion() called more than once")
         self._delentry = self.entry
         self.entry = None
+        self._modified = True
 
 
 class ReplicaKey(Key):
@@ -247,11 +258,9 @@ class MasterKey(Key):
             return keys
 
         for dn in self.entry['ipaSecretKeyRef']:
-            try:
-                obj = self.ldap.get_entry(dn)
+            obj = self.ldapkeydb.get_entry(dn)
+            if obj is not None:
                 keys.append(obj)
-            except ipalib.errors.NotFound:
-                continue
 
         return keys
 
@@ -273,33 +282,103 @@ class MasterKey(Key):
                     str_hexlify(replica_key_id),
                     entry_dn)
         self.ldap.add_entry(entry)
+        self.ldapkeydb.add_entry(entry)
         if 'ipaSecretKeyRef' not in self.entry:
             self.entry['objectClass'] += ['ipaSecretKeyRefObject']
         self.entry.setdefault('ipaSecretKeyRef', []).append(entry_dn)
+        self._modified = True
+
+
+def _has_objectclasses(entry, *objectclasses):
+    present = {o.lower() for o in entry.get('objectclass', [])}
+    return present.issuperset(objectclasses)
+
+
+def _bool_value(entry, attr, default=None):
+    values = entry.get(attr)
+    if not isinstance(values, list):
+        # default values added by LdapKeyDB._get_key_dict()
+        values = [values] if values is not None else []
+    if not values:
+        return default
+    return ldap_bool(values[0])
+
+
+def _is_replica_pubkey_wrap(entry):
+    """Python version of the replica_pubkeys_wrap LDAP filter"""
+    return (_has_objectclasses(entry, 'ipk11publickey', 'ipapublickeyobject')
+            and _bool_value(entry, 'ipk11wrap') is True)
+
+
+def _is_master_key(entry):
+    """Python version of the master_keys LDAP filter"""
+    return (_has_objectclasses(entry, 'ipk11secretkey') and
+            _bool_value(entry, 'ipk11unwrap', True) is True and
+            entry.get('ipk11label') == ['dnssec-master'])
+
+
+def _is_zone_keypair(entry):
+    """Python version of the zone_keypairs LDAP filter"""
+    return _has_objectclasses(entry, 'ipk11privatekey', 'ipaprivatekeyobject',
+                              'ipk11publickey', 'ipapublickeyobject')
 
 
 class LdapKeyDB(AbstractHSM):
+    """Key metadata stored in LDAP
+
+    All key metadata entries are read with a single search into an index
+    from which the master keys, zone keys and replica keys are picked.
+    The index is only re-read after keys were imported, and only keys
+    which were modified are written back by flush().
+    """
     def __init__(self, ldap, base_dn):
         self.ldap = ldap
         self.base_dn = base_dn
         self.cache_replica_pubkeys_wrap = None
         self.cache_masterkeys = None
         self.cache_zone_keypairs = None
+        # DN -> entry of all PKCS#11 objects below base_dn
+        self._index = None
 
-    def _get_key_dict(self, key_type, ldap_filter):
+    def _get_index(self):
+        if self._index is None:
+            try:
+                objs = self.ldap.get_entries(
+                    base_dn=self.base_dn, filter='(objectClass=ipk11Object)')
+            except ipalib.errors.NotFound:
+                objs = []
+            self._index = {o.dn: o for o in objs}
+            logger.debug('read %d key metadata entries from LDAP',
+                         len(self._index))
+        return self._index
+
+    def get_entry(self, dn):
+        """Return the entry with key material dn, None if it does not exist"""
+        index = self._get_index()
+        if dn in index:
+            return index[dn]
+        # not below base_dn
         try:
-            objs = self.ldap.get_entries(base_dn=self.base_dn,
-                    filter=ldap_filter)
+            return self.ldap.get_entry(dn)
         except ipalib.errors.NotFound:
-            return {}
+            return None
+
+    def add_entry(self, entry):
+        """Record an entry which was added to LDAP"""
+        if self._index is not None:
+            self._index[entry.dn] = entry
 
+    def _get_key_dict(self, key_type, matches):
         keys = {}
-        for o in objs:
+        for o in self._get_index().values():
+            if not matches(o):
+                continue
             # add default values not present in LDAP
             key = key_type(o, self.ldap, self)
             default_attrs = get_default_attrs(key.entry['objectclass'])
             for attr, attr_val in default_attrs.items():
-                key.setdefault(attr, attr_val)
+                if attr not in key.entry:
+                    key.entry[attr] = attr_val
 
             if 'ipk11id' not in key:
                 raise ValueError(
@@ -331,15 +410,27 @@ class LdapKeyDB(AbstractHSM):
         for cache in [self.cache_masterkeys, self.cache_replica_pubkeys_wrap,
                       self.cache_zone_keypairs]:
             if cache:
-                for key in cache.values():
-                    key._update_key()
+                for key_id, key in list(cache.items()):
+                    if key._delentry:
+                        dn = key._delentry.dn
+                        key._update_key()
+                        del cache[key_id]
+                        if self._index is not None:
+                            self._index.pop(dn, None)
+                    else:
+                        key._update_key()
 
     def flush(self):
-        """write back content of caches to LDAP"""
+        """write back content of caches to LDAP
+
+        The caches are kept unless keys were imported since they were
+        read, modified keys are written back.
+        """
         self._update_keys()
-        self.cache_masterkeys = None
-        self.cache_replica_pubkeys_wrap = None
-        self.cache_zone_keypairs = None
+        if self._index is None:
+            self.cache_masterkeys = None
+            self.cache_replica_pubkeys_wrap = None
+            self.cache_zone_keypairs = None
 
     def _import_keys_metadata(self, source_keys):
         """import key metadata from Key-compatible objects
@@ -373,6 +464,8 @@ class LdapKeyDB(AbstractHSM):
         new_key = self._import_keys_metadata(
                 [(mkey, _ipap11helper.KEY_CLASS_SECRET_KEY)])
         self.ldap.add_entry(new_key.entry)
+        # the server generates the DN, read all keys again on next use
+        self._index = None
         logger.debug('imported master key metadata: %s', new_key.entry)
 
     def import_zone_key(self, pubkey, pubkey_data, privkey,
@@ -391,20 +484,18 @@ class LdapKeyDB(AbstractHSM):
         new_key.entry['ipaPublicKey'] = pubkey_data
 
         self.ldap.add_entry(new_key.entry)
+        # the server generates the DN, read all keys again on next use
+        self._index = None
         logger.debug('imported zone key id: 0x%s',
                      str_hexlify(new_key['ipk11id']))
 
     @property
     def replica_pubkeys_wrap(self):
-        if self.cache_replica_pubkeys_wrap:
+        if self.cache_replica_pubkeys_wrap is not None:
             return self.cache_replica_pubkeys_wrap
 
         keys = self._filter_replica_keys(
-            self._get_key_dict(
-                ReplicaKey,
-                '(&(objectClass=ipk11PublicKey)(ipk11Wrap=TRUE)'
-                '(objectClass=ipaPublicKeyObject))'
-            )
+            self._get_key_dict(ReplicaKey, _is_replica_pubkey_wrap)
         )
 
         self.cache_replica_pubkeys_wrap = keys
@@ -412,15 +503,10 @@ class LdapKeyDB(AbstractHSM):
 
     @property
     def master_keys(self):
-        if self.cache_masterkeys:
+        if self.cache_masterkeys is not None:
             return self.cache_masterkeys
 
-        keys = self._get_key_dict(
-            MasterKey,
-            '(&(objectClass=ipk11SecretKey)'
-            '(|(ipk11UnWrap=TRUE)(!(ipk11UnWrap=*)))'
-            '(ipk11Label=dnssec-master))'
-        )
+        keys = self._get_key_dict(MasterKey, _is_master_key)
         for key in keys.values():
             prefix = 'dnssec-master'
             if key['ipk11label'] != prefix:
@@ -436,12 +522,11 @@ class LdapKeyDB(AbstractHSM):
 
     @property
     def zone_keypairs(self):
-        if self.cache_zone_keypairs:
+        if self.cache_zone_keypairs is not None:
             return self.cache_zone_keypairs
 
         self.cache_zone_keypairs = self._filter_zone_keys(
-                self._get_key_dict(Key,
-                '(&(objectClass=ipk11PrivateKey)(objectClass=ipaPrivateKeyObject)(objectClass=ipk11PublicKey)(objectClass=ipaPublicKeyObject))'))
+                self._get_key_dict(Key, _is_zone_keypair))
 
         return self.cache_zone_keypairs
 
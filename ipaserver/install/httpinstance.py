@@ -139,6 +139,8 @@ class HTTPInstance(service.Service):
         self.step("publish CA cert", self.__publish_ca_cert)
         self.step("clean up any existing httpd ccaches",
                   self.remove_httpd_ccaches)
+        self.step("create API schema cache directory",
+                  self.create_schema_cache_dir)
         self.step("enable ccache sweep",
                   self.enable_ccache_sweep)
         self.step("configuring SELinux for httpd", self.configure_selinux_for_httpd)
@@ -178,6 +180,13 @@ class HTTPInstance(service.Service):
             [paths.SYSTEMD_TMPFILES, '--create', '--prefix', paths.IPA_CCACHES]
         )
 
+    def create_schema_cache_dir(self):
+        # tmpfiles.d creates the directory only on boot
+        ipautil.run(
+            [paths.SYSTEMD_TMPFILES, '--create', '--prefix',
+             paths.IPA_SCHEMA_CACHE_DIR]
+        )
+
     def enable_ccache_sweep(self):
         ipautil.run(
             [paths.SYSTEMCTL, 'enable', 'ipa-ccache-sweep.timer']
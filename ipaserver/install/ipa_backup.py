@@ -19,10 +19,15 @@
 
 from __future__ import absolute_import, print_function
 
+import concurrent.futures
+import hashlib
+import json
 import logging
 import optparse  # pylint: disable=deprecated-module
 import os
 import shutil
+import stat
+import subprocess
 import sys
 import tempfile
 import time
@@ -51,6 +56,14 @@ else:
 # pylint: enable=import-error
 ISO8601_DATETIME_FMT = '%Y-%m-%dT%H:%M:%S'
 
+# File list with content hashes of a full backup, stored next to files.tar.
+# An incremental backup only archives the files which differ from the
+# manifest of its base backup.
+MANIFEST_NAME = 'files.manifest'
+MANIFEST_VERSION = 1
+MANIFEST_HASH_CHUNK = 1024 * 1024
+MANIFEST_NON_FILES = ('dir', 'special')
+
 logger = logging.getLogger(__name__)
 
 """
@@ -97,6 +110,180 @@ def encrypt_file(filename, remove_original=True):
     return dest
 
 
+def decrypt_file(tmpdir, filename):
+    source = filename
+    (dest, ext) = os.path.splitext(filename)
+
+    if ext != '.gpg':
+        raise admintool.ScriptError('Trying to decrypt a non-gpg file')
+
+    dest = os.path.basename(dest)
+    dest = os.path.join(tmpdir, dest)
+
+    args = [
+        paths.GPG2,
+        '--batch',
+        '--output', dest,
+        '--decrypt', source,
+    ]
+
+    result = run(args, raiseonerr=False)
+    if result.returncode != 0:
+        raise admintool.ScriptError('gpg failed: %s' % result.error_log)
+
+    return dest
+
+
+def get_compressor():
+    '''
+    Return the path of the multi-threaded gzip compressor, or None when
+    it is not installed and tar has to compress with gzip itself.
+    '''
+    if os.path.isfile(paths.PIGZ) and os.access(paths.PIGZ, os.X_OK):
+        return paths.PIGZ
+    return None
+
+
+def run_compressed(args, compressor, filename, cwd=None):
+    '''
+    Run the tar command args, which writes the archive to its standard
+    output, and compress the archive into filename on the fly.
+
+    No uncompressed copy of the archive is ever written to disk.
+    '''
+    logger.debug('Starting external process')
+    logger.debug('args=%s | %s -c > %s', ' '.join(args), compressor,
+                 filename)
+    with open(filename, 'wb') as out, \
+            tempfile.TemporaryFile() as tar_err, \
+            tempfile.TemporaryFile() as compressor_err:
+        tar = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=tar_err,
+                               cwd=cwd)
+        try:
+            compress = subprocess.Popen([compressor, '-c'], stdin=tar.stdout,
+                                        stdout=out, stderr=compressor_err)
+        except OSError:
+            tar.kill()
+            tar.wait()
+            raise
+        finally:
+            # only the compressor reads the pipe from now on
+            tar.stdout.close()
+
+        compress_rc = compress.wait()
+        tar_rc = tar.wait()
+
+        if tar_rc != 0:
+            tar_err.seek(0)
+            raise admintool.ScriptError(
+                'tar returned non-zero code %d: %s' %
+                (tar_rc, tar_err.read().decode('utf-8', 'replace')))
+        if compress_rc != 0:
+            compressor_err.seek(0)
+            raise admintool.ScriptError(
+                '%s returned non-zero code %d when compressing %s: %s' %
+                (compressor, compress_rc, filename,
+                 compressor_err.read().decode('utf-8', 'replace')))
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(MANIFEST_HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def create_manifest(roots, exclude=(), previous=None):
+    '''
+    Describe every file, directory and link under the paths in roots.
+
+    The result maps an absolute path to [size, mtime_ns, mode, uid, gid,
+    content] where content is the SHA-256 of a regular file, 'link:TARGET'
+    for a symbolic link, 'dir' for a directory and 'special' otherwise.
+
+    The content hash of a file listed in the previous manifest with the
+    same size and modification time is reused instead of reading the file
+    again.
+    '''
+    previous = previous or {}
+    exclude = set(exclude)
+    manifest = {}
+
+    def add(path):
+        try:
+            st = os.lstat(path)
+            if stat.S_ISREG(st.st_mode):
+                old = previous.get(path)
+                if (old is not None and stat.S_ISREG(old[2]) and
+                        old[0] == st.st_size and old[1] == st.st_mtime_ns):
+                    content = old[5]
+                else:
+                    content = _sha256(path)
+            elif stat.S_ISLNK(st.st_mode):
+                content = 'link:' + os.readlink(path)
+            elif stat.S_ISDIR(st.st_mode):
+                content = 'dir'
+            else:
+                content = 'special'
+        except FileNotFoundError:
+            # removed while we were walking, tar will not see it either
+            return None
+        manifest[path] = [st.st_size, st.st_mtime_ns, st.st_mode,
+                          st.st_uid, st.st_gid, content]
+        return content
+
+    for root in roots:
+        if root in exclude or add(root) != 'dir':
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [
+                d for d in dirnames if os.path.join(dirpath, d) not in exclude
+            ]
+            for name in dirnames + filenames:
+                add(os.path.join(dirpath, name))
+
+    return manifest
+
+
+def changed_files(manifest, previous):
+    '''
+    Return the paths in manifest which must be archived on top of the
+    backup described by previous.
+
+    Directories and special files are always included so that their
+    ownership and permissions are restored.
+    '''
+    return sorted(
+        path for path, entry in manifest.items()
+        if entry[5] in MANIFEST_NON_FILES or
+        previous.get(path, [None] * 6)[2:] != entry[2:]
+    )
+
+
+def write_manifest(filename, manifest, roots, base=None):
+    with open(filename, 'w') as f:
+        json.dump(
+            {'version': MANIFEST_VERSION, 'base': base, 'roots': roots,
+             'files': manifest},
+            f
+        )
+
+
+def read_manifest(filename):
+    '''
+    Return the files, the backed up root paths and the base backup name
+    of a manifest
+    '''
+    with open(filename) as f:
+        data = json.load(f)
+    if data.get('version') != MANIFEST_VERSION:
+        raise admintool.ScriptError(
+            'Unsupported manifest version in %s' % filename
+        )
+    return data['files'], data['roots'], data.get('base')
+
+
 class Backup(admintool.AdminTool):
     command_name = 'ipa-backup'
     log_file_name = paths.IPABACKUP_LOG
@@ -237,6 +424,8 @@ class Backup(admintool.AdminTool):
         self.files = list(self.files)
         self.dirs = list(self.dirs)
         self.logs = list(self.logs)
+        self.base_dir = None
+        self.base_manifest = None
 
     @classmethod
     def add_options(cls, parser):
@@ -258,6 +447,10 @@ class Backup(admintool.AdminTool):
             "--online", dest="online", action="store_true",
             default=False,
             help="Perform the LDAP backups online, for data only.")
+        parser.add_option(
+            "--incremental", dest="incremental", metavar="BACKUP",
+            help="Back up only the files changed since the given full "
+                 "backup")
         parser.add_option(
             "--disable-role-check", dest="rolecheck", action="store_false",
             default=True,
@@ -294,6 +487,21 @@ class Backup(admintool.AdminTool):
             self.option_parser.error("You cannot specify --data "
                 "with --logs")
 
+        if options.incremental:
+            if options.data_only:
+                self.option_parser.error("You cannot specify --data "
+                    "with --incremental")
+            base_dir = options.incremental
+            if not os.path.isabs(base_dir):
+                base_dir = os.path.join(paths.IPA_BACKUP_DIR, base_dir)
+            base_dir = os.path.normpath(base_dir)
+            config = SafeConfigParser()
+            if (not config.read(os.path.join(base_dir, 'header')) or
+                    config.get('ipa', 'type', fallback=None) != 'FULL'):
+                self.option_parser.error(
+                    "%s is not a full backup" % options.incremental)
+            self.base_dir = base_dir
+
     def run(self):
         options = self.options
         super(Backup, self).run()
@@ -326,6 +534,9 @@ class Backup(admintool.AdminTool):
             self.check_roles(raiseonerr=options.rolecheck)
 
             self.create_header(options.data_only)
+            if self.base_dir:
+                # read it while the services are still running
+                self.base_manifest = self.read_base_manifest()
             if options.data_only:
                 if not options.online:
                     logger.info('Stopping Directory Server')
@@ -337,11 +548,7 @@ class Backup(admintool.AdminTool):
             instance = ipaldap.realm_to_serverid(api.env.realm)
             if os.path.exists(paths.VAR_LIB_SLAPD_INSTANCE_DIR_TEMPLATE %
                               instance):
-                if os.path.exists(paths.SLAPD_INSTANCE_DB_DIR_TEMPLATE %
-                                  (instance, 'ipaca')):
-                    self.db2ldif(instance, 'ipaca', online=options.online)
-                self.db2ldif(instance, 'userRoot', online=options.online)
-                self.db2bak(instance, online=options.online)
+                self.export_databases(instance, online=options.online)
             if not options.data_only:
                 # create backup of auth configuration
                 auth_backup_path = os.path.join(paths.VAR_LIB_IPA, 'auth_backup')
@@ -486,6 +693,41 @@ class Backup(admintool.AdminTool):
 
         return self._conn
 
+    def export_databases(self, instance, online=True):
+        '''
+        Export the LDIF of every backend and the BAK of this instance.
+
+        Online the LDIF export tasks of the backends run concurrently in
+        389-ds, the BAK export follows once they are finished. Offline
+        they run one after another, dsctl must not open the same database
+        environment from several processes at once.
+        '''
+        backends = []
+        if os.path.exists(paths.SLAPD_INSTANCE_DB_DIR_TEMPLATE %
+                          (instance, 'ipaca')):
+            backends.append('ipaca')
+        backends.append('userRoot')
+
+        start = time.time()
+        if online:
+            self.get_connection()
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=len(backends)) as executor:
+                futures = [
+                    executor.submit(self.db2ldif, instance, backend,
+                                    online=True)
+                    for backend in backends
+                ]
+            # re-raise the first failure, all exports are finished by now
+            for future in futures:
+                future.result()
+        else:
+            for backend in backends:
+                self.db2ldif(instance, backend, online=False)
+        self.db2bak(instance, online=online)
+        logger.debug('Databases exported in %.2f seconds',
+                     time.time() - start)
+
     def db2ldif(self, instance, backend, online=True):
         '''
         Create a LDIF backup of the data in this instance.
@@ -497,7 +739,9 @@ class Backup(admintool.AdminTool):
         '''
         logger.info('Backing up %s in %s to LDIF', backend, instance)
 
-        cn = time.strftime('export_%Y_%m_%d_%H_%M_%S')
+        # the backend makes the name unique among concurrent exports
+        cn = 'export_%s_%s' % (backend,
+                               time.strftime('%Y_%m_%d_%H_%M_%S'))
         dn = DN(('cn', cn), ('cn', 'export'), ('cn', 'tasks'), ('cn', 'config'))
 
         ldifname = '%s-%s.ldif' % (instance, backend)
@@ -629,55 +873,106 @@ class Backup(admintool.AdminTool):
         def verify_directories(dirs):
             return [s for s in dirs if s and os.path.exists(s)]
 
-        self.tarfile = os.path.join(self.dir, 'files.tar')
+        compressor = get_compressor()
+        tarfile = os.path.join(self.dir, 'files.tar')
+        exclude = [paths.IPA_BACKUP_DIR]
+
+        roots = verify_directories(self.dirs) + verify_directories(self.files)
+        if options.logs:
+            roots.extend(verify_directories(self.logs))
+        # The necessary directory structure is backed up without the
+        # files in it.
+        missing_directories = verify_directories(self.required_dirs)
 
-        logger.info("Backing up files")
         args = ['tar',
                 '--exclude=%s' % paths.IPA_BACKUP_DIR,
                 '--xattrs',
                 '--selinux',
                 '-cf',
-                self.tarfile
+                '-' if compressor else tarfile,
                ]
 
-        args.extend(verify_directories(self.dirs))
-        args.extend(verify_directories(self.files))
-
-        if options.logs:
-            args.extend(verify_directories(self.logs))
-
-        result = run(args, raiseonerr=False)
-        if result.returncode != 0:
-            raise admintool.ScriptError('tar returned non-zero code %d: %s' %
-                                        (result.returncode, result.error_log))
-
-        # Backup the necessary directory structure. This is a separate
-        # call since we are using the '--no-recursion' flag to store
-        # the directory structure only, no files.
-        missing_directories = verify_directories(self.required_dirs)
-
-        if missing_directories:
-            args = ['tar',
-                    '--exclude=%s' % paths.IPA_BACKUP_DIR,
-                    '--xattrs',
-                    '--selinux',
-                    '--no-recursion',
-                    '-rf',  # -r appends to an existing archive
-                    self.tarfile,
-                   ]
-            args.extend(missing_directories)
+        start = time.time()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            if self.base_manifest is None:
+                logger.info("Backing up files")
+                # hash the files while tar is reading them
+                manifest = executor.submit(create_manifest, roots, exclude)
+                args.extend(roots)
+                if missing_directories:
+                    # '--no-recursion' only applies to the names after it
+                    args.append('--no-recursion')
+                    args.extend(missing_directories)
+            else:
+                logger.info("Backing up files changed since %s",
+                            self.base_dir)
+                manifest = create_manifest(roots, exclude, self.base_manifest)
+                members = changed_files(manifest, self.base_manifest)
+                members.extend(
+                    d for d in missing_directories if d not in manifest)
+                logger.info("%d of %d files and directories changed",
+                            len(members), len(manifest))
+                listfile = os.path.join(self.top_dir, 'files.list')
+                with open(listfile, 'w') as f:
+                    f.write(''.join('%s\0' % m for m in members))
+                args.extend(['--no-recursion', '--null', '-T', listfile])
+
+            if compressor:
+                run_compressed(args, compressor, tarfile)
+            else:
+                result = run(args, raiseonerr=False)
+                if result.returncode != 0:
+                    raise admintool.ScriptError(
+                        'tar returned non-zero code %d: %s' %
+                        (result.returncode, result.error_log))
+                # compressed by compress_file_backup() once the services
+                # are running again
+                self.tarfile = tarfile
+
+            if self.base_manifest is None:
+                manifest = manifest.result()
+
+        write_manifest(
+            os.path.join(self.dir, MANIFEST_NAME), manifest, roots,
+            base=os.path.basename(self.base_dir) if self.base_dir else None
+        )
+        logger.debug('Files backed up in %.2f seconds', time.time() - start)
 
-            result = run(args, raiseonerr=False)
+    def read_base_manifest(self):
+        '''
+        Read the file manifest of the base of an incremental backup,
+        decrypting the base backup if necessary.
+        '''
+        filename = os.path.join(self.base_dir, 'ipa-full.tar')
+        workdir = tempfile.mkdtemp(dir=self.top_dir)
+        try:
+            if not os.path.exists(filename):
+                if not os.path.exists(filename + '.gpg'):
+                    raise admintool.ScriptError(
+                        'Unable to find backup file in %s' % self.base_dir)
+                logger.info('Decrypting %s', filename + '.gpg')
+                filename = decrypt_file(workdir, filename + '.gpg')
+
+            args = ['tar', '-xzf', filename, '--occurrence',
+                    './' + MANIFEST_NAME]
+            result = run(args, raiseonerr=False, cwd=workdir)
             if result.returncode != 0:
                 raise admintool.ScriptError(
-                    'tar returned non-zero code %d '
-                    'when adding directory structure: %s' %
-                    (result.returncode, result.error_log))
+                    'Backup %s has no file manifest, it cannot be the base '
+                    'of an incremental backup' % self.base_dir)
+
+            manifest, _roots, _base = read_manifest(
+                os.path.join(workdir, MANIFEST_NAME))
+        finally:
+            shutil.rmtree(workdir)
+
+        return manifest
 
     def compress_file_backup(self):
 
-        # Compress the archive. This is done separately, since 'tar' cannot
-        # append to a compressed archive.
+        # Without a multi-threaded compressor the archive is written
+        # uncompressed while the services are stopped and gzipped here,
+        # after they are started again.
         if self.tarfile:
             result = run([paths.GZIP, self.tarfile], raiseonerr=False)
             if result.returncode != 0:
@@ -706,6 +1001,8 @@ class Backup(admintool.AdminTool):
         config.set('ipa', 'host', api.env.host)
         config.set('ipa', 'ipa_version', str(version.VERSION))
         config.set('ipa', 'version', '1')
+        if self.base_dir:
+            config.set('ipa', 'base', os.path.basename(self.base_dir))
 
         dn = DN(('cn', api.env.host), api.env.container_masters,
                 api.env.basedn)
@@ -763,15 +1060,20 @@ class Backup(admintool.AdminTool):
                 'Unexpected error: %s' % e
             )
 
-        args = [
-            'tar', '--xattrs', '--selinux', '-czf', filename, '.'
-        ]
-        result = run(args, raiseonerr=False, cwd=self.dir)
-        if result.returncode != 0:
-            raise admintool.ScriptError(
-                'tar returned non-zero code %s: %s' %
-                (result.returncode, result.error_log)
-            )
+        compressor = get_compressor()
+        if compressor:
+            args = ['tar', '--xattrs', '--selinux', '-cf', '-', '.']
+            run_compressed(args, compressor, filename, cwd=self.dir)
+        else:
+            args = [
+                'tar', '--xattrs', '--selinux', '-czf', filename, '.'
+            ]
+            result = run(args, raiseonerr=False, cwd=self.dir)
+            if result.returncode != 0:
+                raise admintool.ScriptError(
+                    'tar returned non-zero code %s: %s' %
+                    (result.returncode, result.error_log)
+                )
         if encrypt:
             logger.info('Encrypting %s', filename)
             filename = encrypt_file(filename)
@@ -27,6 +27,7 @@ from __future__ import print_function, absolute_import
 
 import logging
 import os
+import sys
 
 import six
 
@@ -58,6 +59,11 @@ class LDAPUpdater(admintool.AdminTool):
         parser.add_option(
             "-S", '--schema-file', action="append", dest="schema_files",
             help="custom schema ldif file to use")
+        parser.add_option(
+            "-n", '--dry-run', action="store_true", dest="dry_run",
+            default=False,
+            help="print the changes which would be made in LDIF format "
+                 "and a per-file timing report, do not change anything")
 
     @classmethod
     def get_command_class(cls, options, args):
@@ -72,6 +78,10 @@ class LDAPUpdater(admintool.AdminTool):
 
         self.files = self.args
 
+        if options.dry_run and (options.upgrade or options.schema_files):
+            raise admintool.ScriptError(
+                "--dry-run cannot be used with --upgrade or --schema-file")
+
         if not (self.files or options.schema_files):
             logger.info("To execute overall IPA upgrade please use "
                         "'ipa-server-upgrade' command")
@@ -143,15 +153,32 @@ class LDAPUpdater_NonUpgrade(LDAPUpdater):
                 options.schema_files,
                 ldapi=True) or modified
 
-        ld = LDAPUpdate()
+        ld = LDAPUpdate(dry_run=options.dry_run, dry_run_output=sys.stdout)
         if not self.files:
             self.files = ld.get_all_files(UPDATES_DIR)
 
         modified = ld.update(self.files) or modified
 
-        if modified:
+        if options.dry_run:
+            self.print_timings(ld.timings)
+            if modified:
+                logger.info('Dry run complete, data would be modified')
+            else:
+                logger.info('Dry run complete, no data would be modified')
+        elif modified:
             logger.info('Update complete')
         else:
             logger.info('Update complete, no data were modified')
 
         api.Backend.ldap2.disconnect()
+
+    def print_timings(self, timings):
+        print("%-60s %8s %8s %9s" % ("File", "Updates", "Changes", "Seconds"))
+        for filename, updates, changes, duration in timings:
+            print("%-60s %8d %8d %9.3f" % (
+                os.path.basename(filename), updates, changes, duration))
+        print("%-60s %8d %8d %9.3f" % (
+            "Total",
+            sum(t[1] for t in timings),
+            sum(t[2] for t in timings),
+            sum(t[3] for t in timings)))
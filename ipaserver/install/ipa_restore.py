@@ -19,9 +19,13 @@
 
 from __future__ import absolute_import, print_function
 
+import concurrent.futures
+import errno
+import io
 import logging
 import optparse  # pylint: disable=deprecated-module
 import os
+import re
 import shutil
 import sys
 import tempfile
@@ -42,6 +46,8 @@ from ipaserver.install.replication import (wait_for_task, ReplicationManager,
                                            get_cs_replication_manager)
 from ipaserver.install import installutils, ldapupdate
 from ipaserver.install import dsinstance, httpinstance, cainstance, krbinstance
+from ipaserver.install.ipa_backup import (
+    MANIFEST_NAME, decrypt_file, read_manifest)
 from ipaserver.masters import get_masters
 from ipapython import ipaldap
 import ipapython.errors
@@ -65,6 +71,21 @@ else:
 
 logger = logging.getLogger(__name__)
 
+# nsUniqueId of the replica update vector tombstone entries
+RUV_UNIQUEID_RE = re.compile(br'ffffffff-ffffffff-ffffffff-ffffffff',
+                             re.IGNORECASE)
+LDIF_FILTER_CHUNK = 4 * 1024 * 1024
+# seconds between progress reports of long running steps
+PROGRESS_INTERVAL = 10
+
+
+def is_under_roots(path, roots):
+    '''Return True if path is one of roots or lies in one of them'''
+    return any(
+        path == root or path.startswith(root.rstrip('/') + '/')
+        for root in roots
+    )
+
 
 def recursive_chown(path, uid, gid):
     '''
@@ -79,30 +100,6 @@ def recursive_chown(path, uid, gid):
             os.chmod(os.path.join(root, file), 0o640)
 
 
-def decrypt_file(tmpdir, filename):
-    source = filename
-    (dest, ext) = os.path.splitext(filename)
-
-    if ext != '.gpg':
-        raise admintool.ScriptError('Trying to decrypt a non-gpg file')
-
-    dest = os.path.basename(dest)
-    dest = os.path.join(tmpdir, dest)
-
-    args = [
-        paths.GPG2,
-        '--batch',
-        '--output', dest,
-        '--decrypt', source,
-    ]
-
-    result = run(args, raiseonerr=False)
-    if result.returncode != 0:
-        raise admintool.ScriptError('gpg failed: %s' % result.error_log)
-
-    return dest
-
-
 class RemoveRUVParser(ldif.LDIFParser):
     def __init__(self, input_file, writer):
         ldif.LDIFParser.__init__(self, input_file)
@@ -130,6 +127,58 @@ class RemoveRUVParser(ldif.LDIFParser):
         self.writer.unparse(dn, entry)
 
 
+def _remove_ruv_record(record, out_file):
+    text = io.StringIO()
+    RemoveRUVParser(io.BytesIO(record), ldif.LDIFWriter(text)).parse()
+    out_file.write(text.getvalue().encode('utf-8'))
+
+
+def remove_ruv(in_file, out_file, progress=None):
+    '''
+    Copy the LDIF in binary in_file to out_file without the RUV entries.
+
+    The input is read in chunks and only the records which contain the
+    nsUniqueId of a RUV go through RemoveRUVParser, everything else is
+    copied verbatim. progress is called with the number of bytes read so
+    far after every chunk.
+    '''
+    pending = b''
+    total = 0
+    while True:
+        chunk = in_file.read(LDIF_FILTER_CHUNK)
+        total += len(chunk)
+        data = pending + chunk
+        if chunk:
+            # keep the incomplete last record for the next round
+            end = data.rfind(b'\n\n')
+            if end < 0:
+                pending = data
+                continue
+            pending = data[end + 2:]
+            data = data[:end + 2]
+        else:
+            pending = b''
+
+        pos = 0
+        for match in RUV_UNIQUEID_RE.finditer(data):
+            if match.start() < pos:
+                # another match within an already filtered record
+                continue
+            start = data.rfind(b'\n\n', pos, match.start())
+            start = pos if start < 0 else start + 2
+            end = data.find(b'\n\n', match.end())
+            end = len(data) if end < 0 else end + 2
+            out_file.write(data[pos:start])
+            _remove_ruv_record(data[start:end], out_file)
+            pos = end
+        out_file.write(data[pos:])
+
+        if progress is not None:
+            progress(total)
+        if not chunk:
+            break
+
+
 class Restore(admintool.AdminTool):
     command_name = 'ipa-restore'
     log_file_name = paths.IPARESTORE_LOG
@@ -155,6 +204,8 @@ class Restore(admintool.AdminTool):
     def __init__(self, options, args):
         super(Restore, self).__init__(options, args)
         self._conn = None
+        # extracted base backups of an incremental backup, oldest first
+        self.base_backups = []
 
     @classmethod
     def add_options(cls, parser):
@@ -252,6 +303,7 @@ class Restore(admintool.AdminTool):
         self.backup_dir = self.args[0]
         if not os.path.isabs(self.backup_dir):
             self.backup_dir = os.path.join(paths.IPA_BACKUP_DIR, self.backup_dir)
+        self.backup_dir = os.path.normpath(self.backup_dir)
 
         logger.info("Preparing restore from %s on %s",
                     self.backup_dir, FQDN)
@@ -371,6 +423,7 @@ class Restore(admintool.AdminTool):
             self.extract_backup()
 
             if restore_type == 'FULL':
+                self.extract_base_backups()
                 self.restore_default_conf()
                 self.init_api(confdir=self.dir + paths.ETC_IPA)
 
@@ -444,8 +497,7 @@ class Restore(admintool.AdminTool):
 
             # Always restore the data from ldif
             # We need to restore both userRoot and ipaca.
-            for instance, backend in databases:
-                self.ldif2db(instance, backend, online=options.online)
+            self.restore_databases(databases, online=options.online)
 
             if restore_type != 'FULL':
                 if not options.online:
@@ -586,37 +638,108 @@ class Restore(admintool.AdminTool):
                     repl.disable_agreement(host)
 
 
-    def ldif2db(self, instance, backend, online=True):
+    def restore_databases(self, databases, online=True):
         '''
-        Restore a LDIF backup of the data in this instance.
+        Restore the LDIF backups of the (instance, backend) databases.
 
-        If executed online create a task and wait for it to complete.
+        The RUVs are removed from all LDIFs concurrently. Online the
+        import tasks run concurrently as well; offline each backend is
+        imported as soon as its LDIF is ready, one at a time, because
+        dsctl must not open the same database environment from several
+        processes at once.
         '''
-        logger.info('Restoring from %s in %s', backend, instance)
+        if not databases:
+            return
 
-        cn = time.strftime('import_%Y_%m_%d_%H_%M_%S')
-        dn = DN(('cn', cn), ('cn', 'import'), ('cn', 'tasks'), ('cn', 'config'))
+        start = time.time()
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(databases)) as executor:
+            prepared = [
+                executor.submit(self.prepare_ldif, instance, backend)
+                for instance, backend in databases
+            ]
+            if online:
+                self.get_connection()
+                imports = [
+                    executor.submit(self.ldif2db, instance, backend,
+                                    online=True, ldiffile=future.result())
+                    for (instance, backend), future in zip(databases,
+                                                           prepared)
+                ]
+                for future in imports:
+                    future.result()
+            else:
+                for (instance, backend), future in zip(databases, prepared):
+                    self.ldif2db(instance, backend, online=False,
+                                 ldiffile=future.result())
 
+        logger.info('Restored %d databases in %.1f seconds',
+                    len(databases), time.time() - start)
+
+    def prepare_ldif(self, instance, backend):
+        '''
+        Copy the LDIF backup of backend to the 389-ds LDIF directory of
+        instance without the RUV entries and return its path.
+        '''
         ldifdir = paths.SLAPD_INSTANCE_LDIF_DIR_TEMPLATE % instance
         ldifname = '%s-%s.ldif' % (instance, backend)
         ldiffile = os.path.join(ldifdir, ldifname)
         srcldiffile = os.path.join(self.dir, ldifname)
 
         if not os.path.exists(ldifdir):
-            os.mkdir(ldifdir)
-            os.chmod(ldifdir, 0o770)
-            constants.DS_USER.chown(ldifdir)
+            try:
+                os.mkdir(ldifdir)
+            except FileExistsError:
+                # created for another backend meanwhile
+                pass
+            else:
+                os.chmod(ldifdir, 0o770)
+                constants.DS_USER.chown(ldifdir)
+
+        size = os.path.getsize(srcldiffile)
+        start = last = time.time()
+
+        def progress(done):
+            nonlocal last
+            now = time.time()
+            if now - last >= PROGRESS_INTERVAL:
+                last = now
+                logger.info('Filtering %s: %d of %d MiB (%.1f MiB/s)',
+                            ldifname, done >> 20, size >> 20,
+                            (done >> 20) / (now - start))
 
         ipautil.backup_file(ldiffile)
-        with open(ldiffile, 'w') as out_file:
-            ldif_writer = ldif.LDIFWriter(out_file)
+        with open(ldiffile, 'wb') as out_file:
             with open(srcldiffile, 'rb') as in_file:
-                ldif_parser = RemoveRUVParser(in_file, ldif_writer)
-                ldif_parser.parse()
+                remove_ruv(in_file, out_file, progress)
+
+        elapsed = time.time() - start
+        logger.info('Filtered %s (%d MiB) in %.1f seconds (%.1f MiB/s)',
+                    ldifname, size >> 20, elapsed,
+                    (size >> 20) / max(elapsed, 0.001))
 
         # Make sure the modified ldiffile is owned by DS_USER
         constants.DS_USER.chown(ldiffile)
 
+        return ldiffile
+
+    def ldif2db(self, instance, backend, online=True, ldiffile=None):
+        '''
+        Restore a LDIF backup of the data in this instance.
+
+        If executed online create a task and wait for it to complete.
+        '''
+        if ldiffile is None:
+            ldiffile = self.prepare_ldif(instance, backend)
+
+        logger.info('Restoring from %s in %s', backend, instance)
+
+        # the backend makes the name unique among concurrent imports
+        cn = 'import_%s_%s' % (backend,
+                               time.strftime('%Y_%m_%d_%H_%M_%S'))
+        dn = DN(('cn', cn), ('cn', 'import'), ('cn', 'tasks'), ('cn', 'config'))
+
+        start = time.time()
         if online:
             conn = self.get_connection()
             ent = conn.make_entry(
@@ -660,6 +783,8 @@ class Restore(admintool.AdminTool):
             if result.returncode != 0:
                 logger.critical("ldif2db failed: %s", result.error_log)
 
+        logger.info('Imported %s in %s in %.1f seconds', backend, instance,
+                    time.time() - start)
 
     def bak2db(self, instance, backend, online=True):
         '''
@@ -720,14 +845,19 @@ class Restore(admintool.AdminTool):
         Primary purpose of this method is to get configuration for api
         finalization when restoring ipa after uninstall.
         '''
-        args = ['tar',
-                '--xattrs',
-                '--selinux',
-                '-xzf',
-                os.path.join(self.dir, 'files.tar'),
-                paths.IPA_DEFAULT_CONF[1:],
-                ]
-        result = run(args, raiseonerr=False, cwd=self.dir)
+        # an incremental backup only has the file if it changed since
+        # the base backup
+        for backup in [self.dir] + self.base_backups[::-1]:
+            args = ['tar',
+                    '--xattrs',
+                    '--selinux',
+                    '-xzf',
+                    os.path.join(backup, 'files.tar'),
+                    paths.IPA_DEFAULT_CONF[1:],
+                    ]
+            result = run(args, raiseonerr=False, cwd=self.dir)
+            if result.returncode == 0:
+                break
 
         if result.returncode != 0:
             logger.critical('Restoring %s failed: %s',
@@ -742,14 +872,14 @@ class Restore(admintool.AdminTool):
             try:
                 shutil.rmtree(d)
             except OSError as e:
-                if e.errno != 2:  # 2: dir does not exist
+                if e.errno != errno.ENOENT:
                     logger.warning("Could not remove directory: %s (%s)", d, e)
 
         for f in self.FILES_TO_BE_REMOVED:
             try:
                 os.remove(f)
             except OSError as e:
-                if e.errno != 2:  # 2: file does not exist
+                if e.errno != errno.ENOENT:
                     logger.warning("Could not remove file: %s (%s)", f, e)
 
     def clear_old_files(self):
@@ -771,19 +901,56 @@ class Restore(admintool.AdminTool):
         databases.
         '''
         logger.info("Restoring files")
-        args = ['tar',
-                '--xattrs',
-                '--selinux',
-                '-xzf',
-                os.path.join(self.dir, 'files.tar')
-                ]
-        if nologs:
-            args.append('--exclude')
-            args.append('var/log')
+        # the files of an incremental backup go on top of its bases
+        for backup in self.base_backups + [self.dir]:
+            args = ['tar',
+                    '--xattrs',
+                    '--selinux',
+                    '-xzf',
+                    os.path.join(backup, 'files.tar')
+                    ]
+            if nologs:
+                args.append('--exclude')
+                args.append('var/log')
+
+            result = run(args, cwd='/', raiseonerr=False)
+            if result.returncode != 0:
+                logger.critical('Restoring files failed: %s',
+                                result.error_log)
 
-        result = run(args, cwd='/', raiseonerr=False)
-        if result.returncode != 0:
-            logger.critical('Restoring files failed: %s', result.error_log)
+        if self.base_backups:
+            self.remove_deleted_files(nologs)
+
+    def remove_deleted_files(self, nologs=False):
+        '''
+        Remove the files restored from the base backups which no longer
+        existed when the incremental backup was made.
+
+        Only files under the paths backed up by both the base and the
+        incremental backup are considered, a path missing from one of
+        them (e.g. the logs) says nothing about the files in it.
+        '''
+        manifest, roots, _base = read_manifest(
+            os.path.join(self.dir, MANIFEST_NAME))
+        deleted = set()
+        for backup in self.base_backups:
+            files, base_roots, _base = read_manifest(
+                os.path.join(backup, MANIFEST_NAME))
+            common = set(roots) & set(base_roots)
+            deleted.update(
+                path for path, entry in files.items()
+                if entry[5] != 'dir' and is_under_roots(path, common)
+            )
+        deleted.difference_update(manifest)
+
+        for path in sorted(deleted):
+            if nologs and path.startswith('/var/log/'):
+                continue
+            try:
+                os.remove(path)
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    logger.warning("Could not remove file: %s (%s)", path, e)
 
     def read_header(self):
         '''
@@ -801,43 +968,82 @@ class Restore(admintool.AdminTool):
         # we can assume that returned object is string and it has .split()
         # method
         self.backup_services = config.get('ipa', 'services').split(',')
+        # name of the backup an incremental backup is based on
+        self.backup_base = config.get('ipa', 'base', fallback=None)
 
     def extract_backup(self):
         '''
         Extract the contents of the tarball backup into a temporary location,
         decrypting if necessary.
         '''
-
-        encrypt = False
-        filename = None
         if self.backup_type == 'FULL':
-            filename = os.path.join(self.backup_dir, 'ipa-full.tar')
+            name = 'ipa-full.tar'
         else:
-            filename = os.path.join(self.backup_dir, 'ipa-data.tar')
+            name = 'ipa-data.tar'
+        self.extract_archive(self.backup_dir, name, self.dir)
+
+        constants.DS_USER.chown(self.top_dir)
+        recursive_chown(
+            self.dir, constants.DS_USER.uid, constants.DS_USER.pgid
+        )
+
+    def extract_base_backups(self):
+        '''
+        Extract the file archives and manifests of the backups an
+        incremental backup is based on.
+
+        The base backups are looked up in the directory of the incremental
+        backup.
+        '''
+        base = self.backup_base
+        seen = {self.backup_dir}
+        while base:
+            backup_dir = os.path.join(os.path.dirname(self.backup_dir), base)
+            if backup_dir in seen:
+                raise admintool.ScriptError(
+                    'Backup %s is its own base' % backup_dir)
+            seen.add(backup_dir)
+
+            config = SafeConfigParser()
+            if not config.read(os.path.join(backup_dir, 'header')):
+                raise admintool.ScriptError(
+                    'Cannot read metadata of base backup %s' % backup_dir)
+
+            logger.info('Extracting base backup %s', backup_dir)
+            dest = os.path.join(self.top_dir, base)
+            os.mkdir(dest, 0o700)
+            self.extract_archive(backup_dir, 'ipa-full.tar', dest,
+                                 members=['./files.tar', './' + MANIFEST_NAME])
+            self.base_backups.insert(0, dest)
+
+            base = config.get('ipa', 'base', fallback=None)
+
+    def extract_archive(self, backup_dir, name, dest, members=('.',)):
+        '''
+        Extract members of the backup archive name in backup_dir into dest,
+        decrypting the archive if necessary.
+        '''
+        encrypt = False
+        filename = os.path.join(backup_dir, name)
         if not os.path.exists(filename):
             if not os.path.exists(filename + '.gpg'):
-                raise admintool.ScriptError('Unable to find backup file in %s' % self.backup_dir)
+                raise admintool.ScriptError('Unable to find backup file in %s' % backup_dir)
             else:
                 filename = filename + '.gpg'
                 encrypt = True
 
         if encrypt:
             logger.info('Decrypting %s', filename)
-            filename = decrypt_file(self.dir, filename)
+            filename = decrypt_file(dest, filename)
 
         args = ['tar',
                 '--xattrs',
                 '--selinux',
                 '-xzf',
                 filename,
-                '.'
                 ]
-        run(args, cwd=self.dir)
-
-        constants.DS_USER.chown(self.top_dir)
-        recursive_chown(
-            self.dir, constants.DS_USER.uid, constants.DS_USER.pgid
-        )
+        args.extend(members)
+        run(args, cwd=dest)
 
         if encrypt:
             # We can remove the decoded tarball
@@ -33,6 +33,7 @@ import fnmatch
 import warnings
 
 from pysss_murmur import murmurhash3
+import ldap
 import six
 
 from ipapython import ipautil, ipaldap
@@ -52,6 +53,8 @@ logger = logging.getLogger(__name__)
 
 UPDATES_DIR=paths.UPDATES_DIR
 UPDATE_SEARCH_TIME_LIMIT = 30  # seconds
+# maximum number of entries prefetched with a single search
+UPDATE_PREFETCH_BATCH_SIZE = 100
 
 
 def get_sub_dict(realm, domain, suffix, fqdn, idstart=None, idmax=None):
@@ -238,7 +241,8 @@ class LDAPUpdate:
     ldapi_autobind_suffix = DN(('cn', 'auto_bind'), ('cn', 'config'))
 
     def __init__(self, dm_password=_sentinel, sub_dict=None,
-                 online=_sentinel, ldapi=_sentinel, api=api):
+                 online=_sentinel, ldapi=_sentinel, api=api, dry_run=False,
+                 dry_run_output=None):
         '''
         :parameters:
             dm_password
@@ -251,6 +255,13 @@ class LDAPUpdate:
                 deprecated and no longer used
             api
                 bootstrapped API object (for configuration)
+            dry_run
+                do not change anything, write the changes which would be
+                made in LDIF format to dry_run_output instead. Update
+                plugins are skipped.
+            dry_run_output
+                text stream the changes of a dry run are written to, they
+                are discarded when not given
 
         Data Structure Example:
         -----------------------
@@ -354,6 +365,10 @@ class LDAPUpdate:
         Either may make changes directly in LDAP or can return updates in
         update format.
 
+        Before the updates from a file are applied, their target entries are
+        prefetched with one search per parent entry. Entries which are not
+        prefetched are retrieved one by one.
+
         '''
         if any(arg is not _sentinel for arg in (dm_password, online, ldapi)):
             warnings.warn(
@@ -364,6 +379,12 @@ class LDAPUpdate:
         self.sub_dict = sub_dict if sub_dict is not None else {}
         self.conn = None
         self.modified = False
+        self.dry_run = dry_run
+        self.dry_run_output = dry_run_output
+        # (file name, number of updates, number of changes, seconds)
+        self.timings = []
+        self._changes = 0
+        self._prefetched = {}
         self.ldapuri = ipaldap.realm_to_ldapi_uri(api.env.realm)
 
         self.api = create_api(mode=None)
@@ -709,6 +730,100 @@ class LDAPUpdate:
 
         return self.conn.get_entries(dn, scope, searchfilter, sattrs)
 
+    def _prefetch_entries(self, all_updates):
+        """Retrieve the target entries of updates in bulk
+
+        The target entries are grouped by their parent and looked up with a
+        one-level search per parent (and UPDATE_PREFETCH_BATCH_SIZE entries)
+        instead of a base search per entry. Each prefetched entry is used by
+        the first update of its DN only, later updates of the same DN and
+        entries which were not found retrieve the entry again, as it may have
+        been changed or created in the meantime.
+        """
+        self._prefetched = {}
+
+        by_parent = {}
+        for update in all_updates:
+            if 'deleteentry' in update or 'plugin' in update:
+                continue
+            dn = update['dn']
+            if len(dn) > 1:
+                by_parent.setdefault(dn[1:], set()).add(dn)
+
+        for parent, dns in by_parent.items():
+            if len(dns) == 1:
+                # nothing to gain compared to a base search
+                continue
+            dns = sorted(dns)
+            for i in range(0, len(dns), UPDATE_PREFETCH_BATCH_SIZE):
+                batch = dns[i:i + UPDATE_PREFETCH_BATCH_SIZE]
+                rdn_filters = [
+                    self.conn.combine_filters(
+                        [self.conn.make_filter_from_attr(ava.attr, ava.value)
+                         for ava in dn[0]],
+                        self.conn.MATCH_ALL)
+                    for dn in batch
+                ]
+                # ldapSubEntry entries are only returned by non-base
+                # searches when they are requested explicitly
+                searchfilter = self.conn.combine_filters(
+                    [self.conn.combine_filters(rdn_filters,
+                                               self.conn.MATCH_ANY),
+                     '(|(objectclass=*)(objectclass=ldapsubentry))'],
+                    self.conn.MATCH_ALL)
+                try:
+                    entries = self.conn.get_entries(
+                        parent, self.conn.SCOPE_ONELEVEL, searchfilter,
+                        ["*", "aci", "attributeTypes", "objectClasses"])
+                except errors.NotFound:
+                    continue
+                except (errors.DatabaseError, errors.LimitsExceeded) as e:
+                    logger.debug("Prefetch of entries under %s failed: %s",
+                                 parent, e)
+                    continue
+                batch = set(batch)
+                for entry in entries:
+                    if entry.dn in batch:
+                        self._prefetched[entry.dn] = entry
+
+        logger.debug("Prefetched %d entries", len(self._prefetched))
+
+    def _find_entry(self, dn):
+        """Return the prefetched entry dn or retrieve it from LDAP"""
+        entry = self._prefetched.pop(dn, None)
+        if entry is not None:
+            return entry
+
+        e = self._get_entry(dn)
+        if len(e) > 1:
+            # we should only ever get back one entry
+            raise BadSyntax("More than 1 entry returned on a dn search!? %s" % dn)
+        return e[0]
+
+    def _write_dry_run_output(self, text):
+        if self.dry_run_output is not None:
+            self.dry_run_output.write(text)
+
+    def _write_change(self, dn, changetype, changes=()):
+        """Write a change which would be made in dry-run mode as LDIF"""
+        lines = ['dn: %s' % dn, 'changetype: %s' % changetype]
+        if changetype == 'add':
+            for attr, values in changes:
+                for value in safe_output(attr, values):
+                    lines.append('%s: %s' % (attr, value))
+        elif changetype == 'modify':
+            for (modtype, attr, values) in changes:
+                if modtype == ldap.MOD_ADD:
+                    lines.append('add: %s' % attr)
+                elif modtype == ldap.MOD_DELETE:
+                    lines.append('delete: %s' % attr)
+                else:
+                    lines.append('replace: %s' % attr)
+                for value in safe_output(attr, values or []):
+                    lines.append('%s: %s' % (attr, value))
+                lines.append('-')
+        self._write_dry_run_output('\n'.join(lines) + '\n\n')
+
     def _apply_update_disposition(self, updates, entry):
         """
         updates is a list of changes to apply
@@ -857,11 +972,7 @@ class LDAPUpdate:
                                                update.get('default'))
 
         try:
-            e = self._get_entry(new_entry.dn)
-            if len(e) > 1:
-                # we should only ever get back one entry
-                raise BadSyntax("More than 1 entry returned on a dn search!? %s" % new_entry.dn)
-            entry = e[0]
+            entry = self._find_entry(new_entry.dn)
             found = True
             logger.debug("Updating existing entry: %s", entry.dn)
         except errors.NotFound:
@@ -885,7 +996,22 @@ class LDAPUpdate:
 
         added = False
         updated = False
-        if not found:
+        if self.dry_run:
+            if not found:
+                if len(entry):
+                    self._write_change(entry.dn, 'add', entry.raw.items())
+                    added = True
+            else:
+                changes = entry.generate_modlist()
+                if changes:
+                    self._write_change(entry.dn, 'modify', changes)
+                    updated = True
+            if added or updated:
+                # later updates of the entry see the changes
+                entry.reset_modlist()
+                self._prefetched[entry.dn] = entry
+                self.modified = True
+        elif not found:
             try:
                 if len(entry):
                     # addifexist may result in an entry with only a
@@ -933,6 +1059,8 @@ class LDAPUpdate:
             if updated:
                 self.modified = True
 
+        if added or updated:
+            self._changes += 1
         return entry, added or updated
 
     def _delete_record(self, updates):
@@ -941,10 +1069,17 @@ class LDAPUpdate:
         """
 
         dn = updates['dn']
+        self._prefetched.pop(dn, None)
+        if self.dry_run:
+            self._write_change(dn, 'delete')
+            self.modified = True
+            self._changes += 1
+            return
         try:
             logger.debug("Deleting entry %s", dn)
             self.conn.delete_entry(dn)
             self.modified = True
+            self._changes += 1
         except errors.NotFound as e:
             logger.debug("%s did not exist:%s", dn, e)
             self.modified = True
@@ -964,6 +1099,10 @@ class LDAPUpdate:
         return f
 
     def _run_update_plugin(self, plugin_name):
+        if self.dry_run:
+            self._write_dry_run_output(
+                '# update plugin %s skipped in dry-run mode\n\n' % plugin_name)
+            return
         logger.debug("Executing upgrade plugin: %s", plugin_name)
         restart_ds, updates = self.api.Updater[plugin_name]()
         if updates:
@@ -985,11 +1124,15 @@ class LDAPUpdate:
     def _run_updates(self, all_updates):
         index_attributes = set()
         update_ldapi_mappings = False
-        for update in all_updates:
+        self._prefetch_entries(all_updates)
+        for i, update in enumerate(all_updates):
             if 'deleteentry' in update:
                 self._delete_record(update)
             elif 'plugin' in update:
                 self._run_update_plugin(update['plugin'])
+                # the plugin may have changed the prefetched entries
+                if not self.dry_run:
+                    self._prefetch_entries(all_updates[i + 1:])
             else:
                 entry, modified = self._update_record(update)
                 if modified:
@@ -1002,6 +1145,10 @@ class LDAPUpdate:
                         )
                     ):
                         update_ldapi_mappings = True
+        self._prefetched = {}
+
+        if self.dry_run:
+            return
 
         if index_attributes:
             # The LDAPUpdate framework now keeps record of all changed/added
@@ -1038,10 +1185,13 @@ class LDAPUpdate:
 
                 all_updates = []
                 self.parse_update_file(f, data, all_updates)
+                self._changes = 0
                 self._run_updates(all_updates)
                 dur = time.time() - start
+                self.timings.append((f, len(all_updates), self._changes, dur))
                 logger.debug(
-                    "LDAP update duration: %s %.03f sec", f, dur,
+                    "LDAP update duration: %s %.03f sec, %d updates, "
+                    "%d changes", f, dur, len(all_updates), self._changes,
                     extra={'timing': ('ldapupdate', f, None, dur)}
                 )
         finally:
@@ -1810,6 +1810,7 @@ def upgrade_configuration():
     http.suffix = ipautil.realm_to_suffix(api.env.realm)
     http.configure_selinux_for_httpd()
     http.set_mod_ssl_protocol()
+    http.create_schema_cache_dir()
 
     http.configure_certmonger_renewal_guard()
 
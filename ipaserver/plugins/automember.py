@@ -16,6 +16,8 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import logging
+import re
 import uuid
 import time
 
@@ -40,6 +42,8 @@ from ipapython.dn import DN
 if six.PY3:
     unicode = str
 
+logger = logging.getLogger(__name__)
+
 __doc__ = _("""
 Auto Membership Rule.
 """) + _("""
@@ -141,6 +145,13 @@ EXAMPLES:
 """) + _("""
  Rebuild membership for specified hosts:
     ipa automember-rebuild --hosts=web1.example.com --hosts=web2.example.com
+""") + _("""
+ Show the members a rebuild would add to groups, without adding them:
+    ipa automember-rebuild --type=group --dry-run
+""") + _("""
+ Rebuild membership for all hosts by the server instead of a directory
+ server task, adding only the missing members:
+    ipa automember-rebuild --type=hostgroup --in-process
 """)
 
 register = Registry()
@@ -153,6 +164,9 @@ REBUILD_TASK_CONTAINER = DN(('cn', 'automember rebuild membership'),
                             ('cn', 'tasks'),
                             ('cn', 'config'))
 
+# Maximum number of members added to a group by a single modify operation
+REBUILD_MEMBERS_CHUNK = 1000
+
 
 regex_attrs = (
     Str('automemberinclusiveregex*',
@@ -309,6 +323,177 @@ def automember_container_exists(ldap):
     return True
 
 
+class AutomemberRules:
+    """
+    Automember definition and regex rules of a grouping type compiled for
+    evaluation by the IPA server.
+
+    The evaluation follows the 389-ds Auto Membership plugin: an entry is
+    added to the target group of every rule with a matching inclusive
+    condition, unless an exclusive condition for that target group
+    matches too. Entries added to no target group are added to the
+    default groups. Conditions are regular expressions searched for in
+    every value of the condition attribute.
+    """
+
+    def __init__(self, definition, rules):
+        self.scope = DN(definition.single_value['automemberscope'])
+        search_filter = definition.single_value['automemberfilter']
+        if not search_filter.startswith('('):
+            search_filter = '(%s)' % search_filter
+        self.filter = search_filter
+
+        grouping_attr = definition.single_value['automembergroupingattr']
+        self.member_attr, _sep, value_attr = grouping_attr.partition(':')
+        if value_attr.lower() != 'dn':
+            raise errors.ValidationError(
+                name='automembergroupingattr',
+                error=_('only grouping by DN is supported'))
+
+        self.default_groups = {
+            DN(g) for g in definition.get('automemberdefaultgroup', [])}
+
+        # Conditions are indexed by attribute and pattern, so that every
+        # distinct condition is evaluated once per entry. Every condition
+        # maps to a pair of lists of indexes to self.targets, the groups
+        # a matching entry is included in and excluded from.
+        self.targets = []
+        self.conditions = {}
+        target_index = {}
+        for rule in rules:
+            for target in rule.get('automembertargetgroup', []):
+                target = DN(target)
+                index = target_index.setdefault(target, len(self.targets))
+                if index == len(self.targets):
+                    self.targets.append(target)
+                for i, attr in enumerate((INCLUDE_RE, EXCLUDE_RE)):
+                    for condition in rule.get(attr, []):
+                        key, regex = self._compile(rule.dn, condition)
+                        if regex is None:
+                            continue
+                        conditions = self.conditions.setdefault(key, {})
+                        targets = conditions.setdefault(regex, ([], []))
+                        targets[i].append(index)
+
+    @staticmethod
+    def _compile(rule_dn, condition):
+        key, sep, pattern = condition.partition('=')
+        if not sep:
+            logger.warning('Ignoring malformed automember condition %s of '
+                           '%s', condition, rule_dn)
+            return None, None
+        try:
+            return key.strip().lower(), re.compile(pattern)
+        except re.error as e:
+            logger.warning('Ignoring automember condition %s of %s: %s',
+                           condition, rule_dn, e)
+            return None, None
+
+    @classmethod
+    def load(cls, ldap, grouping):
+        """
+        Read the automember definition and rules of a grouping type with a
+        single search.
+        """
+        base_dn = DN(('cn', grouping), api.env.container_automember,
+                     api.env.basedn)
+        definition = None
+        rules = []
+        for entry in ldap.iter_entries(
+                '(|(objectclass=automemberdefinition)'
+                '(objectclass=automemberregexrule))',
+                ['objectclass', 'automemberscope', 'automemberfilter',
+                 'automembergroupingattr', 'automemberdefaultgroup',
+                 'automembertargetgroup', INCLUDE_RE, EXCLUDE_RE],
+                base_dn, ldap.SCOPE_SUBTREE, time_limit=-1, size_limit=-1):
+            objectclasses = {oc.lower() for oc in entry['objectclass']}
+            if entry.dn == base_dn and 'automemberdefinition' in objectclasses:
+                definition = entry
+            elif 'automemberregexrule' in objectclasses:
+                rules.append(entry)
+        if definition is None:
+            raise errors.NotFound(
+                reason=_('Auto member definition of %s not found') % grouping)
+        return cls(definition, rules)
+
+    def evaluate(self, entry):
+        """
+        Return DNs of the groups the entry belongs to according to the
+        rules.
+        """
+        included = set()
+        excluded = set()
+        for attr, conditions in self.conditions.items():
+            values = [
+                v.decode('utf-8', 'replace')
+                for v in entry.raw.get(attr, [])
+            ]
+            if not values:
+                continue
+            for regex, (include, exclude) in conditions.items():
+                if any(regex.search(value) for value in values):
+                    included.update(include)
+                    excluded.update(exclude)
+        included -= excluded
+        if not included:
+            return set(self.default_groups)
+        return {self.targets[i] for i in included}
+
+    def diff(self, ldap, search_filter, attrs_list=()):
+        """
+        Evaluate the rules for all entries in scope matching search_filter.
+
+        Returns a tuple of the number of evaluated entries and a dict
+        mapping DNs of the target groups to lists of the entries which
+        should be their members but are not.
+        """
+        members = {}
+        additions = {}
+        count = 0
+        for entry in ldap.iter_entries(
+                '(&%s%s)' % (self.filter, search_filter),
+                list(self.conditions) + list(attrs_list), self.scope,
+                ldap.SCOPE_SUBTREE, time_limit=-1, size_limit=-1):
+            count += 1
+            for group_dn in self.evaluate(entry):
+                if group_dn not in members:
+                    members[group_dn] = self._get_members(ldap, group_dn)
+                if members[group_dn] is None:
+                    continue
+                if entry.dn not in members[group_dn]:
+                    additions.setdefault(group_dn, []).append(entry)
+        return count, additions
+
+    def _get_members(self, ldap, group_dn):
+        try:
+            group = ldap.get_entry(group_dn, [self.member_attr])
+        except errors.NotFound:
+            logger.warning('Automember target group %s not found', group_dn)
+            return None
+        return set(group.get(self.member_attr, []))
+
+    def add_members(self, ldap, group_dn, member_dns):
+        """
+        Add members to a group with as few modify operations as possible.
+        """
+        for i in range(0, len(member_dns), REBUILD_MEMBERS_CHUNK):
+            chunk = member_dns[i:i + REBUILD_MEMBERS_CHUNK]
+            try:
+                with ldap.error_handler():
+                    ldap.modify_s(
+                        str(group_dn),
+                        [(_ldap.MOD_ADD, self.member_attr,
+                          ldap.encode(chunk))])
+            except errors.DuplicateEntry:
+                # some of the members were added meanwhile
+                for dn in chunk:
+                    try:
+                        ldap.add_entry_to_group(dn, group_dn,
+                                                self.member_attr)
+                    except errors.AlreadyGroupMember:
+                        pass
+
+
 @register()
 class automember_add(LDAPCreate):
     __doc__ = _("""
@@ -685,8 +870,6 @@ class automember_rebuild(Method):
     obj_name = 'automember_task'
     attr_name = 'rebuild'
 
-    # TODO: Add a --dry-run option:
-    # https://fedorahosted.org/freeipa/ticket/3936
     takes_options = (
         group_type[0].clone(
             required=False,
@@ -708,6 +891,20 @@ class automember_rebuild(Method):
             label=_('No wait'),
             doc=_("Don't wait for rebuilding membership"),
         ),
+        Flag(
+            'dry_run?',
+            default=False,
+            label=_('Dry run'),
+            doc=_("Show the members which would be added to groups without "
+                  "adding them"),
+        ),
+        Flag(
+            'in_process?',
+            default=False,
+            label=_('In process'),
+            doc=_("Rebuild membership by the IPA server instead of a "
+                  "directory server task, adding only missing members"),
+        ),
     )
     has_output = output.standard_entry
 
@@ -740,6 +937,68 @@ class automember_rebuild(Method):
             raise errors.MutuallyExclusiveError(
                 reason=_("users cannot be set when type is 'hostgroup'")
             )
+        if kw.get('no_wait') and (kw.get('dry_run') or kw.get('in_process')):
+            raise errors.MutuallyExclusiveError(
+                reason=_("no_wait cannot be set together with dry_run or "
+                         "in_process")
+            )
+
+    def check_names_exist(self, ldap, obj, names, search_filter, basedn):
+        """
+        Check that all given users or hosts exist, with a single search for
+        the usual case when all names are primary keys.
+        """
+        pkey = obj.primary_key.name
+        found = set()
+        try:
+            entries = ldap.get_entries(
+                basedn, ldap.SCOPE_SUBTREE, search_filter, [pkey],
+                size_limit=-1, time_limit=-1)
+        except errors.NotFound:
+            entries = []
+        for entry in entries:
+            found.update(v.lower() for v in entry.get(pkey, []))
+        for name in names:
+            if name.lower() in found:
+                continue
+            # hosts can be given by their short names too
+            try:
+                obj.get_dn_if_exists(name)
+            except errors.NotFound:
+                raise obj.handle_not_found(name)
+
+    def rebuild_in_process(self, ldap, gtype, obj, search_filter, options):
+        """
+        Evaluate the automember rules and add missing members to groups,
+        unless dry_run is set.
+        """
+        rules = AutomemberRules.load(ldap, gtype)
+        pkey = obj.primary_key.name
+        count, additions = rules.diff(ldap, search_filter, [pkey])
+
+        result = {}
+        added = 0
+        for group_dn, entries in additions.items():
+            result[group_dn[0].value] = sorted(
+                e.single_value.get(pkey, unicode(e.dn)) for e in entries)
+            added += len(entries)
+            if not options.get('dry_run'):
+                rules.add_members(ldap, group_dn, [e.dn for e in entries])
+
+        if options.get('dry_run'):
+            summary = _('%(members)d members would be added to %(groups)d '
+                        'groups, %(entries)d entries evaluated')
+        else:
+            summary = _('%(members)d members added to %(groups)d groups, '
+                        '%(entries)d entries evaluated')
+        summary = summary % dict(
+            members=added, groups=len(additions), entries=count)
+        logger.info('Automember rebuild of %ss: %s', gtype, summary)
+
+        return dict(
+            result=result,
+            summary=unicode(summary),
+            value=pkey_to_value(None, options))
 
     def execute(self, *keys, **options):
         ldap = self.api.Backend.ldap2
@@ -767,19 +1026,19 @@ class automember_rebuild(Method):
 
         names = options.get(opt_name)
         if names:
-            for name in names:
-                try:
-                    obj.get_dn_if_exists(name)
-                except errors.NotFound:
-                    raise obj.handle_not_found(name)
             search_filter = ldap.make_filter_from_attr(
                 obj.primary_key.name,
                 names,
                 rules=ldap.MATCH_ANY
             )
+            self.check_names_exist(ldap, obj, names, search_filter, basedn)
         else:
             search_filter = '(%s=*)' % obj.primary_key.name
 
+        if options.get('dry_run') or options.get('in_process'):
+            return self.rebuild_in_process(
+                ldap, gtype, obj, search_filter, options)
+
         task_dn = DN(('cn', cn), REBUILD_TASK_CONTAINER)
 
         entry = ldap.make_entry(
@@ -829,6 +1088,8 @@ class automember_find_orphans(LDAPSearch):
     Search for orphan automember rules. The command might need to be run as
     a privileged user user to get all orphan rules.
     """)
+    # orphan rules are deleted with --remove
+    read_only = False
     takes_options = group_type + (
         Flag(
             'remove?',
@@ -660,6 +660,10 @@ class LDAPObject(Object):
     object_not_found_msg = _('%(pkey)s: %(oname)s not found')
     already_exists_msg = _('%(oname)s with name "%(pkey)s" already exists')
 
+    # number of entries whose indirect membership is resolved by a single
+    # search in get_indirect_members_batch()
+    indirect_members_chunk_size = 100
+
     def get_dn(self, *keys, **kwargs):
         if self.parent_object:
             parent_dn = self.api.Object[self.parent_object].get_dn(*keys[:-1])
@@ -775,15 +779,9 @@ class LDAPObject(Object):
         mo_filter = self.backend.make_filter({'memberof': group_entry.dn})
         filter = self.backend.combine_filters(
             ('(member=*)', mo_filter), self.backend.MATCH_ALL)
-        try:
-            result = self.backend.get_entries(
-                self.api.env.basedn,
-                filter=filter,
-                attrs_list=['member'],
-                size_limit=-1, # paged search will get everything anyway
-                paged_search=True)
-        except errors.NotFound:
-            result = []
+        result = self.backend.iter_entries(
+            filter, ['member'], self.api.env.basedn,
+            size_limit=-1)
 
         indirect = set()
         for entry in result:
@@ -804,15 +802,9 @@ class LDAPObject(Object):
                 'ipaowner': dn
             }
         )
-        try:
-            result = self.backend.get_entries(
-                self.api.env.basedn,
-                filter=filter,
-                attrs_list=[''],
-                size_limit=-1,  # paged search will get everything anyway
-                paged_search=True)
-        except errors.NotFound:
-            result = []
+        result = self.backend.iter_entries(
+            filter, [''], self.api.env.basedn,
+            size_limit=-1)
 
         direct = set()
         indirect = set(entry.raw.get('memberof', []))
@@ -826,6 +818,100 @@ class LDAPObject(Object):
         if indirect:
             entry.raw['memberofindirect'] = list(indirect)
 
+    def get_indirect_members_batch(self, entries, attrs_list):
+        """
+        Get indirect members and memberships of a list of entries at once
+
+        This is equivalent to calling get_indirect_members() on every entry,
+        but instead of running one subtree search per entry, the entries are
+        resolved in chunks of ``indirect_members_chunk_size`` with a single
+        combined search per chunk.
+        """
+        if not entries:
+            return
+        if 'memberindirect' in attrs_list:
+            self.get_memberindirect_batch(entries)
+        if 'memberofindirect' in attrs_list:
+            self.get_memberofindirect_batch(entries)
+
+    def _iter_entry_chunks(self, entries):
+        size = self.indirect_members_chunk_size
+        for i in range(0, len(entries), size):
+            yield entries[i:i + size]
+
+    def get_memberindirect_batch(self, group_entries):
+        """
+        Get indirect members of a list of group entries
+
+        Every entry which is a member of a group in the chunk and has
+        members of its own is retrieved once together with its memberOf
+        values; its members are then attributed to each group of the chunk
+        it belongs to.
+        """
+        for chunk in self._iter_entry_chunks(group_entries):
+            indirect = {entry.dn: set() for entry in chunk}
+
+            mo_filter = self.backend.make_filter_from_attr(
+                'memberof', list(indirect), self.backend.MATCH_ANY)
+            filter = self.backend.combine_filters(
+                ('(member=*)', mo_filter), self.backend.MATCH_ALL)
+            result = self.backend.iter_entries(
+                filter, ['member', 'memberof'], self.api.env.basedn,
+                size_limit=-1)
+
+            for entry in result:
+                members = entry.raw.get('member', [])
+                for value in entry.raw.get('memberof', []):
+                    group_dn = DN(value.decode('utf-8'))
+                    if group_dn in indirect:
+                        indirect[group_dn].update(members)
+
+            for group_entry in chunk:
+                members = indirect[group_entry.dn]
+                members.difference_update(group_entry.raw.get('member', []))
+                if members:
+                    group_entry.raw['memberindirect'] = list(members)
+
+    def get_memberofindirect_batch(self, entries):
+        """
+        Get indirect memberships of a list of entries
+
+        All groups which directly reference any entry of the chunk are
+        retrieved with a single search; memberOf values of an entry not
+        backed by a direct reference are indirect. Only the member values
+        referencing the chunk are requested, not the whole member lists
+        of the groups.
+        """
+        member_attrs = ['member', 'memberuser', 'memberhost', 'ipaowner']
+
+        for chunk in self._iter_entry_chunks(entries):
+            direct = {entry.dn: set() for entry in chunk}
+
+            dns = list(direct)
+            filter = self.backend.make_filter(
+                {attr: dns for attr in member_attrs})
+            matched_values = '(%s)' % ''.join(
+                self.backend.make_filter_from_attr(attr, dn)
+                for attr in member_attrs for dn in dns)
+            result = self.backend.iter_entries(
+                filter, member_attrs, self.api.env.basedn,
+                size_limit=-1, matched_values=matched_values)
+
+            for group_entry in result:
+                group_dn = str(group_entry.dn).encode('utf-8')
+                for attr in member_attrs:
+                    for value in group_entry.raw.get(attr, []):
+                        member_dn = DN(value.decode('utf-8'))
+                        if member_dn in direct:
+                            direct[member_dn].add(group_dn)
+
+            for entry in chunk:
+                memberof = set(entry.raw.get('memberof', []))
+                entry.raw['memberof'] = list(memberof & direct[entry.dn])
+                indirect = memberof - direct[entry.dn]
+                if indirect:
+                    entry.raw['memberofindirect'] = list(indirect)
+
     def get_password_attributes(self, ldap, dn, entry_attrs):
         """
         Search on the entry to determine if it has a password or
@@ -1394,6 +1480,7 @@ class LDAPRetrieve(LDAPQuery):
     """
     Retrieve an LDAP entry.
     """
+    read_only = True
     has_output = output.standard_entry
     has_output_params = global_output_params
 
@@ -1965,6 +2052,7 @@ class LDAPSearch(BaseLDAPCommand, crud.Search):
     """
     Retrieve all LDAP entries matching the given criteria.
     """
+    read_only = True
     member_attributes = []
     member_param_incl_doc = _('Search for %(searched_object)s with these %(relationship)s %(ldap_object)s.')
     member_param_excl_doc = _('Search for %(searched_object)s without these %(relationship)s %(ldap_object)s.')
@@ -2180,8 +2268,8 @@ class LDAPSearch(BaseLDAPCommand, crud.Search):
                 entries.sort(key=sort_key)
 
         if not options.get('raw', False):
+            self.obj.get_indirect_members_batch(entries, attrs_list)
             for entry in entries:
-                self.obj.get_indirect_members(entry, attrs_list)
                 self.obj.convert_attribute_members(entry, *args, **options)
 
         for (i, e) in enumerate(entries):
@@ -19,16 +19,18 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
+import queue
+import threading
 
 import six
 
 from ipalib import api, errors
 from ipalib import Command
 from ipalib.frontend import Local
-from ipalib.parameters import Str, Dict
+from ipalib.parameters import Flag, Str, Dict
 from ipalib.output import Output
 from ipalib.text import _
-from ipalib.request import context
+from ipalib.request import context, destroy_context
 from ipalib.plugable import Registry
 from ipapython.version import API_VERSION
 
@@ -57,6 +59,17 @@ The format of the response is nested the same way.  At the top you will see
 
 And then a nested response for each IPA command method sent in the request
 
+With the parallel option set, consecutive read-only methods (show and find
+commands without side effects) are executed concurrently on up to batch_max_workers threads,
+each with its own LDAP connection. Other methods are executed one at a
+time in the order of the request. The order of the results is always the
+order of the methods in the request.
+
+{"method":"batch","params":[[
+        {"method":"user_show","params":[["admin"],{}]},
+        {"method":"group_show","params":[["admins"],{}]}
+        ],{"parallel":true}],"id":1}
+
 """)
 
 if six.PY3:
@@ -88,6 +101,19 @@ class batch(Command):
         ),
     )
 
+    takes_options = (
+        Flag('parallel?',
+            doc=_('Execute read-only methods concurrently'),
+            default=False,
+            autofill=True,
+        ),
+    )
+
+    # per-request context attributes propagated to parallel workers
+    worker_context_attrs = (
+        'principal', 'ccache_name', 'languages', 'client_ip',
+    )
+
     has_output = (
         Output('count', int, doc=''),
         Output('results', (list, tuple), doc='')
@@ -157,53 +183,158 @@ class batch(Command):
             logger.debug('batch: %s',
                          ', '.join(super(batch, self)._repr_iter(**params)))
 
-    def execute(self, methods=None, **options):
-        results = []
-        for arg in (methods or []):
-            params = dict()
-            name = None
-            try:
-                self._validate_request(arg)
-                name = arg['method']
-                a, kw = arg['params']
-                newkw = dict((str(k), v) for k, v in kw.items())
-                params = api.Command[name].args_options_2_params(
-                    *a, **newkw)
-                newkw.setdefault('version', options['version'])
-
-                result = api.Command[name](*a, **newkw)
+    def _is_read_only(self, request):
+        """
+        Check whether a request of a batch can be executed concurrently
+        with other requests.
+
+        Only commands which declare that they have no side effects with
+        the read_only class attribute are considered read-only. Malformed
+        requests are not executed at all and only produce an error, so they
+        are considered read-only as well.
+        """
+        try:
+            self._validate_request(request)
+        except Exception:
+            return True
+        return self.api.Command[request['method']].read_only
+
+    def _execute_request(self, arg, options):
+        params = dict()
+        name = None
+        try:
+            self._validate_request(arg)
+            name = arg['method']
+            a, kw = arg['params']
+            newkw = dict((str(k), v) for k, v in kw.items())
+            params = api.Command[name].args_options_2_params(
+                *a, **newkw)
+            newkw.setdefault('version', options['version'])
+
+            result = api.Command[name](*a, **newkw)
+            logger.info(
+                '%s: batch: %s(%s): SUCCESS',
+                getattr(context, 'principal', 'UNKNOWN'),
+                name,
+                ', '.join(api.Command[name]._repr_iter(**params))
+            )
+            result['error']=None
+        except Exception as e:
+            if (isinstance(e, errors.RequirementError) or
+                    isinstance(e, errors.CommandError) or
+                    isinstance(e, errors.ConversionError)):
                 logger.info(
-                    '%s: batch: %s(%s): SUCCESS',
-                    getattr(context, 'principal', 'UNKNOWN'),
-                    name,
-                    ', '.join(api.Command[name]._repr_iter(**params))
+                    '%s: batch: %s',
+                    context.principal,
+                    e.__class__.__name__
                 )
-                result['error']=None
-            except Exception as e:
-                if (isinstance(e, errors.RequirementError) or
-                        isinstance(e, errors.CommandError) or
-                        isinstance(e, errors.ConversionError)):
-                    logger.info(
-                        '%s: batch: %s',
-                        context.principal,
-                        e.__class__.__name__
-                    )
-                else:
-                    logger.info(
-                        '%s: batch: %s(%s): %s',
-                        context.principal, name,
-                        ', '.join(api.Command[name]._repr_iter(**params)),
-                        e.__class__.__name__
-                    )
-                if isinstance(e, errors.PublicError):
-                    reported_error = e
-                else:
-                    reported_error = errors.InternalError()
-                result = dict(
-                    error=reported_error.strerror,
-                    error_code=reported_error.errno,
-                    error_name=unicode(type(reported_error).__name__),
-                    error_kw=reported_error.kw,
+            else:
+                logger.info(
+                    '%s: batch: %s(%s): %s',
+                    context.principal, name,
+                    ', '.join(api.Command[name]._repr_iter(**params)),
+                    e.__class__.__name__
                 )
-            results.append(result)
-        return dict(count=len(results) , results=results)
+            if isinstance(e, errors.PublicError):
+                reported_error = e
+            else:
+                reported_error = errors.InternalError()
+            result = dict(
+                error=reported_error.strerror,
+                error_code=reported_error.errno,
+                error_name=unicode(type(reported_error).__name__),
+                error_kw=reported_error.kw,
+            )
+        return result
+
+    def _worker(self, requests, results, options, request_context):
+        """
+        Execute requests from the queue in a separate thread with its own
+        LDAP connection.
+        """
+        for name, value in request_context.items():
+            setattr(context, name, value)
+        try:
+            self.api.Backend.ldap2.connect(
+                ccache=request_context.get('ccache_name'),
+                size_limit=None,
+                time_limit=None)
+        except Exception as e:
+            logger.error('batch: unable to connect worker: %s', e)
+            connect_error = e
+        else:
+            connect_error = None
+
+        try:
+            while True:
+                try:
+                    i, arg = requests.get_nowait()
+                except queue.Empty:
+                    break
+                if connect_error is not None:
+                    if isinstance(connect_error, errors.PublicError):
+                        reported_error = connect_error
+                    else:
+                        reported_error = errors.InternalError()
+                    results[i] = dict(
+                        error=reported_error.strerror,
+                        error_code=reported_error.errno,
+                        error_name=unicode(type(reported_error).__name__),
+                        error_kw=reported_error.kw,
+                    )
+                    continue
+                results[i] = self._execute_request(arg, options)
+        finally:
+            destroy_context()
+
+    def _execute_concurrently(self, methods, results, options):
+        requests = queue.Queue()
+        for i, arg in methods:
+            requests.put((i, arg))
+
+        request_context = {
+            name: getattr(context, name)
+            for name in self.worker_context_attrs
+            if hasattr(context, name)
+        }
+        num_workers = min(self.api.env.batch_max_workers, len(methods))
+        workers = [
+            threading.Thread(
+                target=self._worker,
+                args=(requests, results, options, request_context),
+                name='batch worker %d' % n)
+            for n in range(num_workers)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    def execute(self, methods=None, **options):
+        methods = methods or []
+        parallel = (
+            options.get('parallel', False)
+            and self.api.env.batch_max_workers > 1
+            and self.api.Backend.ldap2.isconnected()
+        )
+        if not parallel:
+            results = [self._execute_request(arg, options) for arg in methods]
+            return dict(count=len(results), results=results)
+
+        # Runs of consecutive read-only requests are executed concurrently,
+        # any other request is executed alone in the request thread so that
+        # it sees the effects of all preceding requests and vice versa.
+        results = [None] * len(methods)
+        read_only = []
+        for i, arg in enumerate(methods):
+            if self._is_read_only(arg):
+                read_only.append((i, arg))
+                continue
+            if read_only:
+                self._execute_concurrently(read_only, results, options)
+                read_only = []
+            results[i] = self._execute_request(arg, options)
+        if read_only:
+            self._execute_concurrently(read_only, results, options)
+
+        return dict(count=len(results), results=results)
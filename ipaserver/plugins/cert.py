@@ -21,10 +21,12 @@
 
 import base64
 import collections
+from concurrent import futures
 import datetime
 import itertools
 import logging
 from operator import attrgetter
+import threading
 
 import cryptography.x509
 from cryptography.hazmat.primitives import hashes, serialization
@@ -163,6 +165,45 @@ register = Registry()
 
 PKIDATE_FORMAT = '%Y-%m-%d'
 
+# Number of concurrent requests cert_find sends to Dogtag
+CA_SEARCH_WORKERS = 4
+
+
+class CertificateCache:
+    """Bounded LRU cache of certificate data keyed by (issuer, serial number)
+
+    A certificate is uniquely identified by its issuer and serial number and
+    never changes, so the data retrieved from the CA and parsed from it can
+    be kept for the whole lifetime of the process.
+    """
+
+    def __init__(self, max_entries=4096):
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self.max_entries = max_entries
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# certificates retrieved from Dogtag, as returned by ra.get_certificate()
+ca_certificate_cache = CertificateCache()
+# results of cert._parse(), keyed by (issuer, serial number, full)
+parsed_certificate_cache = CertificateCache()
+
 
 def _acl_make_request(principal_type, principal, ca_id, profile_id):
     """Construct HBAC request for the given principal, CA and profile"""
@@ -1636,7 +1677,7 @@ class cert_find(Search, CertMethod):
 
         return result, False, True
 
-    def _ca_search(self, raw, pkey_only, exactly, **options):
+    def _ca_search(self, raw, pkey_only, exactly, executor, **options):
         ra_options = {}
         for name in ('revocation_reason',
                      'issuer',
@@ -1698,6 +1739,21 @@ class cert_find(Search, CertMethod):
         )['result']
         ca_objs = {DN(ca['ipacasubjectdn'][0]): ca for ca in ca_objs}
 
+        # Dogtag is queried in the background while the request thread
+        # continues with the LDAP sub-search
+        return executor.submit(
+            self._ca_search_results, ra_options, ca_objs, raw, pkey_only,
+            complete)
+
+    def _ca_search_results(self, ra_options, ca_objs, raw, pkey_only,
+                           complete):
+        """Query Dogtag and build the CA sub-search result
+
+        This is executed outside of the request thread and must not use
+        LDAP.
+        """
+        result = collections.OrderedDict()
+
         ra = self.api.Backend.ra
         for ra_obj in ra.find(ra_options):
             issuer = DN(ra_obj['issuer'])
@@ -1814,6 +1870,62 @@ class cert_find(Search, CertMethod):
 
         return result, truncated, complete
 
+    def _get_certificates(self, executor, result):
+        """Retrieve certificates of CA sub-search results from Dogtag
+
+        The certificates are requested concurrently. A certificate never
+        changes, so it is only requested again if it was not retrieved
+        before or if the revocation reason may have to be reported.
+        """
+        ra = self.api.Backend.ra
+        cert_data = {}
+        for key, obj in six.iteritems(result):
+            if 'cacn' not in obj:
+                continue
+            cached = ca_certificate_cache.get(key)
+            if (cached is None or
+                    obj.get('status') in (u'REVOKED', u'REVOKED_EXPIRED')):
+                _issuer, serial_number = key
+                cert_data[key] = executor.submit(
+                    ra.get_certificate, serial_number)
+            else:
+                cert_data[key] = dict(cached)
+
+        for key, data in six.iteritems(cert_data):
+            if isinstance(data, futures.Future):
+                data = cert_data[key] = data.result()
+                # the revocation reason may change, cache the rest
+                ca_certificate_cache.put(key, {
+                    name: value for name, value in data.items()
+                    if name != 'revocation_reason'
+                })
+
+        return cert_data
+
+    def _parse_certificate(self, key, obj, full):
+        """Extract certificate-specific data into a result object
+
+        Same as cert._parse(), the extracted data are cached by issuer and
+        serial number.
+        """
+        if 'certificate' not in obj:
+            return
+
+        cache_key = key + (full,)
+        parsed = parsed_certificate_cache.get(cache_key)
+        if parsed is None:
+            parsed = {'certificate': obj['certificate']}
+            self.obj._parse(parsed, full)
+            del parsed['certificate']
+            parsed_certificate_cache.put(cache_key, parsed)
+
+        # add to the values which are already present, like cert._parse()
+        for name, value in six.iteritems(parsed):
+            if isinstance(value, list):
+                obj.setdefault(name, []).extend(value)
+            else:
+                obj[name] = value
+
     def execute(self, criteria=None, all=False, raw=False, pkey_only=False,
                 no_members=True, timelimit=None, sizelimit=None, **options):
         ca_enabled = self.api.Command.ca_is_enabled()['result']
@@ -1846,43 +1958,56 @@ class cert_find(Search, CertMethod):
         # See https://pagure.io/freeipa/issue/8369.
         if ca_enabled:
             searches = [self._cert_search, self._ca_search, self._ldap_search]
+            ra = self.api.Backend.ra
+            # resolve the CA host in the request thread, it uses LDAP
+            ra.ca_host  # pylint: disable=pointless-statement
         else:
             searches = [self._cert_search, self._ldap_search]
 
-        for sub_search in searches:
-            sub_result, sub_truncated, sub_complete = sub_search(
-                all=all,
-                raw=raw,
-                pkey_only=pkey_only,
-                no_members=no_members,
-                **options)
+        with futures.ThreadPoolExecutor(
+                max_workers=CA_SEARCH_WORKERS) as executor:
+            sub_results = [
+                sub_search(
+                    all=all,
+                    raw=raw,
+                    pkey_only=pkey_only,
+                    no_members=no_members,
+                    executor=executor,
+                    **options)
+                for sub_search in searches
+            ]
 
-            if sub_complete:
-                for key in tuple(result):
-                    if key not in sub_result:
-                        del result[key]
+            for sub_result in sub_results:
+                if isinstance(sub_result, futures.Future):
+                    sub_result = sub_result.result()
+                sub_result, sub_truncated, sub_complete = sub_result
 
-            for key, sub_obj in six.iteritems(sub_result):
-                try:
-                    obj = result[key]
-                except KeyError:
-                    if complete:
-                        continue
-                    result[key] = sub_obj
-                else:
-                    obj.update(sub_obj)
+                if sub_complete:
+                    for key in tuple(result):
+                        if key not in sub_result:
+                            del result[key]
+
+                for key, sub_obj in six.iteritems(sub_result):
+                    try:
+                        obj = result[key]
+                    except KeyError:
+                        if complete:
+                            continue
+                        result[key] = sub_obj
+                    else:
+                        obj.update(sub_obj)
 
-            truncated = truncated or sub_truncated
-            complete = complete or sub_complete
+                truncated = truncated or sub_truncated
+                complete = complete or sub_complete
+
+            if not pkey_only and all:
+                cert_data = self._get_certificates(executor, result)
 
         if not pkey_only:
             ca_objs = {}
-            if ca_enabled:
-                ra = self.api.Backend.ra
 
             for key, obj in six.iteritems(result):
                 if all and 'cacn' in obj:
-                    _issuer, serial_number = key
                     cacn = obj['cacn']
 
                     try:
@@ -1891,9 +2016,7 @@ class cert_find(Search, CertMethod):
                         ca_obj = ca_objs[cacn] = (
                             self.api.Command.ca_show(cacn, all=True)['result'])
 
-                    obj.update(
-                        ra.get_certificate(serial_number)
-                    )
+                    obj.update(cert_data[key])
                     if not raw:
                         obj['certificate'] = (
                             obj['certificate'].replace('\r\n', ''))
@@ -1904,7 +2027,7 @@ class cert_find(Search, CertMethod):
                             [cert_der] + ca_obj['certificate_chain'])
 
                 if not raw:
-                    self.obj._parse(obj, all)
+                    self._parse_certificate(key, obj, all)
                     if not ca_enabled and not all:
                         # For the case of CA-less don't display the full
                         # certificate unless requested. It is kept in the
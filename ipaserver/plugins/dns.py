@@ -20,7 +20,9 @@
 
 from __future__ import absolute_import
 
+import collections
 import logging
+import threading
 
 import netaddr
 import time
@@ -32,6 +34,8 @@ import dns.name
 import dns.exception
 import dns.rdatatype
 import dns.resolver
+import dns.tokenizer
+import dns.zone
 import six
 
 from ipalib.dns import (extra_name_format,
@@ -249,6 +253,10 @@ EXAMPLES:
  Delegate zone sub.example to another nameserver:
    ipa dnsrecord-add example.com ns.sub --a-rec=203.0.113.1
    ipa dnsrecord-add example.com sub --ns-rec=ns.sub.example.com.
+""") + _("""
+ Import resource records of zone example.com from a zone file. Names which
+ already exist in the zone are not modified and are reported as failed:
+   ipa dnszone-import example.com --file=example.com.zone
 """) + _("""
  Delete zone example.com with all resource records:
    ipa dnszone-del example.com
@@ -349,6 +357,9 @@ _IN = dns.rdataclass.IN
 # NS record type
 _NS = dns.rdatatype.from_text('NS')
 
+# number of record entries added concurrently by dnszone_import
+_zone_import_window = 32
+
 _output_permissions = (
     output.summary,
     output.Output('result', bool, _('True means the operation was successful')),
@@ -1755,6 +1766,246 @@ def _normalize_zone(zone):
     return zone
 
 
+def _dns_name_key(labels):
+    """
+    Normalized name used as key of DNSZoneIndex
+    """
+    return b'.'.join(labels).lower()
+
+
+class DNSZoneIndex:
+    """
+    Active DNS zones stored in LDAP indexed by name.
+
+    Master zones and the NS delegations in them are kept in dicts keyed by
+    normalized absolute names, so the longest match for a name is found by
+    looking up its parent names. Forward zones are kept in a trie of labels
+    to find all forward zones in a subtree.
+    """
+
+    def __init__(self, entries, usn):
+        """
+        :param entries: zone entries and record entries with NS records
+        :param usn: last USN of the database the index was read at
+        """
+        self.usn = usn
+        self.master_zones = {}
+        self.delegations = {}
+        self.forward_zones = {}
+
+        zone_keys = {}
+        records = []
+        for entry in entries:
+            objectclasses = {oc.lower() for oc in entry.get('objectclass', [])}
+            if 'idnszone' in objectclasses:
+                if entry.single_value.get('idnszoneactive'):
+                    zone = entry.single_value['idnsname'].make_absolute()
+                    key = _dns_name_key(zone.labels)
+                    self.master_zones[key] = zone
+                    self.delegations[key] = {}
+                    zone_keys[entry.dn] = key
+            elif 'idnsforwardzone' in objectclasses:
+                if entry.single_value.get('idnszoneactive'):
+                    self._add_forward_zone(
+                        entry.single_value['idnsname'].make_absolute())
+            elif entry.get('nsrecord'):
+                records.append(entry)
+
+        for entry in records:
+            key = zone_keys.get(entry.dn[1:])
+            if key is None:
+                continue
+            name = entry.single_value['idnsname']
+            self.delegations[key][_dns_name_key(name.labels)] = name
+
+    @staticmethod
+    def _labels(name):
+        """
+        Labels of absolute name from the root, without the root label
+        """
+        return [label.lower() for label in
+                reversed(name.make_absolute().labels[:-1])]
+
+    def _add_forward_zone(self, zone):
+        node = self.forward_zones
+        for label in self._labels(zone):
+            node = node.setdefault(label, {})
+        node[None] = zone
+
+    def get_auth_zone(self, name):
+        """
+        Return the longest active master zone containing name or None
+        """
+        labels = name.make_absolute().labels
+        for i in range(len(labels)):
+            zone = self.master_zones.get(_dns_name_key(labels[i:]))
+            if zone is not None:
+                return zone
+        return None
+
+    def get_longest_match_ns_delegation(self, zone, name):
+        """
+        Return the deepest delegation for name in zone or None
+        """
+        delegations = self.delegations.get(
+            _dns_name_key(zone.make_absolute().labels), {})
+        labels = name.labels
+        for i in range(len(labels)):
+            record = delegations.get(_dns_name_key(labels[i:]))
+            if record is not None:
+                return record
+        return None
+
+    def find_subtree_forward_zones(self, name, child_zones_only=False):
+        """
+        Return the forward zone name and all forward zones below it
+        """
+        node = self.forward_zones
+        for label in self._labels(name):
+            node = node.get(label)
+            if node is None:
+                return []
+        result = []
+        if not child_zones_only and None in node:
+            result.append(node[None])
+        stack = [child for label, child in node.items() if label is not None]
+        while stack:
+            node = stack.pop()
+            for label, child in node.items():
+                if label is None:
+                    result.append(child)
+                else:
+                    stack.append(child)
+        return result
+
+
+# Zone indexes are kept per LDAP bind identity, so that zones read with the
+# access rights of one principal are never used to answer requests of
+# another one.
+ZONE_INDEX_CACHE_SIZE = 16
+_zone_index_cache = collections.OrderedDict()
+_zone_index_cache_lock = threading.Lock()
+
+
+def _get_last_usn(ldap):
+    """
+    Return the last USN of the database from root DSE, or None when the
+    entryUSN plugin is not enabled.
+    """
+    try:
+        entries, _truncated = ldap.find_entries(
+            '', ['lastusn'], DN(''), ldap.SCOPE_BASE,
+            size_limit=-1, time_limit=0)
+    except errors.NotFound:
+        return None
+    usns = [
+        int(value)
+        for attr in entries[0]
+        if attr.lower().split(';')[0] == 'lastusn'
+        for value in entries[0].raw[attr]
+    ]
+    return max(usns) if usns else None
+
+
+def _dns_changed_since(api, index):
+    """
+    Check whether a zone or a record entry the index depends on was added,
+    modified or deleted after the USN of index. Deleted entries are found
+    as tombstones.
+
+    The names of the known delegations are searched for too, their entries
+    no longer match nsrecord=* when the NS records were removed.
+    """
+    ldap = api.Backend.ldap2
+    names = [
+        name for delegations in index.delegations.values()
+        for name in delegations.values()
+    ]
+    usn_filter = '(entryusn>=%d)' % (index.usn + 1)
+    indexed_filter = ldap.combine_filters(
+        [
+            '(objectclass=idnszone)',
+            '(objectclass=idnsforwardzone)',
+            '(nsrecord=*)',
+            ldap.make_filter_from_attr('idnsname', names),
+        ],
+        ldap.MATCH_ANY)
+    search_filter = ldap.combine_filters(
+        [
+            ldap.combine_filters([usn_filter, indexed_filter],
+                                 ldap.MATCH_ALL),
+            ldap.combine_filters(['(objectclass=nstombstone)', usn_filter],
+                                 ldap.MATCH_ALL),
+        ],
+        ldap.MATCH_ANY)
+    try:
+        ldap.find_entries(
+            search_filter, ['entryusn'],
+            DN(api.env.container_dns, api.env.basedn), ldap.SCOPE_SUBTREE,
+            size_limit=1, time_limit=0)
+    except errors.NotFound:
+        return False
+    return True
+
+
+def get_dns_zone_index(api):
+    """
+    Return index of the active DNS zones, rebuilding it if a zone or an NS
+    record in the DNS container changed since it was built.
+
+    The database USN is compared first; the DNS container is searched for
+    changes only when anything in the database changed. The index is
+    validated once per request, again only after the request wrote to
+    LDAP. None is returned if changes can't be detected or the index can't
+    be cached, the callers then search LDAP directly.
+    """
+    ldap = api.Backend.ldap2
+    identity = ldap.get_cache_identity()
+    if identity is None:
+        return None
+
+    validated = getattr(context, 'dns_zone_index', None)
+    if validated is not None:
+        validated_identity, modify_count, index = validated
+        if (validated_identity == identity and
+                modify_count == ldap.modify_count):
+            return index
+
+    modify_count = ldap.modify_count
+    usn = _get_last_usn(ldap)
+    if usn is None:
+        return None
+
+    with _zone_index_cache_lock:
+        index = _zone_index_cache.get(identity)
+
+    if index is not None:
+        if usn == index.usn or not _dns_changed_since(api, index):
+            index.usn = usn
+            context.dns_zone_index = (identity, modify_count, index)
+            return index
+        logger.debug('DNS zone index is outdated, rebuilding')
+
+    entries = ldap.iter_entries(
+        '(|(objectclass=idnszone)(objectclass=idnsforwardzone)'
+        '(&(objectclass=idnsrecord)(nsrecord=*)))',
+        ['objectclass', 'idnsname', 'idnszoneactive', 'nsrecord'],
+        DN(api.env.container_dns, api.env.basedn), ldap.SCOPE_SUBTREE,
+        time_limit=-1, size_limit=-1)
+    try:
+        index = DNSZoneIndex(entries, usn)
+    except errors.NotFound:
+        index = DNSZoneIndex((), usn)
+
+    with _zone_index_cache_lock:
+        _zone_index_cache[identity] = index
+        _zone_index_cache.move_to_end(identity)
+        while len(_zone_index_cache) > ZONE_INDEX_CACHE_SIZE:
+            _zone_index_cache.popitem(last=False)
+    context.dns_zone_index = (identity, modify_count, index)
+    return index
+
+
 def _get_auth_zone_ldap(api, name):
     """
     Find authoritative zone in LDAP for name. Only active zones are considered.
@@ -1763,6 +2014,10 @@ def _get_auth_zone_ldap(api, name):
     zone: authoritative zone, or None if authoritative zone is not in LDAP
     """
     assert isinstance(name, DNSName)
+    index = get_dns_zone_index(api)
+    if index is not None:
+        return index.get_auth_zone(name), False
+
     ldap = api.Backend.ldap2
 
     # Create all possible parent zone names
@@ -1827,11 +2082,6 @@ def _get_longest_match_ns_delegation_ldap(api, zone, name):
     assert isinstance(zone, DNSName)
     assert isinstance(name, DNSName)
 
-    ldap = api.Backend.ldap2
-
-    # get zone DN
-    zone_dn = api.Object.dnszone.get_dn(zone)
-
     if name.is_absolute():
         relative_record_name = name.relativize(zone.make_absolute())
     else:
@@ -1841,6 +2091,16 @@ def _get_longest_match_ns_delegation_ldap(api, zone, name):
     if relative_record_name.is_empty():
         return None, False
 
+    index = get_dns_zone_index(api)
+    if index is not None:
+        return index.get_longest_match_ns_delegation(
+            zone, relative_record_name), False
+
+    ldap = api.Backend.ldap2
+
+    # get zone DN
+    zone_dn = api.Object.dnszone.get_dn(zone)
+
     # create list of possible record names
     possible_record_names = [DNSName(relative_record_name[i:]).ToASCII()
                              for i in range(len(relative_record_name))]
@@ -1886,6 +2146,10 @@ def _find_subtree_forward_zones_ldap(api, name, child_zones_only=False):
     :return: (list of zonenames,  truncated), list is empty if no zone found
     """
     assert isinstance(name, DNSName)
+    index = get_dns_zone_index(api)
+    if index is not None:
+        return index.find_subtree_forward_zones(name, child_zones_only), False
+
     ldap = api.Backend.ldap2
 
     # prepare for filter "*.<name>."
@@ -3015,6 +3279,211 @@ class dnszone_remove_permission(DNSZoneBase_remove_permission):
     __doc__ = _('Remove a permission for per-zone access delegation.')
 
 
+@register()
+class dnszone_import(LDAPQuery):
+    __doc__ = _('Import resource records of a master zone from a zone file.')
+
+    takes_options = (
+        Str('file',
+            cli_name='file',
+            label=_('Zone file'),
+            doc=_('Zone file in the RFC 1035 master file format'),
+            noextrawhitespace=False,
+        ),
+    )
+
+    has_output = (
+        output.summary,
+        output.Output('result', dict,
+                      _('Numbers of imported names and records')),
+        output.Output('failed', dict,
+                      _('Names which were not imported and the reasons')),
+        output.value,
+    )
+
+    def _parse_zone(self, zone, text):
+        try:
+            return dns.zone.from_text(text, origin=zone, relativize=True,
+                                      check_origin=False)
+        except dns.exception.DNSException as e:
+            raise errors.ValidationError(
+                name='file',
+                error=_('invalid zone file: %(error)s') % dict(error=e))
+
+    def _get_names_outside(self, zone, text):
+        """
+        Get owner names of the zone file which are not in the zone.
+
+        dnspython skips the records of these names silently, the file is
+        tokenized again to report them.
+        """
+        tok = dns.tokenizer.Tokenizer(text)
+        origin = zone
+        names = []
+        while True:
+            token = tok.get(want_leading=True)
+            if token.is_eof():
+                break
+            if token.is_identifier():
+                if token.value.upper() == '$ORIGIN':
+                    origin = tok.get_name(origin)
+                elif not token.value.startswith('$'):
+                    name = dns.name.from_text(token.value, origin)
+                    if not name.is_subdomain(zone):
+                        names.append(DNSName(name))
+            while not (token.is_eol() or token.is_eof()):
+                token = tok.get()
+        return names
+
+    def _get_existing_dns(self, ldap, dn):
+        """
+        Get DNs of the records already present in the zone
+        """
+        existing = set()
+        try:
+            for entry in ldap.iter_entries(
+                    '(objectclass=idnsrecord)', [''], dn, ldap.SCOPE_ONELEVEL,
+                    size_limit=-1, time_limit=-1):
+                existing.add(entry.dn)
+        except errors.NotFound:
+            pass
+        return existing
+
+    def _node_to_attrs(self, name, node, default_ttl):
+        """
+        Convert all RRsets of a zone file node to record attributes of one
+        LDAP entry.
+
+        bind-dyndb-ldap keeps a single TTL per name, the lowest TTL of the
+        RRsets is used for the whole entry.
+        """
+        attrs = {'idnsname': [name]}
+        ttls = []
+        for rdataset in node.rdatasets:
+            if rdataset.rdtype == dns.rdatatype.SOA:
+                # SOA is generated from the zone entry
+                continue
+            rrtype = dns.rdatatype.to_text(rdataset.rdtype)
+            attr = record_name_format % rrtype.lower()
+            param = self.api.Object.dnsrecord.params.get(attr)
+            if not isinstance(param, DNSRecord):
+                raise errors.ValidationError(
+                    name='file',
+                    error=_('DNS RR type "%s" is not supported') % rrtype)
+            attrs[attr] = list(param(
+                tuple(unicode(rdata.to_text()) for rdata in rdataset)))
+            ttls.append(rdataset.ttl)
+
+        if ttls and min(ttls) != default_ttl:
+            attrs['dnsttl'] = [min(ttls)]
+        return attrs
+
+    def _check_attrs(self, dn, attrs, keys, old_entry=None):
+        dnsrecord = self.api.Object.dnsrecord
+        dnsrecord.run_precallback_validators(dn, attrs, *keys, force=True)
+        rrattrs = dnsrecord.updated_rrattrs(old_entry, attrs)
+        dnsrecord.check_record_type_dependencies(keys, rrattrs)
+        dnsrecord.check_record_type_collisions(keys, rrattrs)
+
+    def _import_apex(self, ldap, zone_entry, attrs, keys):
+        """
+        Merge records of the zone apex into the zone entry.
+
+        Returns the number of added records.
+        """
+        del attrs['idnsname']
+        attrs.pop('dnsttl', None)
+        count = 0
+        for attr, values in attrs.items():
+            old_values = zone_entry.get(attr, [])
+            new_values = [v for v in values if v not in old_values]
+            attrs[attr] = old_values + new_values
+            count += len(new_values)
+        self._check_attrs(zone_entry.dn, attrs, keys, zone_entry)
+        zone_entry.update(attrs)
+        try:
+            ldap.update_entry(zone_entry)
+        except errors.EmptyModlist:
+            pass
+        return count
+
+    def execute(self, *keys, **options):
+        ldap = self.obj.backend
+        dnsrecord = self.api.Object.dnsrecord
+        zone = keys[-1]
+
+        dn = self.obj.get_dn(*keys, **options)
+        try:
+            zone_entry = ldap.get_entry(
+                dn, ['objectclass', 'dnsdefaultttl'] + _record_attributes)
+        except errors.NotFound:
+            raise self.obj.handle_not_found(*keys)
+
+        if not _check_entry_objectclass(zone_entry, self.obj.object_class):
+            raise self.obj.handle_not_found(*keys)
+
+        zonefile = self._parse_zone(zone, options['file'])
+        default_ttl = zone_entry.single_value.get('dnsdefaultttl')
+        existing = self._get_existing_dns(ldap, dn)
+        failed = {
+            unicode(name): unicode(_('name is outside of the zone'))
+            for name in self._get_names_outside(
+                zone.make_absolute(), options['file'])
+        }
+        records = {}
+        start = time.time()
+
+        def make_entries():
+            for name, node in zonefile.nodes.items():
+                name = DNSName(name)
+                rrkeys = (zone, name)
+                try:
+                    attrs = self._node_to_attrs(name, node, default_ttl)
+                    if dnsrecord.is_pkey_zone_record(*rrkeys):
+                        count = self._import_apex(
+                            ldap, zone_entry, attrs, rrkeys)
+                        if count:
+                            records[dn] = count
+                        continue
+                    entry_dn = DN(('idnsname', name.ToASCII()), dn)
+                    if entry_dn in existing:
+                        raise errors.DuplicateEntry()
+                    self._check_attrs(entry_dn, attrs, rrkeys)
+                except errors.PublicError as e:
+                    failed[unicode(name)] = unicode(e)
+                    continue
+                entry = ldap.make_entry(
+                    entry_dn, objectclass=dnsrecord.object_class, **attrs)
+                records[entry_dn] = sum(
+                    len(v) for k, v in attrs.items()
+                    if k in _record_attributes)
+                yield entry
+
+        for entry, error in ldap.add_entries(make_entries(),
+                                             _zone_import_window):
+            if error is not None:
+                failed[unicode(entry.single_value['idnsname'])] = \
+                    unicode(error)
+                del records[entry.dn]
+
+        names = len(records)
+        count = sum(records.values())
+        duration = time.time() - start
+        logger.info("Imported %d records of %d names into zone %s in "
+                    "%.1f s (%.1f records/s), %d names failed",
+                    count, names, zone, duration,
+                    count / duration if duration > 0 else 0.0, len(failed))
+
+        return dict(
+            result=dict(names=names, records=count),
+            failed=failed,
+            summary=_('Imported %(records)d records of %(names)d names, '
+                      '%(failed)d names failed') % dict(
+                          records=count, names=names, failed=len(failed)),
+            value=pkey_to_value(zone, options),
+        )
+
+
 @register()
 class dnsrecord(LDAPObject):
     """
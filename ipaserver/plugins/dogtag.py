@@ -247,6 +247,7 @@ import logging
 from lxml import etree
 import time
 import contextlib
+import threading
 
 import six
 
@@ -1204,7 +1205,7 @@ class RestClient(Backend):
             cafile=self.ca_cert,
             client_certfile=self.client_certfile,
             client_keyfile=self.client_keyfile,
-            method='GET'
+            method='GET', pooled=True
         )
         cookies = ipapython.cookie.Cookie.parse(resp_headers.get('set-cookie', ''))
         if status != 200 or len(cookies) == 0:
@@ -1220,7 +1221,7 @@ class RestClient(Backend):
             cafile=self.ca_cert,
             client_certfile=self.client_certfile,
             client_keyfile=self.client_keyfile,
-            method='GET'
+            method='GET', pooled=True
         )
         object.__setattr__(self, 'cookie', None)
 
@@ -1264,7 +1265,7 @@ class RestClient(Backend):
             cafile=self.ca_cert,
             client_certfile=self.client_certfile,
             client_keyfile=self.client_keyfile,
-            method=method, headers=headers, body=body
+            method=method, headers=headers, body=body, pooled=True
         )
         if status < 200 or status >= 300:
             explanation = self._parse_dogtag_error(resp_body) or ''
@@ -1329,7 +1330,7 @@ class ra(rabase.rabase, RestClient):
             cafile=self.ca_cert,
             client_certfile=self.client_certfile,
             client_keyfile=self.client_keyfile,
-            **kw)
+            pooled=True, **kw)
 
     def get_parse_result_xml(self, xml_text, parse_func):
         '''
@@ -1834,7 +1835,7 @@ class ra(rabase.rabase, RestClient):
                      'User-Agent': 'IPA',
                      'Content-Type': 'application/xml',
                      'Accept': 'application/xml'},
-            body=payload
+            body=payload, pooled=True
         )
 
         if status != 200:
@@ -1935,6 +1936,10 @@ class kra(Backend):
 
     def __init__(self, api, kra_port=443):
         self.kra_port = kra_port
+        # PKIConnection wraps a requests session which keeps its TLS
+        # connections alive; sessions are not thread safe so every worker
+        # thread keeps its own connection
+        self._connections = threading.local()
         super(kra, self).__init__(api)
 
     @property
@@ -1975,11 +1980,23 @@ class kra(Backend):
             transport_cert=x509.load_certificate_from_file(paths.RA_AGENT_PEM)
         )
 
+        yield KRAClient(self._get_connection(), crypto)
+
+    def _get_connection(self):
+        """
+        Return a keep-alive connection to the KRA, reusing the one created
+        earlier by the current thread for the same KRA host.
+        """
+        kra_host = self.kra_host
+        cached = getattr(self._connections, 'connection', None)
+        if cached is not None and cached[0] == kra_host:
+            return cached[1]
+
         # TODO: obtain KRA host & port from IPA service list or point to KRA load balancer
         # https://fedorahosted.org/freeipa/ticket/4557
         connection = PKIConnection(
             'https',
-            self.kra_host,
+            kra_host,
             str(self.kra_port),
             'kra',
             cert_paths=paths.IPA_CA_CRT
@@ -1988,7 +2005,8 @@ class kra(Backend):
         connection.set_authentication_cert(paths.RA_AGENT_PEM,
                                            paths.RA_AGENT_KEY)
 
-        yield KRAClient(connection, crypto)
+        self._connections.connection = (kra_host, connection)
+        return connection
 
 
 @register()
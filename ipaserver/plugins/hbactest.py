@@ -17,11 +17,13 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import collections
 import logging
+import threading
 
 from ipalib import api, errors, output, util
 from ipalib import Command, Str, Flag, Int
-from ipalib import _
+from ipalib import _, ngettext
 from ipapython.dn import DN
 from ipalib.plugable import Registry
 if api.env.in_server:
@@ -146,6 +148,31 @@ EXAMPLES:
       Matched rules: allow_all
 
 
+BULK EVALUATION
+
+hbactest-bulk evaluates every combination of the given users, hosts and
+services against the HBAC rules in one call. The rules and the members of
+the user groups, host groups and HBAC service groups they refer to are
+compiled into an index when the command is first used; the index is
+rebuilt only after an HBAC rule or a group changes. Users from trusted
+domains are not supported by hbactest-bulk.
+
+EXAMPLES:
+
+    1. Test which of two users can log in to two hosts using sshd:
+    $ ipa hbactest-bulk --user=a1a --user=b2b --host=foo --host=bar \\
+          --service=sshd
+    -----------------------------
+    2 of 4 requests were granted
+    -----------------------------
+      User name: a1a
+      Target host: foo.example.com
+      Service: sshd
+      Access granted: True
+      Matched rules: allow_a1a
+      ...
+
+
 HBACTEST AND TRUSTED DOMAINS
 
 When an external trusted domain is configured in IPA, HBAC rules are also applied
@@ -251,6 +278,217 @@ def _convert_to_ipa_rule(rule):
     return ipa_rule
 
 
+def _is_trusted_domain_user(user):
+    if _dcerpc_bindings_installed:
+        is_valid_sid = ipaserver.dcerpc.is_sid_valid(user)
+    else:
+        is_valid_sid = False
+    components = util.normalize_name(user)
+    return is_valid_sid or 'domain' in components or 'flatname' in components
+
+
+class HBACRuleIndex:
+    """
+    HBAC rules compiled for repeated evaluation.
+
+    User groups, host groups and HBAC service groups referenced by the rules
+    are expanded to all their direct and indirect members when the index is
+    built. Every user, host and service name is then mapped to the rules it
+    is a member of, so evaluating a request is a few set intersections and
+    does not need any LDAP lookup.
+    """
+
+    # (element, rule attribute, member object, group object)
+    structure = (
+        ('user', 'memberuser', 'user', 'group'),
+        ('host', 'memberhost', 'host', 'hostgroup'),
+        ('service', 'memberservice', 'hbacsvc', 'hbacsvcgroup'),
+    )
+
+    def __init__(self, rules, group_members, state):
+        """
+        :param rules: HBAC rules as returned by hbacrule_find
+        :param group_members: maps (group object, group name) to the set of
+            names of its direct and indirect members
+        :param state: state of the LDAP containers the index was built from
+        """
+        self.rules = rules
+        self.state = state
+        self.names = [rule['cn'][0] for rule in rules]
+        self.enabled = frozenset(
+            i for i, rule in enumerate(rules) if rule['ipaenabledflag'][0])
+        self._by_name = {}
+        self._category_all = {}
+
+        for element, attr, member_obj, group_obj in self.structure:
+            by_name = collections.defaultdict(set)
+            category_all = set()
+            for i, rule in enumerate(rules):
+                category = rule.get('%scategory' % element)
+                if category and category[0] == u'all':
+                    category_all.add(i)
+                    continue
+                for name in rule.get('%s_%s' % (attr, member_obj), []):
+                    by_name[name.lower()].add(i)
+                for group in rule.get('%s_%s' % (attr, group_obj), []):
+                    for name in group_members.get((group_obj, group), ()):
+                        by_name[name].add(i)
+            self._by_name[element] = dict(by_name)
+            self._category_all[element] = frozenset(category_all)
+
+    def _lookup(self, element, name):
+        return self._category_all[element].union(
+            self._by_name[element].get(name.lower(), ()))
+
+    def evaluate(self, user, host, service, rules=None):
+        """
+        :param rules: indexes of the rules to evaluate, all enabled rules
+            are used if not specified
+        :return: sorted names of the rules which grant the access
+        """
+        if rules is None:
+            rules = self.enabled
+        matched = (
+            self._lookup('user', user) &
+            self._lookup('host', host) &
+            self._lookup('service', service) &
+            rules
+        )
+        return sorted(self.names[i] for i in matched)
+
+
+# Compiled rule indexes are kept per LDAP bind identity, so that rules and
+# group members read with the access rights of one principal are never used
+# to answer requests of another one.
+RULE_INDEX_CACHE_SIZE = 16
+_rule_index_cache = collections.OrderedDict()
+_rule_index_cache_lock = threading.Lock()
+
+
+def _get_newest_usn(ldap, container_dn, since=None):
+    """
+    :return: the newest entryUSN of the entries directly below
+        ``container_dn``
+
+    Only entries modified after ``since`` are read if it is specified.
+    """
+    filter = '(objectclass=*)'
+    if since is not None:
+        filter = '(entryusn>=%d)' % (since + 1)
+    newest = since
+    for entry in ldap.iter_entries(
+            filter, ['entryusn'], container_dn,
+            scope=ldap.SCOPE_ONELEVEL, size_limit=-1):
+        usn = entry.single_value.get('entryusn')
+        if usn is not None and (newest is None or usn > newest):
+            newest = usn
+    return newest
+
+
+def _get_rule_index_state(api, since=None):
+    """
+    Return the state of the LDAP data a rule index is built from.
+
+    The state consists of the entryUSN of every HBAC rule, so that added,
+    modified and deleted rules are detected, and the newest entryUSN of
+    groups, host groups and HBAC service groups. Membership changes modify
+    the groups; deleted members are removed from their groups by the
+    referential integrity plugin. Unlike modifyTimestamp, entryUSN changes
+    with every modification, even several ones within a second.
+    """
+    ldap = api.Backend.ldap2
+    rules_state = frozenset(
+        (entry.dn, entry.single_value.get('entryusn'))
+        for entry in ldap.iter_entries(
+            '(objectclass=ipahbacrule)', ['entryusn'],
+            DN(api.env.container_hbac, api.env.basedn),
+            scope=ldap.SCOPE_ONELEVEL, size_limit=-1)
+    )
+    containers = (
+        api.env.container_group,
+        api.env.container_hostgroup,
+        api.env.container_hbacservicegroup,
+    )
+    groups_state = tuple(
+        _get_newest_usn(
+            ldap, DN(container, api.env.basedn),
+            since=since[i] if since is not None else None)
+        for i, container in enumerate(containers)
+    )
+    return rules_state, groups_state
+
+
+def _expand_group_members(api, rules):
+    """
+    Return names of all direct and indirect members of the groups referenced
+    by ``rules``, keyed by (group object, group name).
+
+    The memberOf attribute of the members already contains the indirect
+    memberships, so one search per member object is enough.
+    """
+    ldap = api.Backend.ldap2
+    group_members = {}
+    for element, attr, member_obj, group_obj in HBACRuleIndex.structure:
+        group_dns = {}
+        for rule in rules:
+            for group in rule.get('%s_%s' % (attr, group_obj), []):
+                group_dn = api.Object[group_obj].get_dn(group)
+                group_dns[group_dn] = group
+                group_members[(group_obj, group)] = set()
+        if not group_dns:
+            continue
+
+        obj = api.Object[member_obj]
+        pkey = obj.primary_key.name
+        filter = ldap.make_filter_from_attr(
+            'memberof', list(group_dns), rules=ldap.MATCH_ANY)
+        for entry in ldap.iter_entries(
+                filter, [pkey, 'memberof'],
+                DN(obj.container_dn, api.env.basedn), size_limit=-1):
+            name = entry.single_value.get(pkey)
+            if name is None:
+                continue
+            for group_dn in entry.get('memberof', []):
+                group = group_dns.get(group_dn)
+                if group is not None:
+                    group_members[(group_obj, group)].add(name.lower())
+    return group_members
+
+
+def get_rule_index(api):
+    """
+    Return compiled HBAC rule index, rebuilding it if the rules or any group
+    changed since it was built.
+    """
+    identity = api.Backend.ldap2.get_cache_identity()
+    with _rule_index_cache_lock:
+        index = _rule_index_cache.get(identity)
+
+    if index is not None:
+        state = _get_rule_index_state(api, since=index.state[1])
+        if state == index.state:
+            return index
+        logger.debug('HBAC rule index is outdated, rebuilding')
+
+    state = _get_rule_index_state(api)
+    rules = api.Command.hbacrule_find(sizelimit=0, no_members=False)['result']
+    index = HBACRuleIndex(rules, _expand_group_members(api, rules), state)
+
+    # the index can only be validated if entryUSN is readable
+    rules_state, groups_state = state
+    validatable = (
+        all(usn is not None for _dn, usn in rules_state) and
+        all(newest is not None for newest in groups_state)
+    )
+    if identity is not None and validatable:
+        with _rule_index_cache_lock:
+            _rule_index_cache[identity] = index
+            _rule_index_cache.move_to_end(identity)
+            while len(_rule_index_cache) > RULE_INDEX_CACHE_SIZE:
+                _rule_index_cache.popitem(last=False)
+    return index
+
+
 @register()
 class hbactest(Command):
     __doc__ = _('Simulate use of Host-based access controls')
@@ -350,7 +588,9 @@ class hbactest(Command):
             all_enabled = True
 
         hbacset = []
-        if len(testrules) == 0:
+        if len(testrules) == 0 and sizelimit is None:
+            hbacset = get_rule_index(self.api).rules
+        elif len(testrules) == 0:
             hbacset = self.api.Command.hbacrule_find(
                 sizelimit=sizelimit, no_members=False)['result']
         else:
@@ -390,12 +630,7 @@ class hbactest(Command):
 
         if options['user'] != u'all':
             # check first if this is not a trusted domain user
-            if _dcerpc_bindings_installed:
-                is_valid_sid = ipaserver.dcerpc.is_sid_valid(options['user'])
-            else:
-                is_valid_sid = False
-            components = util.normalize_name(options['user'])
-            if is_valid_sid or 'domain' in components or 'flatname' in components:
+            if _is_trusted_domain_user(options['user']):
                 # this is a trusted domain user
                 if not _dcerpc_bindings_installed:
                     raise errors.NotFound(reason=_(
@@ -508,3 +743,110 @@ class hbactest(Command):
 
         result['value'] = access_granted
         return result
+
+
+@register()
+class hbactest_bulk(Command):
+    __doc__ = _('Simulate use of Host-based access controls for many '
+                'users, hosts and services at once')
+
+    msg_summary = ngettext(
+        '%(allowed)d of %(count)d request was granted',
+        '%(allowed)d of %(count)d requests were granted', 0)
+
+    has_output = (
+        output.summary,
+        output.ListOfEntries('result'),
+        output.Output('count', int, _('Number of requests evaluated')),
+    )
+
+    has_output_params = (
+        Str('user',
+            label=_('User name'),
+        ),
+        Str('targethost',
+            label=_('Target host'),
+        ),
+        Str('service',
+            label=_('Service'),
+        ),
+        Flag('value',
+             label=_('Access granted'),
+        ),
+        Str('matched*',
+            label=_('Matched rules'),
+        ),
+    )
+
+    takes_options = (
+        Str('user+',
+            cli_name='user',
+            label=_('User name'),
+        ),
+        Str('targethost+',
+            cli_name='host',
+            label=_('Target host'),
+        ),
+        Str('service+',
+            cli_name='service',
+            label=_('Service'),
+        ),
+        Str('rules*',
+            cli_name='rules',
+            label=_('Rules to test. If not specified, all enabled rules '
+                    'are used'),
+        ),
+        Flag('nodetail?',
+             cli_name='nodetail',
+             label=_('Hide details which rules are matched'),
+        ),
+    )
+
+    def execute(self, *args, **options):
+        for user in options['user']:
+            if _is_trusted_domain_user(user):
+                raise errors.ValidationError(
+                    name='user',
+                    error=_('users from trusted domains are not supported, '
+                            'use hbactest instead'))
+
+        index = get_rule_index(self.api)
+
+        rules = None
+        if options.get('rules'):
+            positions = {name: i for i, name in enumerate(index.names)}
+            unresolved = [
+                name for name in options['rules'] if name not in positions]
+            if unresolved:
+                raise errors.NotFound(
+                    reason=_('Unresolved rules: %(rules)s') % dict(
+                        rules=', '.join(unresolved)))
+            rules = frozenset(positions[name] for name in options['rules'])
+
+        hbactest = self.api.Command.hbactest
+        hosts = [hbactest.canonicalize(host) for host in options['targethost']]
+
+        result = []
+        allowed = 0
+        for user in options['user']:
+            for host in hosts:
+                for service in options['service']:
+                    matched = index.evaluate(user, host, service, rules)
+                    entry = dict(
+                        user=user,
+                        targethost=host,
+                        service=service,
+                        value=bool(matched),
+                    )
+                    if matched:
+                        allowed += 1
+                        if not options['nodetail']:
+                            entry['matched'] = matched
+                    result.append(entry)
+
+        return dict(
+            result=result,
+            count=len(result),
+            summary=self.msg_summary % dict(
+                allowed=allowed, count=len(result)),
+        )
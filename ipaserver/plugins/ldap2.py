@@ -31,14 +31,17 @@ from __future__ import absolute_import
 
 import logging
 import os
+import time
+from collections import OrderedDict
 
 import ldap as _ldap
 
 from ipalib import krb_utils
 from ipaplatform.paths import paths
 from ipapython.dn import DN
-from ipapython.ipaldap import (LDAPCache, AUTOBIND_AUTO, AUTOBIND_ENABLED,
-                               AUTOBIND_DISABLED)
+from ipapython.ipaldap import (LDAPClient, LDAPCache, AUTOBIND_AUTO,
+                               AUTOBIND_ENABLED, AUTOBIND_DISABLED,
+                               ldap_connection_pool, shared_ldap_cache)
 
 from ipalib import Registry, errors, _
 from ipalib.crud import CrudBackend
@@ -51,26 +54,122 @@ register = Registry()
 _missing = object()
 
 
+def _context_property(name, default):
+    """
+    Keep a connection related attribute in the thread-local request context
+
+    The LDAP connection of a thread lives in the request context, so do the
+    entry cache and search limits tied to it. Otherwise threads sharing the
+    backend, e.g. batch workers, would clear each other's state.
+    """
+    attr = 'ldap2_%s' % name
+
+    def fget(self):
+        try:
+            return getattr(context, attr)
+        except AttributeError:
+            value = default()
+            setattr(context, attr, value)
+            return value
+
+    def fset(self, value):
+        setattr(context, attr, value)
+
+    return property(fget, fset)
+
+
 @register()
 class ldap2(CrudBackend, LDAPCache):
     """
     LDAP Backend Take 2.
     """
 
+    cache = _context_property('cache', OrderedDict)
+    _cache_hits = _context_property('cache_hits', int)
+    _cache_misses = _context_property('cache_misses', int)
+    _modify_count = _context_property('modify_count', int)
+    _time_limit = _context_property(
+        'time_limit', lambda: float(LDAPCache.time_limit))
+    _size_limit = _context_property(
+        'size_limit', lambda: int(LDAPCache.size_limit))
+
     def __init__(self, api):
         force_schema_updates = api.env.context in ('installer', 'updates')
 
+        enable_cache = api.env.ldap_cache and not force_schema_updates
+        if enable_cache and api.env.ldap_shared_cache:
+            shared_cache = shared_ldap_cache
+            shared_cache.configure(
+                max_entries=api.env.ldap_shared_cache_size,
+                ttl=api.env.ldap_shared_cache_ttl,
+            )
+        else:
+            shared_cache = None
+
+        if api.env.ldap_connection_reuse and not force_schema_updates:
+            connection_pool = ldap_connection_pool
+            connection_pool.configure(
+                max_connections=api.env.ldap_connection_pool_size,
+                idle_timeout=api.env.ldap_connection_idle_timeout,
+            )
+        else:
+            connection_pool = None
+
         CrudBackend.__init__(self, api)
         LDAPCache.__init__(
             self, None,
             force_schema_updates=force_schema_updates,
-            enable_cache=api.env.ldap_cache and not force_schema_updates,
+            enable_cache=enable_cache,
             cache_size=api.env.ldap_cache_size,
             debug_cache=api.env.ldap_cache_debug,
+            shared_cache=shared_cache,
         )
 
-        self._time_limit = float(LDAPCache.time_limit)
-        self._size_limit = int(LDAPCache.size_limit)
+        self.connection_pool = connection_pool
+
+        if shared_cache is not None and api.env.ldap_shared_cache_psearch:
+            self._start_shared_cache_watcher()
+
+    def _start_shared_cache_watcher(self):
+        """
+        Watch the suffix for changes made by other processes and replicas
+        to invalidate the shared entry cache early.
+
+        The watcher binds with the default Kerberos credentials of the
+        process. Without them, shared entries only expire.
+        """
+        if self.shared_cache.watcher_running:
+            return
+        try:
+            client = LDAPClient(self.ldap_uri, no_schema=True)
+            client.gssapi_bind()
+        except Exception as e:
+            logger.warning(
+                "Unable to start LDAP entry cache watcher: %s", e)
+            return
+        self.shared_cache.start_watcher(client, self.api.env.basedn)
+
+    def get_cache_identity(self):
+        return getattr(context, 'ldap_cache_identity', None)
+
+    def _acquire_pooled_connection(self, ccache):
+        """
+        Return an idle connection bound as the principal of ccache or None.
+        """
+        creds = krb_utils.get_credentials_if_valid(ccache_name=ccache)
+        if creds is None:
+            return None
+        principal = str(creds.name)
+        identity = 'krb:%s' % principal
+        pooled = self.connection_pool.acquire(identity)
+        if pooled is None:
+            return None
+
+        conn, deadline = pooled
+        setattr(context, 'principal', principal)
+        setattr(context, 'ldap_cache_identity', identity)
+        setattr(context, 'ldap_pooled_connection', (identity, deadline))
+        return conn
 
     @property
     def ldap_uri(self):
@@ -158,6 +257,22 @@ class ldap2(CrudBackend, LDAPCache):
         if size_limit is not _missing:
             object.__setattr__(self, 'size_limit', size_limit)
 
+        ldapi = self.ldap_uri.startswith('ldapi://')
+
+        # only plain GSSAPI binds are reused, the principal they are bound
+        # as is known before binding
+        reuse = (
+            self.connection_pool is not None and
+            not bind_pw and not serverctrls and not clientctrls and
+            not (autobind != AUTOBIND_DISABLED and os.getegid() == 0 and
+                 ldapi)
+        )
+        setattr(context, 'ldap_pooled_connection', None)
+        if reuse:
+            conn = self._acquire_pooled_connection(ccache)
+            if conn is not None:
+                return conn
+
         client = LDAPCache(
             self.ldap_uri,
             force_schema_updates=self._force_schema_updates,
@@ -176,16 +291,17 @@ class ldap2(CrudBackend, LDAPCache):
                 if maxssf < minssf:
                     conn.set_option(_ldap.OPT_X_SASL_SSF_MAX, minssf)
 
-        ldapi = self.ldap_uri.startswith('ldapi://')
-
+        identity = None
         if bind_pw:
             client.simple_bind(bind_dn, bind_pw,
                                server_controls=serverctrls,
                                client_controls=clientctrls)
+            identity = 'dn:%s' % bind_dn
         elif autobind != AUTOBIND_DISABLED and os.getegid() == 0 and ldapi:
             try:
                 client.external_bind(server_controls=serverctrls,
                                      client_controls=clientctrls)
+                identity = 'external:%d' % os.geteuid()
             except errors.NotFound:
                 if autobind == AUTOBIND_ENABLED:
                     # autobind was required and failed, raise
@@ -205,13 +321,35 @@ class ldap2(CrudBackend, LDAPCache):
             client.gssapi_bind(server_controls=serverctrls,
                                client_controls=clientctrls)
             setattr(context, 'principal', principal)
+            identity = 'krb:%s' % principal
+
+            if reuse:
+                # the connection must not outlive the credentials
+                creds = krb_utils.get_credentials_if_valid(
+                    ccache_name=ccache)
+                if creds is not None:
+                    deadline = time.monotonic() + creds.lifetime
+                    setattr(context, 'ldap_pooled_connection',
+                            (identity, deadline))
+                    self.connection_pool.created_connection()
+
+        # bind controls may change what the server returns, do not share
+        # entries read on such connections
+        if serverctrls or clientctrls:
+            identity = None
+        setattr(context, 'ldap_cache_identity', identity)
 
         return conn
 
     def destroy_connection(self):
         """Disconnect from LDAP server."""
+        pooled = getattr(context, 'ldap_pooled_connection', None)
+        setattr(context, 'ldap_pooled_connection', None)
         try:
-            if self.conn is not None:
+            if self.conn is not None and pooled is not None:
+                identity, deadline = pooled
+                self.connection_pool.release(identity, self.conn, deadline)
+            elif self.conn is not None:
                 self.unbind()
         except errors.PublicError:
             # ignore when trying to unbind multiple times
@@ -219,6 +357,7 @@ class ldap2(CrudBackend, LDAPCache):
 
         object.__delattr__(self, 'time_limit')
         object.__delattr__(self, 'size_limit')
+        setattr(context, 'ldap_cache_identity', None)
         self.clear_cache()
 
     def get_ipa_config(self, attrs_list=None):
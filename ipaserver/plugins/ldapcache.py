@@ -0,0 +1,87 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+from ipalib import _
+from ipalib import Bool, Int
+from ipalib import output
+from ipalib.plugable import Registry
+from .virtual import VirtualCommand
+
+__doc__ = _("""
+LDAP entry cache
+
+Show statistics of the LDAP entry cache shared by all requests handled
+by the server process which answers the request. The cache is enabled
+with the ldap_shared_cache option in default.conf.
+
+The statistics of LDAP connections reused between requests of the same
+principal, enabled with the ldap_connection_reuse option, are shown as
+well.
+
+The statistics can be read by admins and by the members of privileges
+with the "Read LDAP Cache Statistics" permission.
+
+EXAMPLES:
+
+ Show statistics of the shared LDAP entry cache and connection reuse:
+   ipa ldapcache-show
+""")
+
+register = Registry()
+
+
+@register()
+class ldapcache_show(VirtualCommand):
+    __doc__ = _('Show statistics of the shared LDAP entry cache.')
+
+    operation = 'read ldap cache statistics'
+
+    has_output = (
+        output.Output('result', dict, _('Cache statistics')),
+    )
+
+    has_output_params = (
+        Bool('enabled', label=_('Enabled')),
+        Int('size', label=_('Cached entries')),
+        Int('max_entries', label=_('Maximum cached entries')),
+        Int('ttl', label=_('Entry lifetime')),
+        Int('hits', label=_('Hits')),
+        Int('misses', label=_('Misses')),
+        Int('evictions', label=_('Evictions')),
+        Int('expirations', label=_('Expirations')),
+        Int('invalidations', label=_('Invalidations')),
+        Bool('watcher', label=_('Change watcher running')),
+        Bool('connection_reuse', label=_('Connection reuse enabled')),
+        Int('idle_connections', label=_('Idle connections')),
+        Int('max_connections', label=_('Maximum idle connections')),
+        Int('idle_timeout', label=_('Connection idle timeout')),
+        Int('connections_created', label=_('Connections created')),
+        Int('connections_reused', label=_('Connections reused')),
+        Int('connections_expired', label=_('Connections expired')),
+        Int('connections_evicted', label=_('Connections evicted')),
+        Int('connections_broken', label=_('Broken connections')),
+    )
+
+    def execute(self, **options):
+        self.check_access()
+        ldap = self.api.Backend.ldap2
+        shared_cache = ldap.shared_cache
+        if shared_cache is None:
+            result = dict(enabled=False)
+        else:
+            result = shared_cache.stats()
+            result['enabled'] = True
+
+        connection_pool = ldap.connection_pool
+        result['connection_reuse'] = connection_pool is not None
+        if connection_pool is not None:
+            stats = connection_pool.stats()
+            result.update(
+                idle_connections=stats['idle'],
+                max_connections=stats['max_connections'],
+                idle_timeout=stats['idle_timeout'],
+            )
+            for key in ('created', 'reused', 'expired', 'evicted', 'broken'):
+                result['connections_%s' % key] = stats[key]
+        return dict(result=result)
@@ -0,0 +1,83 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+from ipalib import _, ngettext
+from ipalib import Decimal, Int, Str
+from ipalib import output
+from ipalib.metrics import metrics
+from ipalib.plugable import Registry
+from .virtual import VirtualCommand
+
+__doc__ = _("""
+Command metrics
+
+Show metrics of the commands executed by the server process which
+answers the request: the number of calls and errors, latencies broken
+down by the phases of a command call, and the number of LDAP operations,
+LDAP cache lookups and Dogtag requests. Commands are ordered by the
+total time spent executing them.
+
+All times are in milliseconds. Phase times are means per call, the 95th
+percentile is estimated from a latency histogram.
+
+The metrics can be read by admins and by the members of privileges with
+the "Read Server Metrics" permission.
+
+EXAMPLES:
+
+ Show metrics of all commands executed so far:
+   ipa metrics-show
+""")
+
+register = Registry()
+
+
+@register()
+class metrics_show(VirtualCommand):
+    __doc__ = _('Show per-command metrics of the server process.')
+
+    operation = 'read server metrics'
+
+    has_output = (
+        output.summary,
+        output.ListOfEntries('result'),
+        output.Output('count', int, _('Number of commands')),
+    )
+
+    has_output_params = (
+        Str('command', label=_('Command')),
+        Int('calls', label=_('Calls')),
+        Int('errors', label=_('Errors')),
+        Decimal('time_total', label=_('Total time')),
+        Decimal('time_mean', label=_('Mean time')),
+        Decimal('time_p95', label=_('95th percentile time')),
+        Decimal('time_max', label=_('Maximum time')),
+        Decimal('time_args', label=_('Parameter parsing time')),
+        Decimal('time_normalize', label=_('Normalization time')),
+        Decimal('time_convert', label=_('Conversion time')),
+        Decimal('time_validate', label=_('Validation time')),
+        Decimal('time_execute', label=_('Execution time')),
+        Decimal('time_validate_output', label=_('Output validation time')),
+        Int('ldap_operations', label=_('LDAP operations')),
+        Int('ldap_cache_hits', label=_('LDAP cache hits')),
+        Int('ldap_cache_misses', label=_('LDAP cache misses')),
+        Int('dogtag_requests', label=_('Dogtag requests')),
+        Int('dogtag_connections_created',
+            label=_('Dogtag connections created')),
+        Int('dogtag_connections_reused',
+            label=_('Dogtag connections reused')),
+        Int('dogtag_connections_discarded',
+            label=_('Dogtag connections discarded')),
+        Int('dogtag_retries', label=_('Dogtag request retries')),
+        Int('buckets', label=_('Latency histogram'), multivalue=True),
+    )
+
+    msg_summary = ngettext(
+        '%(count)d command executed', '%(count)d commands executed', 0
+    )
+
+    def execute(self, **options):
+        self.check_access()
+        result = metrics.stats()
+        return dict(result=result, count=len(result))
@@ -19,6 +19,7 @@
 
 from __future__ import absolute_import
 
+import collections
 import logging
 import re
 from ldap import MOD_ADD
@@ -60,6 +61,13 @@ The default group container is ou=Groups.
 
 Users and groups that already exist on the IPA server are skipped.
 
+Entries are read from the remote server in pages and added to IPA in a
+pipeline, so that the whole remote container is never held in memory.
+When a migration is interrupted, for example because the HTTP request
+timed out, re-run it with the "--resume" option. Users and groups
+already present in IPA are then skipped before any further processing
+instead of being reported as failed.
+
 Two LDAP schemas define how group members are stored: RFC2307 and
 RFC2307bis. RFC2307bis uses member and uniquemember to specify group
 members, RFC2307 uses memberUid. The default schema is RFC2307bis.
@@ -127,8 +135,9 @@ file should be evaluated post-migration to correct or investigate any
 issues that were discovered.
 
 For every 100 users migrated an info-level message will be displayed to
-give the current progress and duration to make it possible to track
-the progress of migration.
+give the current progress, duration and throughput to make it possible to
+track the progress of migration. A summary with the number of read,
+migrated, failed and skipped entries is logged for users and groups.
 
 If the log level is debug, either by setting debug = True in
 /etc/ipa/default.conf or /etc/ipa/server.conf, then an entry will be printed
@@ -154,6 +163,9 @@ _supported_schemas = (u'RFC2307bis', u'RFC2307')
 _supported_scopes = {u'base': SCOPE_BASE, u'onelevel': SCOPE_ONELEVEL, u'subtree': SCOPE_SUBTREE}
 _default_scope = u'onelevel'
 
+# number of entries being added to IPA concurrently
+_add_window = 32
+
 
 def _create_kerberos_principals(ldap, pkey, entry_attrs, failed):
     """
@@ -195,11 +207,28 @@ def _pre_migrate_user(ldap, pkey, dn, entry_attrs, failed, config, ctx, **kwargs
     else:
         # See if the gidNumber at least points to a valid group on the remote
         # server.
+        gid_index = ctx.get('gid_index')
         if entry_attrs['gidnumber'][0] in invalid_gids:
             logger.warning('GID number %s of migrated user %s does not point '
                            'to a known group.',
                            entry_attrs['gidnumber'][0], pkey)
-        elif entry_attrs['gidnumber'][0] not in valid_gids:
+        elif entry_attrs['gidnumber'][0] in valid_gids:
+            pass
+        elif gid_index is not None:
+            found = gid_index.get(entry_attrs['gidnumber'][0], 0)
+            if found == 1:
+                valid_gids.add(entry_attrs['gidnumber'][0])
+            elif found == 0:
+                logger.warning('GID number %s of migrated user %s does not '
+                               'point to a known group.',
+                               entry_attrs['gidnumber'][0], pkey)
+                invalid_gids.add(entry_attrs['gidnumber'][0])
+            else:
+                # GID number matched more groups, this should not happen
+                logger.warning('GID number %s of migrated user %s should '
+                               'match 1 group, but it matched %d groups',
+                               entry_attrs['gidnumber'][0], pkey, found)
+        else:
             try:
                 remote_entry = ds_ldap.find_entry_by_attr(
                     'gidnumber', entry_attrs['gidnumber'][0], 'posixgroup',
@@ -304,6 +333,32 @@ def _pre_migrate_user(ldap, pkey, dn, entry_attrs, failed, config, ctx, **kwargs
     return dn
 
 
+def _get_gid_index(ds_ldap, search_base):
+    """
+    Count the groups on the remote server for every GID number.
+
+    The index is read with a single paged search so that the users being
+    migrated don't need a remote search each. None is returned when the
+    search is limited by the server, the GID numbers are then looked up
+    one by one.
+    """
+    gid_index = collections.Counter()
+    try:
+        for entry in ds_ldap.iter_entries(
+                '(&(objectclass=posixgroup)(gidnumber=*))', ['gidnumber'],
+                search_base, time_limit=0, size_limit=-1):
+            gid_index.update(set(entry.get('gidnumber', [])))
+    except errors.NotFound:
+        pass
+    except errors.LimitsExceeded:
+        logger.warning('Search limit exceeded reading GID numbers of groups, '
+                       'looking them up individually')
+        return None
+    logger.debug('%d GID numbers of groups read from %s',
+                 len(gid_index), search_base)
+    return gid_index
+
+
 def _post_migrate_user(ldap, pkey, dn, entry_attrs, failed, config, ctx):
     assert isinstance(dn, DN)
 
@@ -466,6 +521,11 @@ def _group_exc_callback(ldap, dn, entry_attrs, exc, options):
 
 # DS MIGRATION PLUGIN
 
+def _rate(count, duration):
+    seconds = duration.total_seconds()
+    return count / seconds if seconds > 0 else 0.0
+
+
 def construct_filter(template, oc_list):
     oc_subfilter = ''.join([ '(objectclass=%s)' % oc for oc in oc_list])
     return template % oc_subfilter
@@ -624,6 +684,12 @@ class migrate_ds(Command):
             label=_('Base DN'),
             doc=_('Base DN on remote LDAP server'),
         ),
+        Flag('resume?',
+            label=_('Resume'),
+            doc=_('Skip users and groups already present in IPA, e.g. to '
+                  'resume an interrupted migration'),
+            default=False,
+        ),
         Flag('compat?',
             cli_name='with_compat',
             label=_('Ignore compat plugin'),
@@ -732,9 +798,101 @@ migration process might be incomplete\n''')
             search_bases[ldap_obj_name] = search_base
         return search_bases
 
+    def _get_existing_pkeys(self, ldap, ldap_obj):
+        """
+        Get primary keys of the objects already present in IPA.
+
+        Used to skip the objects migrated by an earlier, interrupted run
+        without any further processing.
+        """
+        pkey_name = ldap_obj.primary_key.name
+        pkeys = set()
+        try:
+            for entry in ldap.iter_entries(
+                    '(%s=*)' % pkey_name, [pkey_name],
+                    DN(ldap_obj.container_dn, api.env.basedn),
+                    ldap.SCOPE_ONELEVEL, time_limit=-1, size_limit=-1):
+                pkeys.update(v.lower() for v in entry.get(pkey_name, []))
+        except errors.NotFound:
+            pass
+        return pkeys
+
+    def _iter_remote_entries(self, ds_ldap, ldap_obj_name, search_filter,
+                             search_base, scope, stats):
+        """
+        Read objects to be migrated from DS using paged search.
+        """
+        try:
+            for entry_attrs in ds_ldap.iter_entries(
+                    search_filter, ['*'], search_base, scope,
+                    time_limit=0, size_limit=-1):
+                stats['read'] += 1
+                yield entry_attrs
+        except errors.NotFound:
+            pass
+        except errors.LimitsExceeded:
+            logger.error('%s: %s', ldap_obj_name, self.truncated_err_msg)
+
+    def _prepare_entries(self, ldap, config, ldap_obj_name, entries, exclude,
+                         existing, failed, context, pkeys, stats, **kwargs):
+        """
+        Convert DS entries to IPA entries ready to be added.
+
+        The primary key of every yielded entry is stored in pkeys under
+        the id() of the entry. Several remote entries may map to the same
+        DN, the DN cannot be used as the key.
+        """
+        ldap_obj = self.api.Object[ldap_obj_name]
+        callback = self.migrate_objects[ldap_obj_name]['pre_callback']
+
+        for entry_attrs in entries:
+            ava = entry_attrs.dn[0][0]
+            if ava.attr == ldap_obj.primary_key.name:
+                # In case if pkey attribute is in the migrated object DN
+                # and the original LDAP is multivalued, make sure that
+                # we pick the correct value (the unique one stored in DN)
+                pkey = ava.value.lower()
+            else:
+                pkey = entry_attrs[ldap_obj.primary_key.name][0].lower()
+
+            if pkey in exclude:
+                continue
+
+            if pkey in existing:
+                stats['skipped'] += 1
+                continue
+
+            entry_attrs.dn = ldap_obj.get_dn(pkey)
+            entry_attrs['objectclass'] = list(
+                set(
+                    config.get(
+                        ldap_obj.object_class_config, ldap_obj.object_class
+                    ) + [o.lower() for o in entry_attrs['objectclass']]
+                )
+            )
+            entry_attrs[ldap_obj.primary_key.name][0] = entry_attrs[ldap_obj.primary_key.name][0].lower()
+
+            if callable(callback):
+                try:
+                    entry_attrs.dn = callback(
+                        ldap, pkey, entry_attrs.dn, entry_attrs,
+                        failed, config, context, **kwargs
+                    )
+                    if not entry_attrs.dn:
+                        continue
+                except errors.NotFound as e:
+                    failed[pkey] = unicode(e.reason)
+                    continue
+
+            pkeys[id(entry_attrs)] = pkey
+            yield entry_attrs
+
     def migrate(self, ldap, config, ds_ldap, ds_base_dn, options):
         """
         Migrate objects from DS to LDAP.
+
+        Objects are read from DS page by page and added to IPA with up to
+        _add_window add operations in flight.
         """
         assert isinstance(ds_base_dn, DN)
         migrated = {} # {'OBJ': ['PKEY1', 'PKEY2', ...], ...}
@@ -746,6 +904,7 @@ migration process might be incomplete\n''')
 
         for ldap_obj_name in self.migrate_order:
             ldap_obj = self.api.Object[ldap_obj_name]
+            obj_start = datetime.datetime.now()
 
             template = self.migrate_objects[ldap_obj_name]['filter_template']
             oc_list = options[to_cli(self.migrate_objects[ldap_obj_name]['oc_option'])]
@@ -757,31 +916,6 @@ migration process might be incomplete\n''')
             migrated[ldap_obj_name] = []
             failed[ldap_obj_name] = {}
 
-            try:
-                entries, truncated = ds_ldap.find_entries(
-                    search_filter, ['*'], search_bases[ldap_obj_name],
-                    scope,
-                    time_limit=0, size_limit=-1
-                )
-            except errors.NotFound:
-                if not options.get('continue',False):
-                    raise errors.NotFound(
-                        reason=_('%(container)s LDAP search did not return any result '
-                                 '(search base: %(search_base)s, '
-                                 'objectclass: %(objectclass)s)')
-                                 % {'container': ldap_obj_name,
-                                    'search_base': search_bases[ldap_obj_name],
-                                    'objectclass': ', '.join(oc_list)}
-                    )
-                else:
-                    truncated = False
-                    entries = []
-            if truncated:
-                logger.error(
-                    '%s: %s',
-                    ldap_obj.name, self.truncated_err_msg
-                )
-
             blocklists = {}
             for blocklist in ('oc_blocklist', 'attr_blocklist'):
                 blocklist_option = (
@@ -806,57 +940,41 @@ migration process might be incomplete\n''')
 
             context['has_upg'] = ldap.has_upg()
 
-            valid_gids = set()
-            invalid_gids = set()
+            if ldap_obj_name == 'user':
+                # Read before the users are, some servers allow only one
+                # paged search per connection at a time.
+                context['gid_index'] = _get_gid_index(
+                    ds_ldap, search_bases['group'])
+
+            existing = set()
+            if options.get('resume'):
+                existing = self._get_existing_pkeys(ldap, ldap_obj)
+                logger.info('%d %ss already present in IPA',
+                            len(existing), ldap_obj_name)
+
+            stats = collections.Counter()
+            pkeys = {}
+            entries = self._iter_remote_entries(
+                ds_ldap, ldap_obj_name, search_filter,
+                search_bases[ldap_obj_name], scope, stats
+            )
+            entries = self._prepare_entries(
+                ldap, config, ldap_obj_name, entries, exclude, existing,
+                failed[ldap_obj_name], context, pkeys, stats,
+                schema=options['schema'],
+                search_bases=search_bases,
+                valid_gids=set(),
+                invalid_gids=set(),
+                **blocklists
+            )
+
             migrate_cnt = 0
             context['migrate_cnt'] = 0
-            for entry_attrs in entries:
+            for entry_attrs, e in ldap.add_entries(entries, _add_window):
                 context['migrate_cnt'] = migrate_cnt
-                s = datetime.datetime.now()
-
-                ava = entry_attrs.dn[0][0]
-                if ava.attr == ldap_obj.primary_key.name:
-                    # In case if pkey attribute is in the migrated object DN
-                    # and the original LDAP is multivalued, make sure that
-                    # we pick the correct value (the unique one stored in DN)
-                    pkey = ava.value.lower()
-                else:
-                    pkey = entry_attrs[ldap_obj.primary_key.name][0].lower()
-
-                if pkey in exclude:
-                    continue
-
-                entry_attrs.dn = ldap_obj.get_dn(pkey)
-                entry_attrs['objectclass'] = list(
-                    set(
-                        config.get(
-                            ldap_obj.object_class_config, ldap_obj.object_class
-                        ) + [o.lower() for o in entry_attrs['objectclass']]
-                    )
-                )
-                entry_attrs[ldap_obj.primary_key.name][0] = entry_attrs[ldap_obj.primary_key.name][0].lower()
-
-                callback = self.migrate_objects[ldap_obj_name]['pre_callback']
-                if callable(callback):
-                    try:
-                        entry_attrs.dn = callback(
-                            ldap, pkey, entry_attrs.dn, entry_attrs,
-                            failed[ldap_obj_name], config, context,
-                            schema=options['schema'],
-                            search_bases=search_bases,
-                            valid_gids=valid_gids,
-                            invalid_gids=invalid_gids,
-                            **blocklists
-                        )
-                        if not entry_attrs.dn:
-                            continue
-                    except errors.NotFound as e:
-                        failed[ldap_obj_name][pkey] = unicode(e.reason)
-                        continue
+                pkey = pkeys.pop(id(entry_attrs))
 
-                try:
-                    ldap.add_entry(entry_attrs)
-                except errors.ExecutionError as e:
+                if e is not None:
                     callback = self.migrate_objects[ldap_obj_name]['exc_callback']
                     if callable(callback):
                         try:
@@ -877,14 +995,32 @@ migration process might be incomplete\n''')
                         ldap, pkey, entry_attrs.dn, entry_attrs,
                         failed[ldap_obj_name], config, context)
                 e = datetime.datetime.now()
-                d = e - s
                 total_dur = e - migration_start
                 migrate_cnt += 1
                 if migrate_cnt > 0 and migrate_cnt % 100 == 0:
-                    logger.info("%d %ss migrated. %s elapsed.",
-                                migrate_cnt, ldap_obj_name, total_dur)
-                logger.debug("%d %ss migrated, duration: %s (total %s)",
-                             migrate_cnt, ldap_obj_name, d, total_dur)
+                    logger.info("%d %ss migrated. %s elapsed, %.1f %ss/s.",
+                                migrate_cnt, ldap_obj_name, total_dur,
+                                _rate(migrate_cnt, e - obj_start),
+                                ldap_obj_name)
+                logger.debug("%d %ss migrated (total %s)",
+                             migrate_cnt, ldap_obj_name, total_dur)
+
+            if not stats['read'] and not options.get('continue', False):
+                raise errors.NotFound(
+                    reason=_('%(container)s LDAP search did not return any result '
+                             '(search base: %(search_base)s, '
+                             'objectclass: %(objectclass)s)')
+                             % {'container': ldap_obj_name,
+                                'search_base': search_bases[ldap_obj_name],
+                                'objectclass': ', '.join(oc_list)}
+                )
+
+            obj_dur = datetime.datetime.now() - obj_start
+            logger.info("%ss: %d read, %d migrated, %d failed, %d skipped "
+                        "as already present. Duration %s, %.1f %ss/s.",
+                        ldap_obj_name, stats['read'], migrate_cnt,
+                        len(failed[ldap_obj_name]), stats['skipped'],
+                        obj_dur, _rate(migrate_cnt, obj_dur), ldap_obj_name)
 
         if 'def_group_dn' in context:
             _update_default_group(ldap, context, True)
@@ -4,7 +4,11 @@
 
 import importlib
 import itertools
+import logging
+import os
 import sys
+import tempfile
+import zlib
 
 import six
 import hashlib
@@ -17,8 +21,11 @@ from ipalib.output import Entry, ListOfEntries, ListOfPrimaryKeys, PrimaryKey
 from ipalib.parameters import Bool, Dict, Flag, Str
 from ipalib.plugable import Registry
 from ipalib.request import context
+from ipalib.rpc import json_decode_binary, json_encode_binary
 from ipalib.text import _
-from ipapython.version import API_VERSION
+from ipaplatform.paths import paths
+from ipapython import ipautil
+from ipapython.version import API_VERSION, VENDOR_VERSION, VERSION
 
 
 __doc__ = _("""
@@ -38,6 +45,8 @@ EXAMPLES:
 if six.PY3:
     unicode = str
 
+logger = logging.getLogger(__name__)
+
 register = Registry()
 
 
@@ -843,23 +852,103 @@ class schema(Command):
 
         return schema
 
-    def execute(self, *args, **kwargs):
-        langs = "".join(getattr(context, "languages", []))
+    def _get_plugin_files(self):
+        """Name, modification time and size of the files of all plugins"""
+        modules = {
+            type(plugin).__module__
+            for plugin in itertools.chain(self.api.Command(),
+                                          self.api.Object())
+        }
+        for name in sorted(modules):
+            filename = getattr(sys.modules.get(name), '__file__', None)
+            if filename is None:
+                continue
+            try:
+                st = os.stat(filename)
+            except OSError:
+                continue
+            yield '%s:%d:%d' % (filename, st.st_mtime_ns, st.st_size)
+
+    def _get_cache_filename(self, langs):
+        # the schema depends on the installed version, set of loaded plugins
+        # and the language of the request. The plugin files are part of the
+        # key as well, downstream updates may change params and docs without
+        # changing the version.
+        key = '\0'.join(
+            [VERSION, VENDOR_VERSION, API_VERSION, self.api.env.context,
+             langs] +
+            sorted(cmd.full_name for cmd in self.api.Command()) +
+            list(self._get_plugin_files())
+        )
+        return os.path.join(
+            paths.IPA_SCHEMA_CACHE_DIR,
+            hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    def _read_cache(self, filename):
+        try:
+            with open(filename, 'rb') as f:
+                fingerprint, _newline, blob = f.read().partition(b'\n')
+        except EnvironmentError:
+            return None
+        if not fingerprint or not blob:
+            return None
+        return fingerprint.decode('utf-8'), blob
 
+    def _write_cache(self, filename, fingerprint, blob):
+        try:
+            with tempfile.NamedTemporaryFile(
+                    'wb', dir=os.path.dirname(filename), delete=False) as f:
+                try:
+                    f.write(fingerprint.encode('utf-8') + b'\n' + blob)
+                    ipautil.flush_sync(f)
+                except Exception:
+                    os.unlink(f.name)
+                    raise
+            os.rename(f.name, filename)
+        except EnvironmentError as e:
+            logger.debug("Failed to write schema cache %s: %s", filename, e)
+
+    def get_serialized_schema(self, langs=u'', **kwargs):
+        """
+        :return: (fingerprint, schema serialized to JSON and compressed)
+
+        The serialized schema is generated only once per process and
+        language. It is shared with other server processes through files in
+        IPA_SCHEMA_CACHE_DIR, so usually only the first process after a
+        restart or upgrade has to generate it.
+        """
         if getattr(self.api, "_schema", None) is None:
             object.__setattr__(self.api, "_schema", {})
 
-        schema = self.api._schema.get(langs)
-        if schema is None:
-            schema = self._generate_schema(**kwargs)
-            self.api._schema[langs] = schema
+        cached = self.api._schema.get(langs)
+        if cached is None:
+            filename = self._get_cache_filename(langs)
+            cached = self._read_cache(filename)
+            if cached is None:
+                schema = self._generate_schema(**kwargs)
+                blob = zlib.compress(
+                    json_encode_binary(schema, API_VERSION).encode('utf-8'))
+                cached = (schema['fingerprint'], blob)
+                self._write_cache(filename, *cached)
+            self.api._schema[langs] = cached
 
-        schema['ttl'] = self.api.env.schema_ttl
+        return cached
 
-        if schema['fingerprint'] in kwargs.get('known_fingerprints', []):
+    def execute(self, *args, **kwargs):
+        langs = "".join(getattr(context, "languages", []))
+
+        fingerprint, blob = self.get_serialized_schema(langs, **kwargs)
+        ttl = self.api.env.schema_ttl
+
+        # the fingerprint is an entity tag of the schema, clients which
+        # already have it are answered without decoding the schema
+        if fingerprint in kwargs.get('known_fingerprints', []):
             raise errors.SchemaUpToDate(
-                fingerprint=schema['fingerprint'],
-                ttl=schema['ttl'],
+                fingerprint=fingerprint,
+                ttl=ttl,
             )
 
+        schema = json_decode_binary(zlib.decompress(blob))
+        schema['ttl'] = ttl
+
         return dict(result=schema)
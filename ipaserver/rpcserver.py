@@ -55,7 +55,8 @@ from ipalib.errors import (
     UserLocked)
 from ipalib.request import context, destroy_context
 from ipalib.rpc import (xml_dumps, xml_loads,
-    json_encode_binary, json_decode_binary)
+    json_encode_binary, json_decode_binary, json_encode_stream,
+    JSON_STREAM_CONTENT_TYPE)
 from ipapython.dn import DN
 from ipaserver.plugins.ldap2 import ldap2
 from ipalib.backend import Backend
@@ -341,6 +342,7 @@ class WSGIExecutioner(Executioner):
 
     headers = None
     content_type = None
+    stream_content_type = None
     key = ''
 
     _system_commands = {}
@@ -478,15 +480,21 @@ class WSGIExecutioner(Executioner):
         try:
             status = HTTP_STATUS_SUCCESS
             response = self.wsgi_execute(environ)
-            if self.headers:
+            if isinstance(response, bytes):
+                content_type = self.content_type
+                response = [response]
+            else:
+                # marshal() returned an iterable of chunks
+                content_type = self.stream_content_type
+            if self.headers and content_type == self.content_type:
                 headers = self.headers
             else:
                 headers = [('Content-Type',
-                            self.content_type + '; charset=utf-8')]
+                            content_type + '; charset=utf-8')]
         except Exception:
             logger.exception('WSGI %s.__call__():', self.name)
             status = HTTP_STATUS_SERVER_ERROR
-            response = status.encode('utf-8')
+            response = [status.encode('utf-8')]
             headers = [('Content-Type', 'text/plain; charset=utf-8')]
 
         logout_cookie = getattr(context, 'logout_cookie', None)
@@ -494,7 +502,7 @@ class WSGIExecutioner(Executioner):
             headers.append(('IPASESSION', logout_cookie))
 
         start_response(status, headers)
-        return [response]
+        return response
 
     def unmarshal(self, data):
         raise NotImplementedError('%s.unmarshal()' % type(self).__name__)
@@ -514,6 +522,7 @@ class jsonserver(WSGIExecutioner, HTTP_Status):
     """
 
     content_type = 'application/json'
+    stream_content_type = JSON_STREAM_CONTENT_TYPE
 
     def __call__(self, environ, start_response):
         '''
@@ -521,7 +530,15 @@ class jsonserver(WSGIExecutioner, HTTP_Status):
 
         logger.debug('WSGI jsonserver.__call__:')
 
-        response = super(jsonserver, self).__call__(environ, start_response)
+        # clients opt in to streamed responses
+        stream = JSON_STREAM_CONTENT_TYPE in environ.get('HTTP_ACCEPT', '')
+        setattr(context, 'json_stream', stream)
+        try:
+            response = super(jsonserver, self).__call__(
+                environ, start_response)
+        finally:
+            if hasattr(context, 'json_stream'):
+                delattr(context, 'json_stream')
         return response
 
     def marshal(self, result, error, _id=None,
@@ -542,6 +559,13 @@ class jsonserver(WSGIExecutioner, HTTP_Status):
             principal=unicode(principal),
             version=unicode(VERSION),
         )
+        if (
+            getattr(context, 'json_stream', False)
+            and isinstance(result, dict)
+            and isinstance(result.get('result'), list)
+        ):
+            # encode the entries while the body is being written
+            return json_encode_stream(response, version)
         dump = json_encode_binary(
             response, version, pretty_print=self.api.env.debug
         )
@@ -53,23 +53,43 @@ def create_topology_graph(masters, segments):
 
 def get_topology_connection_errors(graph):
     """
-    Traverse graph from each master and find out which masters are not
-    reachable.
+    Find out which masters are not reachable from each master.
+
+    Reachability is computed from the strongly connected components of the
+    graph, so the whole graph is traversed only once.
 
     :param graph: topology graph where vertices are masters
     :returns: list of errors, error is: (master, visited, not_visited)
     """
     connect_errors = []
-    master_cns = list(graph.vertices)
-    master_cns.sort()
-    for m in master_cns:
-        visited = graph.bfs(m)
+    reachable = graph.reachable_sets()
+    for m in sorted(graph.vertices):
+        visited = reachable[m]
         not_visited = graph.vertices - visited
         if not_visited:
             connect_errors.append((m, list(visited), list(not_visited)))
     return connect_errors
 
 
+def _get_partition_connection_errors(components):
+    """
+    :param components: list of sets of masters which can replicate with each
+        other but not with masters in other sets
+    :returns: list of errors in the format of get_topology_connection_errors
+    """
+    if len(components) < 2:
+        return []
+
+    vertices = set().union(*components)
+    connect_errors = []
+    for component in components:
+        not_visited = vertices - component
+        for m in component:
+            connect_errors.append((m, list(component), list(not_visited)))
+    connect_errors.sort(key=lambda error: error[0])
+    return connect_errors
+
+
 def map_masters_to_suffixes(masters):
     masters_to_suffix = {}
     managed_suffix_attr = 'iparepltopomanagedsuffix_topologysuffix'
@@ -136,29 +156,49 @@ class TopologyConnectivity:
         self.api = api_instance
 
         self.graphs = _create_topology_graphs(self.api)
+        self._errors = {}
+        self._articulation_points = {}
+
+    def _get_errors(self, suffix):
+        if suffix not in self._errors:
+            self._errors[suffix] = get_topology_connection_errors(
+                self.graphs[suffix])
+        return self._errors[suffix]
+
+    def _get_errors_after_removal(self, suffix, master_cn):
+        graph = self.graphs[suffix]
+        if master_cn not in graph.vertices:
+            return self._get_errors(suffix)
+
+        if not self._get_errors(suffix) and graph.is_symmetric():
+            # In a connected topology with bidirectional segments the
+            # removal of a master disconnects the topology only if it is an
+            # articulation point. These are found for all masters at once.
+            if suffix not in self._articulation_points:
+                self._articulation_points[suffix] = (
+                    graph.articulation_points())
+            if master_cn not in self._articulation_points[suffix]:
+                return []
+            return _get_partition_connection_errors(
+                graph.weakly_connected_components(removed=master_cn))
+
+        graph = deepcopy(graph)
+        graph.remove_vertex(master_cn)
+        return get_topology_connection_errors(graph)
 
     @property
     def errors(self):
         errors_by_suffix = {}
         for suffix in self.graphs:
-            errors_by_suffix[suffix] = get_topology_connection_errors(
-                self.graphs[suffix]
-            )
+            errors_by_suffix[suffix] = self._get_errors(suffix)
 
         return errors_by_suffix
 
     def errors_after_master_removal(self, master_cn):
-        graphs_before = deepcopy(self.graphs)
-
-        for s in self.graphs:
-            try:
-                self.graphs[s].remove_vertex(master_cn)
-            except ValueError:
-                pass
-
-        errors_after_removal = self.errors
-
-        self.graphs = graphs_before
+        errors_after_removal = {}
+        for suffix in self.graphs:
+            errors_after_removal[suffix] = self._get_errors_after_removal(
+                suffix, master_cn)
 
         return errors_after_removal
 
@@ -44,6 +44,18 @@ def populate_schema_cache(api=api):
             pass
 
 
+def populate_api_schema_cache(api=api):
+    """load or generate serialized API schema before serving requests
+
+    New clients fetch the schema on their first request, the serialized
+    schema is shared by all server processes.
+    """
+    try:
+        api.Command.schema.get_serialized_schema()
+    except Exception as e:
+        logger.error("Failed to pre-populate API schema cache: %s", e)
+
+
 def create_application():
     api.bootstrap(context="server", confdir=paths.ETC_IPA, log=None)
 
@@ -55,6 +67,7 @@ def create_application():
 
     # speed up first request to each worker by 200ms
     populate_schema_cache()
+    populate_api_schema_cache()
 
     # collect garbage and freeze all objects that are currently tracked by
     # cyclic garbage collector. We assume that vast majority of currently
@@ -22,6 +22,7 @@ Test the `ipaserver/install/ldapupdate.py` module.
 
 from __future__ import absolute_import
 
+import io
 import os
 
 import pytest
@@ -135,6 +136,26 @@ class TestUpdate:
         assert entry.single_value['uid'] == 'tuser'
         assert entry.single_value['cn'] == 'Test User'
 
+    def test_1_dry_run(self):
+        """
+        Test the updater in dry-run mode does not change anything
+        """
+        dry_run_output = io.StringIO()
+        updater = LDAPUpdate(dry_run=True, dry_run_output=dry_run_output)
+        update_file = os.path.join(self.testdir, "2_update.update")
+        modified = updater.update([update_file])
+        assert modified
+
+        out = dry_run_output.getvalue()
+        assert (
+            'dn: %s\nchangetype: modify\nreplace: gecos\n'
+            'gecos: Test User\n-' % self.user_dn
+        ) in out
+        assert [t[:3] for t in updater.timings] == [(update_file, 1, 1)]
+
+        entries = self.ld.get_entries(
+            self.user_dn, self.ld.SCOPE_BASE, 'objectclass=*', ['*'])
+        assert 'gecos' not in entries[0]
 
     def test_2_update(self):
         """
@@ -0,0 +1,95 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+import os
+
+import pytest
+
+import ipatests.util
+ipatests.util.check_ipaclient_unittests()  # noqa: E402
+
+from ipaclient.remote_plugins import schema
+
+
+def make_command(name):
+    return {
+        'name': name,
+        'version': '1',
+        'full_name': '{}/1'.format(name),
+        'doc': 'Command {}.\n\nLong description.'.format(name),
+        'topic_topic': 'topic0/1',
+        'params': [{'name': 'cn', 'type': 'str', 'required': True}],
+        'output': [{'name': 'result', 'type': 'dict'}],
+    }
+
+
+class FakeClient:
+    def __init__(self, num_commands):
+        self.num_commands = num_commands
+        self.forwarded = 0
+
+    def isconnected(self):
+        return True
+
+    def forward(self, name, **kwargs):
+        self.forwarded += 1
+        return {'result': {
+            'fingerprint': u'fingerprint',
+            'ttl': 3600,
+            'version': u'2.254',
+            'commands': [
+                make_command('command{}'.format(i))
+                for i in range(self.num_commands)
+            ],
+            'classes': [],
+            'topics': [{
+                'name': 'topic0',
+                'version': '1',
+                'full_name': 'topic0/1',
+                'doc': 'Topic 0',
+            }],
+        }}
+
+
+@pytest.fixture
+def schema_dir(tmpdir, monkeypatch):
+    schema_dir = os.path.join(str(tmpdir), 'schema')
+    monkeypatch.setattr(schema.Schema, '_DIR', schema_dir)
+    return schema_dir
+
+
+@pytest.mark.tier0
+class TestSchemaCache:
+    def test_lazy_read(self, schema_dir):
+        client = FakeClient(10)
+        schema.Schema(client)
+        assert os.path.exists(os.path.join(schema_dir, 'fingerprint'))
+
+        cached = schema.Schema(client, u'fingerprint', 3600)
+        assert client.forwarded == 1
+        commands = cached['commands']
+        assert sorted(commands) == sorted(
+            'command{}/1'.format(i) for i in range(10))
+        # nothing but the index has been decoded yet
+        assert all(
+            isinstance(v, tuple) for v in cached._dict['commands'].values())
+        assert commands.get_help('command3/1')['summary'] == 'Command command3.'
+
+        command = commands['command3/1']
+        assert command['params'][0]['name'] == 'cn'
+        decoded = [
+            k for k, v in cached._dict['commands'].items()
+            if not isinstance(v, tuple)
+        ]
+        assert decoded == ['command3/1']
+
+    def test_invalid_file(self, schema_dir):
+        os.makedirs(schema_dir)
+        with open(os.path.join(schema_dir, 'fingerprint'), 'wb') as f:
+            f.write(b'PK\x03\x04 old zip schema')
+        client = FakeClient(1)
+        cached = schema.Schema(client, u'fingerprint')
+        # the schema has been refetched
+        assert client.forwarded == 1
+        assert cached['commands']['command0/1']['name'] == 'command0'
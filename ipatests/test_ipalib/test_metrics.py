@@ -0,0 +1,62 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Test the `ipalib.metrics` module.
+"""
+
+import pytest
+
+from ipalib import metrics
+
+pytestmark = pytest.mark.tier0
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = metrics.Metrics()
+    monkeypatch.setattr(metrics, 'metrics', registry)
+    return registry
+
+
+def test_command_timer(registry):
+    metrics.count_operation('ldap_operations')
+    with metrics.CommandTimer('user_show') as timer:
+        metrics.count_operation('ldap_operations')
+        metrics.count_operation('ldap_cache_hits', 2)
+        timer.phase('execute')
+    [stats] = registry.stats()
+    assert stats['command'] == 'user_show'
+    assert stats['calls'] == 1
+    assert stats['errors'] == 0
+    assert stats['ldap_operations'] == 1
+    assert stats['ldap_cache_hits'] == 2
+    assert stats['dogtag_requests'] == 0
+    assert sum(stats['buckets']) == 1
+
+
+def test_nested_and_failed(registry):
+    with pytest.raises(ValueError):
+        with metrics.CommandTimer('batch'):
+            with metrics.CommandTimer('user_show'):
+                metrics.count_operation('ldap_operations')
+            metrics.count_operation('ldap_operations')
+            raise ValueError()
+    stats = {s['command']: s for s in registry.stats()}
+    assert stats['batch']['ldap_operations'] == 2
+    assert stats['batch']['errors'] == 1
+    assert stats['user_show']['ldap_operations'] == 1
+    assert stats['user_show']['errors'] == 0
+
+
+def test_percentile(registry):
+    for _i in range(99):
+        registry.record('ping', [('execute', 0.001)], 0.001, {})
+    registry.record('ping', [('execute', 20)], 20, {})
+    [stats] = registry.stats()
+    assert stats['calls'] == 100
+    assert stats['time_p95'] == 1.0
+    assert stats['time_max'] == 20000.0
+    assert stats['time_execute'] == pytest.approx(200.99)
+    assert stats['buckets'][-1] == 1
@@ -196,6 +196,40 @@ def test_xml_loads():
         assert type(e.faultString) is unicode
 
 
+def test_json_stream():
+    """
+    Test `ipalib.rpc.json_encode_stream` and `ipalib.rpc.JSONStreamParser`.
+    """
+    entries = [
+        dict(uid=(u'user%d' % i,), data=(binary_bytes,)) for i in range(100)
+    ]
+    response = dict(
+        result=dict(result=list(entries), count=100, truncated=False),
+        error=None, id=0, principal=u'admin@EXAMPLE.TEST', version=u'4.12',
+    )
+    expected = rpc.json_decode_binary(
+        rpc.json_encode_binary(response, API_VERSION))
+
+    chunks = list(rpc.json_encode_stream(response, API_VERSION, 1024))
+    assert len(chunks) > 1
+    # encoded entries are released
+    assert response['result']['result'] == [None] * 100
+
+    # feed the parser with pieces which do not end at line boundaries
+    data = b''.join(chunks)
+    parser = rpc.JSONStreamParser()
+    for i in range(0, len(data), 100):
+        parser.feed(data[i:i + 100])
+    parser.close()
+    assert_equal(parser.close(), expected)
+
+    # a truncated stream is detected
+    parser = rpc.JSONStreamParser()
+    parser.feed(data[:data.rindex(b'\n', 0, -1) + 1])
+    e = raises(errors.JSONError, parser.close)
+    assert 'received 99 of 100' in unicode(e.error)
+
+
 class test_xmlclient(PluginTester):
     """
     Test the `ipalib.rpc.xmlclient` plugin.
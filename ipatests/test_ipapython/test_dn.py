@@ -1,5 +1,7 @@
 
 import contextlib
+import pickle
+
 import pytest
 
 from cryptography import x509
@@ -1229,6 +1231,50 @@ class TestDN:
         assert dn3_a not in s
         assert dn3_b not in s
 
+    def test_normalized_cache(self):
+        base_dn = DN('cn=users,cn=accounts,dc=example,dc=com')
+        members = [
+            'uid=user%d,cn=users,cn=accounts,dc=example,dc=com' % i
+            for i in range(100)
+        ]
+        dns = [DN(member) for member in members]
+        upper = [DN(member.upper()) for member in members]
+
+        # parsed strings are shared, but every DN owns its list of RDNs
+        again = DN(members[0])
+        assert again.rdns == dns[0].rdns
+        assert again.rdns is not dns[0].rdns
+
+        assert dns == upper
+        assert {hash(dn) for dn in dns} == {hash(dn) for dn in upper}
+        assert len(set(dns) | set(upper)) == 100
+        assert all(dn.endswith(base_dn) for dn in upper)
+        assert not any(dn.endswith(DN('dc=example,dc=org')) for dn in dns)
+        assert sorted(upper) == sorted(dns)
+
+        # slices keep the normalized RDNs of the original DN
+        dn = dns[0]
+        assert dn[1:] == base_dn
+        assert hash(dn[1:]) == hash(base_dn)
+        assert dn[0:1] == DN(('UID', 'USER0'))
+
+    def test_pickle(self):
+        dn = DN('cn=a,dc=b')
+        hash(dn)
+        state = pickle.dumps(dn)
+        assert b'_hash' not in state
+        assert b'_rdn_keys' not in state
+
+        unpickled = pickle.loads(state)
+        assert unpickled == DN('cn=A,dc=B')
+        assert hash(unpickled) == hash(DN('cn=a,dc=b'))
+
+        # cached hash from a process with a different string hash seed
+        unpickled._hash = hash(dn) + 1
+        fresh = DN('cn=a,dc=b')
+        assert pickle.loads(pickle.dumps(unpickled)) == fresh
+        assert fresh in {pickle.loads(pickle.dumps(unpickled))}
+
     def test_x500_text(self):
         # null DN x500 ordering and LDAP ordering are the same
         nulldn = DN()
@@ -0,0 +1,131 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Test the pooled keep-alive connections of ipapython.dogtag
+"""
+
+import http.client
+import http.server
+import threading
+
+import pytest
+
+from ipalib import metrics
+from ipalib.errors import NetworkError
+from ipapython import dogtag
+
+
+class MockPKIHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = b'{"id": "0x1"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+@pytest.fixture
+def mock_pki():
+    server = http.server.ThreadingHTTPServer(
+        ('127.0.0.1', 0), MockPKIHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = dogtag.HTTPSConnectionPool(maxsize=2, idle_timeout=15)
+    monkeypatch.setattr(dogtag, 'connection_pool', pool)
+    yield pool
+    pool.clear()
+
+
+@pytest.mark.tier0
+class TestHTTPSConnectionPool:
+    def request(self, server, method='GET'):
+        host, port = server.server_address
+        return dogtag._pooled_httplib_request(
+            'http', host, port, '/ca/rest/certs/1',
+            http.client.HTTPConnection, None, ('mock', port),
+            method=method)
+
+    def drop_first_request(self, monkeypatch):
+        send_request = dogtag._send_request
+        dropped = []
+
+        def _send_request(conn, method, path, body, headers):
+            if not dropped:
+                dropped.append(method)
+                raise http.client.RemoteDisconnected('dropped')
+            return send_request(conn, method, path, body, headers)
+
+        monkeypatch.setattr(dogtag, '_send_request', _send_request)
+
+    def test_reuse(self, mock_pki, pool):
+        for _i in range(5):
+            status, _headers, body = self.request(mock_pki)
+            assert status == 200
+            assert body == b'{"id": "0x1"}'
+        stats = pool.stats()
+        assert stats['created'] == 1
+        assert stats['reused'] == 4
+        assert stats['idle'] == 1
+
+    def test_command_metrics(self, mock_pki, pool, monkeypatch):
+        registry = metrics.Metrics()
+        monkeypatch.setattr(metrics, 'metrics', registry)
+        with metrics.CommandTimer('cert_show'):
+            for _i in range(3):
+                self.request(mock_pki)
+        [stats] = registry.stats()
+        assert stats['dogtag_connections_created'] == 1
+        assert stats['dogtag_connections_reused'] == 2
+        assert stats['dogtag_connections_discarded'] == 0
+        assert stats['dogtag_retries'] == 0
+
+    def test_idle_timeout(self, mock_pki, pool):
+        pool.configure(idle_timeout=-1)
+        self.request(mock_pki)
+        self.request(mock_pki)
+        stats = pool.stats()
+        assert stats['created'] == 2
+        assert stats['reused'] == 0
+        assert stats['discarded'] == 1
+
+    def test_maxsize(self, pool):
+        conns = [http.client.HTTPConnection('localhost') for _i in range(3)]
+        for conn in conns:
+            pool.release('key', conn)
+        stats = pool.stats()
+        assert stats['idle'] == 2
+        assert stats['discarded'] == 1
+
+    def test_retry_idempotent(self, mock_pki, pool, monkeypatch):
+        self.request(mock_pki)
+        self.drop_first_request(monkeypatch)
+        status, _headers, _body = self.request(mock_pki)
+        assert status == 200
+        stats = pool.stats()
+        assert stats['retried'] == 1
+        assert stats['created'] == 2
+
+    def test_no_retry_post(self, mock_pki, pool, monkeypatch):
+        self.request(mock_pki)
+        self.drop_first_request(monkeypatch)
+        with pytest.raises(NetworkError):
+            self.request(mock_pki, method='POST')
+        stats = pool.stats()
+        assert stats['retried'] == 0
+        assert stats['created'] == 1
@@ -0,0 +1,138 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Test the `ipapython/graph.py` module.
+"""
+
+import random
+import time
+
+import pytest
+
+from ipapython.graph import Graph
+
+
+def make_graph(vertices, edges):
+    graph = Graph()
+    for vertex in vertices:
+        graph.add_vertex(vertex)
+    for tail, head in edges:
+        graph.add_edge(tail, head)
+    return graph
+
+
+def make_topology(num_sites, replicas_per_site, seed=0):
+    """
+    Synthetic replication topology: replicas of a site form a ring and
+    neighbouring sites are connected by a single bidirectional segment.
+    """
+    rnd = random.Random(seed)
+    vertices = [
+        'site%d-replica%d' % (site, replica)
+        for site in range(num_sites)
+        for replica in range(replicas_per_site)
+    ]
+    edges = []
+
+    def connect(left, right):
+        edges.append((left, right))
+        edges.append((right, left))
+
+    for site in range(num_sites):
+        replicas = vertices[site * replicas_per_site:
+                            (site + 1) * replicas_per_site]
+        for i, replica in enumerate(replicas[1:], 1):
+            connect(replicas[i - 1], replica)
+        if replicas_per_site > 2:
+            connect(replicas[-1], replicas[0])
+        if site:
+            connect(rnd.choice(replicas),
+                    vertices[rnd.randrange((site - 1) * replicas_per_site,
+                                           site * replicas_per_site)])
+    return make_graph(vertices, edges)
+
+
+def bfs_components_after_removal(graph, vertex):
+    remaining = set(graph.vertices) - {vertex}
+    components = []
+    while remaining:
+        start = remaining.pop()
+        component = {start}
+        queue = [start]
+        while queue:
+            v = queue.pop()
+            for tail, head in graph.edges:
+                for a, b in ((tail, head), (head, tail)):
+                    if a == v and b != vertex and b not in component:
+                        component.add(b)
+                        queue.append(b)
+        remaining -= component
+        components.append(frozenset(component))
+    return components
+
+
+@pytest.mark.tier0
+class TestGraph:
+    def test_tails_and_heads(self):
+        graph = make_graph('abc', [('a', 'b'), ('c', 'b'), ('b', 'a')])
+        assert graph.get_tails('b') == ['a', 'c']
+        assert graph.get_heads('b') == ['a']
+        graph.remove_edge('c', 'b')
+        assert graph.get_tails('b') == ['a']
+        graph.remove_vertex('a')
+        assert graph.get_tails('b') == []
+        assert graph.get_heads('b') == []
+        with pytest.raises(ValueError):
+            graph.remove_edge('c', 'b')
+
+    def test_strongly_connected_components(self):
+        graph = make_graph(
+            'abcde',
+            [('a', 'b'), ('b', 'a'), ('b', 'c'), ('c', 'd'), ('d', 'c'),
+             ('e', 'e')])
+        components = graph.strongly_connected_components()
+        assert sorted(sorted(c) for c in components) == [
+            ['a', 'b'], ['c', 'd'], ['e']]
+        # reverse topological order
+        assert components.index({'c', 'd'}) < components.index({'a', 'b'})
+
+    def test_reachable_sets(self):
+        graph = make_topology(4, 3)
+        graph.add_vertex('one-way')
+        graph.add_edge('one-way', 'site0-replica0')
+        reachable = graph.reachable_sets()
+        for vertex in graph.vertices:
+            assert reachable[vertex] == graph.bfs(vertex)
+
+    def test_articulation_points(self):
+        graph = make_topology(6, 4, seed=1)
+        points = graph.articulation_points()
+        assert points
+        for vertex in graph.vertices:
+            expected = bfs_components_after_removal(graph, vertex)
+            assert (vertex in points) == (len(expected) > 1)
+            assert sorted(map(sorted, expected)) == sorted(
+                map(sorted, graph.weakly_connected_components(vertex)))
+
+    def test_articulation_points_chain(self):
+        graph = make_graph('abc', [('a', 'b'), ('b', 'c')])
+        assert graph.articulation_points() == {'b'}
+        graph.add_edge('c', 'a')
+        assert graph.articulation_points() == set()
+
+    def test_scaling(self):
+        """
+        Analysis of a large synthetic topology finishes in linear time
+        """
+        timings = []
+        for num_sites in (100, 400):
+            graph = make_topology(num_sites, 5)
+            start = time.perf_counter()
+            graph.reachable_sets()
+            graph.articulation_points()
+            graph.weakly_connected_components()
+            timings.append(time.perf_counter() - start)
+        # 4 times bigger topology; allow generous slack for noisy machines
+        assert timings[1] < timings[0] * 16
@@ -7,6 +7,8 @@ Test the LDAPCache class.
 """
 # pylint: disable=no-member
 
+import ldap
+
 from ipalib import api, errors
 from ipapython import ipaldap
 from ipapython.dn import DN
@@ -143,3 +145,155 @@ class TestLDAPCache:
     def test_clear_cache(self):
         self.cache.clear_cache()
         hits_and_misses(self.cache, 0, 0)
+
+
+class TestSharedLDAPCache:
+
+    dn1 = DN('uid=one,cn=users,cn=accounts,dc=example,dc=test')
+    dn2 = DN('uid=two,cn=users,cn=accounts,dc=example,dc=test')
+
+    def test_identities(self):
+        cache = ipaldap.SharedLDAPCache()
+        entry = ipaldap.CacheEntry(attrs_list=['uid'])
+        cache.put('krb:alice@EXAMPLE.TEST', self.dn1, entry)
+
+        assert cache.get('krb:alice@EXAMPLE.TEST', self.dn1) is entry
+        assert cache.get('krb:bob@EXAMPLE.TEST', self.dn1) is None
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+
+    def test_invalidate(self):
+        cache = ipaldap.SharedLDAPCache()
+        cache.put('alice', self.dn1, ipaldap.CacheEntry())
+        cache.put('bob', self.dn1, ipaldap.CacheEntry())
+        cache.put('bob', self.dn2, ipaldap.CacheEntry())
+
+        cache.invalidate(self.dn1)
+        assert cache.get('alice', self.dn1) is None
+        assert cache.get('bob', self.dn1) is None
+        assert cache.get('bob', self.dn2) is not None
+        assert cache.stats()['invalidations'] == 2
+
+    def test_invalidate_all(self):
+        cache = ipaldap.SharedLDAPCache()
+        cache.put('alice', self.dn1, ipaldap.CacheEntry())
+        cache.put('bob', self.dn2, ipaldap.CacheEntry())
+
+        cache.invalidate_all()
+        assert cache.get('alice', self.dn1) is None
+        assert cache.get('bob', self.dn2) is None
+        assert cache.stats()['invalidations'] == 2
+
+    def test_side_effects(self, monkeypatch):
+        shared_cache = ipaldap.SharedLDAPCache()
+        conn = ipaldap.LDAPCache(
+            'ldap://ipa.example.test', no_schema=True,
+            shared_cache=shared_cache)
+        monkeypatch.setattr(
+            conn, 'has_dn_syntax', lambda attr: attr.lower() == 'member')
+        for method in ('update_entry', 'delete_entry', 'modify_s'):
+            monkeypatch.setattr(
+                ipaldap.LDAPClient, method, lambda *args: None)
+
+        def fill():
+            shared_cache.put('alice', self.dn1, ipaldap.CacheEntry())
+            shared_cache.put('alice', self.dn2, ipaldap.CacheEntry())
+
+        # other entries are not affected by a change of a plain attribute
+        fill()
+        entry = conn.make_entry(self.dn1, description=['old'])
+        entry.reset_modlist()
+        entry['description'] = ['new']
+        conn.update_entry(entry)
+        assert shared_cache.get('alice', self.dn1) is None
+        assert shared_cache.get('alice', self.dn2) is not None
+
+        # the memberOf plugin updates the members and their nested members
+        group_dn = DN('cn=group,cn=groups,cn=accounts,dc=example,dc=test')
+        fill()
+        conn.modify_s(group_dn, [(ldap.MOD_ADD, 'member', [b'uid=x'])])
+        assert shared_cache.get('alice', self.dn2) is None
+
+        # referential integrity removes the entry from groups
+        fill()
+        conn.delete_entry(self.dn1)
+        assert shared_cache.get('alice', self.dn2) is None
+        cache.put('alice', self.dn2, ipaldap.CacheEntry())
+
+        assert cache.get('alice', self.dn1) is None
+        assert cache.get('alice', self.dn2) is not None
+        assert cache.stats()['evictions'] == 1
+
+    def test_expiration(self):
+        cache = ipaldap.SharedLDAPCache(ttl=-1)
+        cache.put('alice', self.dn1, ipaldap.CacheEntry())
+
+        assert cache.get('alice', self.dn1) is None
+        stats = cache.stats()
+        assert stats['expirations'] == 1
+        assert stats['size'] == 0
+
+
+class FakeConnection:
+    def __init__(self, whoami='dn:uid=alice'):
+        self.whoami = whoami
+        self.unbound = False
+
+    def whoami_s(self):
+        return self.whoami
+
+    def unbind_s(self):
+        self.unbound = True
+
+
+class TestLDAPConnectionPool:
+
+    def test_identities(self):
+        pool = ipaldap.LDAPConnectionPool()
+        conn = FakeConnection()
+        pool.release('krb:alice@EXAMPLE.TEST', conn, float('inf'))
+
+        assert pool.acquire('krb:bob@EXAMPLE.TEST') is None
+        assert pool.acquire('krb:alice@EXAMPLE.TEST') == (
+            conn, float('inf'))
+        assert pool.acquire('krb:alice@EXAMPLE.TEST') is None
+        stats = pool.stats()
+        assert stats['reused'] == 1
+        assert stats['idle'] == 0
+        assert not conn.unbound
+
+    def test_expiration(self):
+        pool = ipaldap.LDAPConnectionPool(idle_timeout=-1)
+        conn = FakeConnection()
+        pool.release('alice', conn, float('inf'))
+        assert pool.acquire('alice') is None
+        assert conn.unbound
+
+        pool.configure(max_connections=10, idle_timeout=60)
+        conn = FakeConnection()
+        # credentials expired
+        pool.release('alice', conn, 0)
+        assert pool.acquire('alice') is None
+        assert conn.unbound
+        assert pool.stats()['expired'] == 2
+
+    def test_lru(self):
+        pool = ipaldap.LDAPConnectionPool(max_connections=1)
+        conn1, conn2 = FakeConnection(), FakeConnection()
+        pool.release('alice', conn1, float('inf'))
+        pool.release('bob', conn2, float('inf'))
+
+        assert conn1.unbound
+        assert pool.acquire('alice') is None
+        assert pool.acquire('bob')[0] is conn2
+        assert pool.stats()['evicted'] == 1
+
+    def test_broken(self):
+        pool = ipaldap.LDAPConnectionPool()
+        conn = FakeConnection(whoami='')
+        pool.release('alice', conn, float('inf'))
+
+        assert pool.acquire('alice') is None
+        assert conn.unbound
+        assert pool.stats()['broken'] == 1
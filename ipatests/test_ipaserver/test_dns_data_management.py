@@ -0,0 +1,186 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+"""
+Test the updates of IPA system records in `ipaserver/dns_data_management.py`.
+"""
+from dns import rrset, zone
+
+import pytest
+
+from ipalib import errors
+from ipapython.dn import DN
+from ipapython.dnsutil import DNSName
+from ipaserver import dns_data_management
+from ipaserver.dns_data_management import IPASystemRecords
+
+DOMAIN = DNSName(u'example.test.')
+ZONE_DN = DN(('idnsname', 'example.test.'), ('cn', 'dns'))
+CA_RECORD = DNSName(u'ipa-ca') + DOMAIN
+
+
+class FakeEntry(dict):
+    def __init__(self, name, **attrs):
+        super(FakeEntry, self).__init__(
+            (k, v if isinstance(v, list) else [v]) for k, v in attrs.items())
+        self['idnsname'] = [DNSName(name)]
+        self['objectclass'] = ['top', 'idnsrecord']
+        self.dn = DN(('idnsname', name), ZONE_DN)
+
+    @property
+    def single_value(self):
+        return {k: v[0] for k, v in self.items() if v}
+
+
+class FakeLDAP:
+    MATCH_ANY = '|'
+    SCOPE_ONELEVEL = 1
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def make_filter_from_attr(self, attr, values, rules):
+        return ''
+
+    def iter_entries(self, filter, attrs_list, base_dn, scope, **kwargs):
+        assert kwargs == dict(size_limit=-1, time_limit=-1)
+        return iter(self.entries)
+
+
+class FakeCommands:
+    def __init__(self, servers):
+        self.servers = servers
+        self.calls = []
+
+    def server_find(self, **kwargs):
+        return {'result': [
+            {'cn': [name], 'enabled_role_servrole': ['CA server']}
+            for name in self.servers
+        ]}
+
+    def location_find(self):
+        return {'result': []}
+
+    def dnszone_show(self, zone_name):
+        return {}
+
+    def dnsrecord_mod(self, zone_name, record_name, **options):
+        self.calls.append(('dnsrecord_mod', record_name))
+        if record_name == CA_RECORD:
+            raise errors.NotFound(reason=u'deleted')
+
+    def dnsrecord_add(self, zone_name, record_name, **options):
+        self.calls.append(('dnsrecord_add', record_name))
+
+    def dnsrecord_del(self, zone_name, record_name, **options):
+        self.calls.append(('dnsrecord_del', record_name))
+
+
+class FakeAPI:
+    def __init__(self, servers, entries):
+        self.env = type('env', (), dict(domain=u'example.test',
+                                        realm=u'EXAMPLE.TEST'))()
+        self.Backend = type('Backend', (), dict(ldap2=FakeLDAP(entries)))()
+        self.Object = type('Object', (), dict(dnszone=type(
+            'dnszone', (), dict(get_dn=staticmethod(lambda name: ZONE_DN)))()
+        ))()
+        self.Command = FakeCommands(servers)
+
+
+def resolve_rrsets_nss(hostname):
+    address = {
+        DNSName(u'ipa1.example.test.'): u'192.0.2.1',
+        DNSName(u'ipa2.example.test.'): u'192.0.2.2',
+    }[hostname]
+    return [rrset.from_text_list(hostname, 3600, 'IN', 'A', [address])]
+
+
+@pytest.fixture(autouse=True)
+def resolver(monkeypatch):
+    monkeypatch.setattr(
+        dns_data_management.installutils, 'resolve_rrsets_nss',
+        resolve_rrsets_nss)
+
+
+def ca_node(*addresses):
+    zone_obj = zone.Zone(DOMAIN, relativize=False)
+    rdataset = zone_obj.get_rdataset(CA_RECORD, 'A', create=True)
+    for address in addresses:
+        rdataset.add(rrset.from_text(CA_RECORD, 3600, 'IN', 'A', address)[0],
+                     ttl=3600)
+    return zone_obj[CA_RECORD]
+
+
+def records_changed(entry, node, set_cname_template=False,
+                    all_types=False):
+    records = IPASystemRecords(FakeAPI([], []))
+    # pylint: disable=protected-access
+    return records._IPASystemRecords__records_changed(
+        CA_RECORD, entry, node, set_cname_template, all_types)
+
+
+@pytest.mark.tier0
+class TestRecordsChanged:
+    def test_missing_entry(self):
+        assert records_changed(None, ca_node(u'192.0.2.1'))
+
+    def test_unchanged(self):
+        entry = FakeEntry(u'ipa-ca', arecord=u'192.0.2.1')
+        assert not records_changed(entry, ca_node(u'192.0.2.1'))
+
+    def test_records_differ(self):
+        entry = FakeEntry(u'ipa-ca', arecord=u'192.0.2.2')
+        assert records_changed(entry, ca_node(u'192.0.2.1'))
+
+    def test_ttl_ignored(self):
+        # the TTL of existing records is left alone
+        entry = FakeEntry(u'ipa-ca', arecord=u'192.0.2.1', dnsttl=300)
+        assert not records_changed(entry, ca_node(u'192.0.2.1'))
+
+    def test_other_types(self):
+        entry = FakeEntry(u'ipa-ca', arecord=u'192.0.2.1',
+                          aaaarecord=u'2001:db8::1')
+        assert not records_changed(entry, ca_node(u'192.0.2.1'))
+        assert records_changed(entry, ca_node(u'192.0.2.1'), all_types=True)
+
+    def test_cname_template(self):
+        entry = FakeEntry(u'ipa-ca', arecord=u'192.0.2.1')
+        assert records_changed(entry, ca_node(u'192.0.2.1'),
+                               set_cname_template=True)
+        entry['objectclass'].append('idnsTemplateObject')
+        entry['idnsTemplateAttribute;cnamerecord'] = [
+            u'ipa-ca.\\{substitutionvariable_ipalocation\\}._locations']
+        assert not records_changed(entry, ca_node(u'192.0.2.1'),
+                                   set_cname_template=True)
+
+
+@pytest.mark.tier0
+class TestCARecord:
+    def ca_calls(self, api):
+        return [call for call in api.Command.calls if call[1] == CA_RECORD]
+
+    def test_unchanged(self):
+        api = FakeAPI(
+            [u'ipa1.example.test'],
+            [FakeEntry(u'ipa-ca', arecord=u'192.0.2.1')])
+        IPASystemRecords(api).update_base_records()
+        assert self.ca_calls(api) == []
+
+    def test_rebuild(self):
+        # ipa2 is not a CA server anymore
+        api = FakeAPI(
+            [u'ipa1.example.test'],
+            [FakeEntry(u'ipa-ca', arecord=[u'192.0.2.1', u'192.0.2.2'])])
+        IPASystemRecords(api).update_base_records()
+        assert self.ca_calls(api) == [
+            ('dnsrecord_del', CA_RECORD),
+            ('dnsrecord_mod', CA_RECORD),
+            ('dnsrecord_add', CA_RECORD),
+        ]
+
+    def test_removal(self):
+        api = FakeAPI(
+            [],
+            [FakeEntry(u'ipa-ca', arecord=u'192.0.2.1')])
+        IPASystemRecords(api).update_base_records()
+        assert self.ca_calls(api) == [('dnsrecord_del', CA_RECORD)]
@@ -0,0 +1,139 @@
+#
+# Copyright (C) 2026  FreeIPA Contributors see COPYING for license
+#
+"""
+Test the DNS zone index of `ipaserver/plugins/dns.py`.
+"""
+import collections
+
+from ipalib import errors
+from ipalib.request import destroy_context
+from ipapython.dn import DN
+from ipapython.dnsutil import DNSName
+from ipapython.ipaldap import LDAPClient
+from ipaserver.plugins import dns
+from ipaserver.plugins.dns import DNSZoneIndex
+
+CONTAINER_DN = DN(('cn', 'dns'), ('dc', 'example'), ('dc', 'test'))
+
+
+class FakeEntry(dict):
+    def __init__(self, dn, **attrs):
+        super(FakeEntry, self).__init__(
+            (k, v if isinstance(v, list) else [v]) for k, v in attrs.items())
+        self.dn = dn
+        self.single_value = {k: v[0] for k, v in self.items()}
+
+
+def zone(name, objectclass='idnszone', active=True):
+    return FakeEntry(
+        DN(('idnsname', name), CONTAINER_DN),
+        objectclass=['top', objectclass],
+        idnsname=DNSName(name),
+        idnszoneactive=active)
+
+
+def record(zone_name, name):
+    return FakeEntry(
+        DN(('idnsname', name), ('idnsname', zone_name), CONTAINER_DN),
+        objectclass=['top', 'idnsrecord'],
+        idnsname=DNSName(name),
+        nsrecord='ns.%s' % zone_name)
+
+
+def test_dns_zone_index():
+    index = DNSZoneIndex([
+        zone(u'example.test.'),
+        zone(u'sub.example.test.'),
+        zone(u'inactive.example.test.', active=False),
+        zone(u'fw.example.test.', objectclass='idnsforwardzone'),
+        zone(u'a.fw.example.test.', objectclass='idnsforwardzone'),
+        record(u'example.test.', u'deleg'),
+        record(u'example.test.', u'b.deleg'),
+    ], 42)
+
+    assert index.usn == 42
+    assert index.get_auth_zone(DNSName(u'Host.Sub.Example.Test.')) == \
+        DNSName(u'sub.example.test.')
+    assert index.get_auth_zone(DNSName(u'x.inactive.example.test.')) == \
+        DNSName(u'example.test.')
+    assert index.get_auth_zone(DNSName(u'other.test.')) is None
+
+    example = DNSName(u'example.test.')
+    assert index.get_longest_match_ns_delegation(
+        example, DNSName(u'c.b.deleg')) == DNSName(u'b.deleg')
+    assert index.get_longest_match_ns_delegation(
+        example, DNSName(u'c.deleg')) == DNSName(u'deleg')
+    assert index.get_longest_match_ns_delegation(
+        example, DNSName(u'other')) is None
+
+    assert sorted(index.find_subtree_forward_zones(example)) == [
+        DNSName(u'fw.example.test.'), DNSName(u'a.fw.example.test.')]
+    assert index.find_subtree_forward_zones(
+        DNSName(u'fw.example.test.'), child_zones_only=True) == [
+        DNSName(u'a.fw.example.test.')]
+    assert index.find_subtree_forward_zones(
+        DNSName(u'other.test.')) == []
+
+
+class FakeLDAP:
+    SCOPE_BASE = 0
+    SCOPE_SUBTREE = 2
+    MATCH_ALL = '&'
+    MATCH_ANY = '|'
+    combine_filters = LDAPClient.combine_filters
+    make_filter_from_attr = LDAPClient.make_filter_from_attr
+
+    def __init__(self, usn):
+        self.usn = usn
+        self.modify_count = 0
+        self.searches = []
+
+    def get_cache_identity(self):
+        return 'admin'
+
+    def find_entries(self, filter, attrs_list, base_dn, scope, **kwargs):
+        self.searches.append(filter)
+        if scope == self.SCOPE_BASE:
+            return [{'lastusn': [str(self.usn)]}], False
+        raise errors.NotFound(reason='no changes')
+
+    def iter_entries(self, filter, attrs_list, base_dn, scope, **kwargs):
+        self.searches.append(filter)
+        return iter([
+            zone(u'example.test.'),
+            record(u'example.test.', u'deleg'),
+        ])
+
+
+def test_dns_zone_index_validation(monkeypatch):
+    ldap = FakeLDAP(10)
+    fake_api = type('api', (), {})()
+    fake_api.Backend = type('Backend', (), {'ldap2': ldap})()
+    fake_api.env = type('env', (), {
+        'container_dns': DN(('cn', 'dns')),
+        'basedn': DN(('dc', 'example'), ('dc', 'test'))})()
+    monkeypatch.setattr(dns, '_zone_index_cache', collections.OrderedDict())
+    # entries of the root DSE are plain dicts here
+    monkeypatch.setattr(dns, '_get_last_usn', lambda ldap: ldap.usn)
+
+    try:
+        index = dns.get_dns_zone_index(fake_api)
+        assert len(ldap.searches) == 1
+
+        # validated once per request
+        ldap.usn = 11
+        assert dns.get_dns_zone_index(fake_api) is index
+        assert len(ldap.searches) == 1
+
+        # and again after the request wrote to LDAP
+        ldap.modify_count += 1
+        assert dns.get_dns_zone_index(fake_api) is index
+        assert index.usn == 11
+        search_filter = ldap.searches[-1]
+        assert search_filter == (
+            '(|(&(entryusn>=11)(|(objectclass=idnszone)'
+            '(objectclass=idnsforwardzone)(nsrecord=*)(idnsname=deleg)))'
+            '(&(objectclass=nstombstone)(entryusn>=11)))')
+    finally:
+        destroy_context()
@@ -5,7 +5,12 @@
 Test the `ipaserver/dnssec` package.
 """
 import dns.name
+import pytest
 
+from ipalib import errors
+from ipapython.dn import DN
+from ipaserver.dnssec import ldapkeydb
+from ipaserver.dnssec.keysyncer import SyncScheduler
 from ipaserver.dnssec.odsmgr import ODSZoneListReader
 
 
@@ -39,3 +44,264 @@ def test_ods_zonelist_reader():
     assert reader.mapping == {uuid: name}
     assert reader.names == {name}
     assert reader.uuids == {uuid}
+
+
+def test_sync_scheduler():
+    now = [0.0]
+    scheduler = SyncScheduler(delay=2, max_delay=10, clock=lambda: now[0])
+    assert scheduler.timeout() is None
+
+    # a burst of events is coalesced into one sync of each kind
+    for _i in range(1000):
+        scheduler.event()
+        scheduler.request('bind')
+        scheduler.request('hsm_replica')
+    assert scheduler.timeout() == 2
+    now[0] = 1.5
+    assert scheduler.timeout() == 0.5
+    now[0] = 2
+    assert scheduler.timeout() == 0
+    assert scheduler.take() == ['hsm_replica', 'bind']
+    assert scheduler.timeout() is None
+    assert scheduler.events == 1000
+    assert scheduler.syncs == {'hsm_replica': 1, 'bind': 1}
+
+    # a steady stream of events does not postpone the syncs forever
+    start = now[0]
+    while scheduler.timeout() != 0:
+        scheduler.request('ods')
+        now[0] += 1
+    assert now[0] - start == 10
+
+
+KEYS_DN = DN(('cn', 'keys'), ('cn', 'sec'), ('cn', 'dns'),
+             ('dc', 'example'), ('dc', 'test'))
+
+# LDAP filters used before the key metadata was indexed
+REPLICA_PUBKEYS_WRAP_FILTER = (
+    '(&(objectClass=ipk11PublicKey)(ipk11Wrap=TRUE)'
+    '(objectClass=ipaPublicKeyObject))')
+MASTER_KEYS_FILTER = (
+    '(&(objectClass=ipk11SecretKey)'
+    '(|(ipk11UnWrap=TRUE)(!(ipk11UnWrap=*)))'
+    '(ipk11Label=dnssec-master))')
+ZONE_KEYPAIRS_FILTER = (
+    '(&(objectClass=ipk11PrivateKey)(objectClass=ipaPrivateKeyObject)'
+    '(objectClass=ipk11PublicKey)(objectClass=ipaPublicKeyObject))')
+
+
+class FakeEntry(dict):
+    """Case insensitive entry, scalar values are kept like in LDAPEntry"""
+    def __init__(self, uid, **attrs):
+        super(FakeEntry, self).__init__()
+        self.dn = DN(('ipk11UniqueId', uid), KEYS_DN)
+        for attr, value in attrs.items():
+            self[attr] = value if isinstance(value, list) else [value]
+
+    def __getitem__(self, attr):
+        return super(FakeEntry, self).__getitem__(attr.lower())
+
+    def __setitem__(self, attr, value):
+        super(FakeEntry, self).__setitem__(attr.lower(), value)
+
+    def __delitem__(self, attr):
+        super(FakeEntry, self).__delitem__(attr.lower())
+
+    def __contains__(self, attr):
+        return super(FakeEntry, self).__contains__(attr.lower())
+
+    def get(self, attr, default=None):
+        return super(FakeEntry, self).get(attr.lower(), default)
+
+    def setdefault(self, attr, default=None):
+        return super(FakeEntry, self).setdefault(attr.lower(), default)
+
+    @property
+    def single_value(self):
+        return {
+            attr: value[0] if isinstance(value, list) else value
+            for attr, value in self.items()
+        }
+
+
+class FakeLDAP:
+    def __init__(self, entries):
+        self.entries = entries
+        self.searches = 0
+        self.updated = []
+        self.deleted = []
+
+    def get_entries(self, base_dn, filter):
+        assert base_dn == KEYS_DN
+        self.searches += 1
+        if not self.entries:
+            raise errors.NotFound(reason='no keys')
+        return list(self.entries)
+
+    def update_entry(self, entry):
+        self.updated.append(entry.dn)
+
+    def delete_entry(self, entry):
+        self.deleted.append(entry.dn)
+
+
+def _parse_filter(filterstr, pos=0):
+    assert filterstr[pos] == '('
+    op = filterstr[pos + 1]
+    if op in '&|':
+        pos += 2
+        components = []
+        while filterstr[pos] == '(':
+            component, pos = _parse_filter(filterstr, pos)
+            components.append(component)
+        return (op, components), pos + 1
+    elif op == '!':
+        component, pos = _parse_filter(filterstr, pos + 2)
+        return (op, component), pos + 1
+    end = filterstr.index(')', pos)
+    attr, value = filterstr[pos + 1:end].split('=', 1)
+    return ('=', attr, value), end + 1
+
+
+def _filter_matches(entry, parsed):
+    if parsed[0] == '&':
+        return all(_filter_matches(entry, c) for c in parsed[1])
+    elif parsed[0] == '|':
+        return any(_filter_matches(entry, c) for c in parsed[1])
+    elif parsed[0] == '!':
+        return not _filter_matches(entry, parsed[1])
+    values = entry.get(parsed[1], [])
+    if parsed[2] == '*':
+        return bool(values)
+    return any(v.lower() == parsed[2].lower() for v in values)
+
+
+def ldap_filter_matches(entry, filterstr):
+    """Evaluate the simple LDAP filters above like the directory server"""
+    parsed, _pos = _parse_filter(filterstr)
+    return _filter_matches(entry, parsed)
+
+
+PUBKEY = ['ipk11Object', 'ipk11PublicKey', 'ipaPublicKeyObject']
+SECRETKEY = ['ipk11Object', 'ipk11SecretKey']
+KEYPAIR = ['ipk11Object', 'ipk11PrivateKey', 'ipaPrivateKeyObject',
+           'ipk11PublicKey', 'ipaPublicKeyObject']
+
+KEY_ENTRIES = [
+    dict(objectClass=PUBKEY, ipk11Wrap='TRUE'),
+    dict(objectClass=PUBKEY, ipk11Wrap='FALSE'),
+    dict(objectClass=PUBKEY),
+    dict(objectClass=['ipk11Object', 'ipk11PublicKey'], ipk11Wrap='TRUE'),
+    dict(objectClass=['IPK11OBJECT', 'IPK11PUBLICKEY', 'IPAPUBLICKEYOBJECT'],
+         ipk11Wrap='TRUE'),
+    dict(objectClass=SECRETKEY, ipk11UnWrap='TRUE',
+         ipk11Label='dnssec-master'),
+    dict(objectClass=SECRETKEY, ipk11UnWrap='FALSE',
+         ipk11Label='dnssec-master'),
+    dict(objectClass=SECRETKEY, ipk11Label='dnssec-master'),
+    dict(objectClass=SECRETKEY, ipk11UnWrap='TRUE', ipk11Label='other'),
+    dict(objectClass=SECRETKEY),
+    dict(objectClass=['ipk11Object', 'ipk11PublicKey'], ipk11UnWrap='TRUE',
+         ipk11Label='dnssec-master'),
+    dict(objectClass=KEYPAIR),
+    dict(objectClass=KEYPAIR, ipk11Wrap='TRUE'),
+    dict(objectClass=['ipk11Object', 'ipk11PrivateKey',
+                      'ipaPrivateKeyObject', 'ipk11PublicKey']),
+    dict(objectClass=['ipk11Object', 'ipk11PrivateKey',
+                      'ipaPrivateKeyObject']),
+    dict(objectClass=['ipk11Object']),
+]
+
+
+@pytest.mark.parametrize('attrs', KEY_ENTRIES)
+@pytest.mark.parametrize('predicate, filterstr', [
+    (ldapkeydb._is_replica_pubkey_wrap, REPLICA_PUBKEYS_WRAP_FILTER),
+    (ldapkeydb._is_master_key, MASTER_KEYS_FILTER),
+    (ldapkeydb._is_zone_keypair, ZONE_KEYPAIRS_FILTER),
+])
+def test_ldapkeydb_predicates(predicate, filterstr, attrs):
+    entry = FakeEntry('1', **attrs)
+    assert predicate(entry) == ldap_filter_matches(entry, filterstr)
+
+    # default values are added to the indexed entries when they are read
+    # as keys, they must not change the result
+    try:
+        default_attrs = ldapkeydb.get_default_attrs(entry['objectclass'])
+    except ValueError:
+        return
+    matches = predicate(entry)
+    for attr, attr_val in default_attrs.items():
+        entry.setdefault(attr, attr_val)
+    assert predicate(entry) == matches
+
+
+def key_entries():
+    return [
+        FakeEntry('master', objectClass=SECRETKEY, ipk11Id=b'\x01',
+                  ipk11Label='dnssec-master'),
+        FakeEntry('replica', objectClass=PUBKEY, ipk11Id=b'\x02',
+                  ipk11Label='dnssec-replica:ipa.example.test',
+                  ipk11Wrap='TRUE'),
+        FakeEntry('zone', objectClass=KEYPAIR, ipk11Id=b'\x03',
+                  ipk11Label='zone.example.test'),
+    ]
+
+
+def test_ldapkeydb_keys():
+    ldap = FakeLDAP(key_entries())
+    keydb = ldapkeydb.LdapKeyDB(ldap, KEYS_DN)
+
+    # the same index is used for all kinds of keys, default values added
+    # to the entries by one of them do not change the result of the others
+    for _i in range(2):
+        assert list(keydb.master_keys) == [b'\x01']
+        assert list(keydb.replica_pubkeys_wrap) == [b'\x02']
+        assert list(keydb.zone_keypairs) == [b'\x03']
+        keydb.flush()
+    assert ldap.searches == 1
+    assert ldap.updated == []
+    assert ldap.deleted == []
+
+
+def test_ldapkeydb_empty():
+    ldap = FakeLDAP([])
+    keydb = ldapkeydb.LdapKeyDB(ldap, KEYS_DN)
+
+    # empty results are cached as well
+    for _i in range(2):
+        assert keydb.master_keys == {}
+        assert keydb.replica_pubkeys_wrap == {}
+        assert keydb.zone_keypairs == {}
+        keydb.flush()
+    assert ldap.searches == 1
+
+    # keys are read again after the index was dropped by an import
+    ldap.entries = key_entries()
+    keydb._index = None
+    keydb.flush()
+    assert list(keydb.master_keys) == [b'\x01']
+    assert ldap.searches == 2
+
+
+def test_ldapkeydb_flush_modified():
+    ldap = FakeLDAP(key_entries())
+    keydb = ldapkeydb.LdapKeyDB(ldap, KEYS_DN)
+    master_key = keydb.master_keys[b'\x01']
+    replica_key = keydb.replica_pubkeys_wrap[b'\x02']
+    zone_key = keydb.zone_keypairs[b'\x03']
+    assert not master_key._modified
+    assert not replica_key._modified
+    assert not zone_key._modified
+
+    master_key['ipk11Extractable'] = False
+    replica_key.schedule_deletion()
+    keydb.flush()
+    assert ldap.updated == [master_key.entry.dn]
+    assert ldap.deleted == [DN(('ipk11UniqueId', 'replica'), KEYS_DN)]
+    assert not master_key._modified
+    assert keydb.replica_pubkeys_wrap == {}
+
+    # nothing is written again
+    keydb.flush()
+    assert len(ldap.updated) == 1
+    assert len(ldap.deleted) == 1
@@ -4,6 +4,7 @@
 from __future__ import absolute_import
 
 import binascii
+import io
 import os
 import psutil
 import re
@@ -153,6 +154,84 @@ def test_gpg_asymmetric(tempdir, gpgkey):
         assert f.read() == payload
 
 
+def test_backup_manifest(tempdir):
+    root = os.path.join(tempdir, 'root')
+    os.makedirs(os.path.join(root, 'excluded'))
+    for name in ('unchanged', 'changed', 'removed'):
+        with open(os.path.join(root, name), 'w') as f:
+            f.write(name)
+    os.symlink('unchanged', os.path.join(root, 'link'))
+
+    base = ipa_backup.create_manifest(
+        [root], exclude=[os.path.join(root, 'excluded')])
+    assert sorted(base) == [
+        root,
+        os.path.join(root, 'changed'),
+        os.path.join(root, 'link'),
+        os.path.join(root, 'removed'),
+        os.path.join(root, 'unchanged'),
+    ]
+    assert base[os.path.join(root, 'link')][5] == 'link:unchanged'
+
+    with open(os.path.join(root, 'changed'), 'w') as f:
+        f.write('different content')
+    os.unlink(os.path.join(root, 'removed'))
+
+    manifest = ipa_backup.create_manifest([root], previous=base)
+    # directories are always archived
+    assert ipa_backup.changed_files(manifest, base) == [
+        root,
+        os.path.join(root, 'changed'),
+        os.path.join(root, 'excluded'),
+    ]
+
+    filename = os.path.join(tempdir, ipa_backup.MANIFEST_NAME)
+    ipa_backup.write_manifest(filename, manifest, [root],
+                              base='ipa-full-base')
+    assert ipa_backup.read_manifest(filename) == (
+        manifest, [root], 'ipa-full-base')
+
+
+def test_restore_is_under_roots():
+    roots = {'/etc/ipa', '/var/log/'}
+    assert ipa_restore.is_under_roots('/etc/ipa', roots)
+    assert ipa_restore.is_under_roots('/etc/ipa/default.conf', roots)
+    assert ipa_restore.is_under_roots('/var/log/messages', roots)
+    assert not ipa_restore.is_under_roots('/etc/ipa.conf', roots)
+    assert not ipa_restore.is_under_roots('/etc/hosts', roots)
+    assert not ipa_restore.is_under_roots('/etc/ipa/default.conf', set())
+
+
+def test_remove_ruv(monkeypatch):
+    entry = (
+        b'dn: cn=entry%d,dc=example,dc=com\n'
+        b'objectClass: top\n'
+        b'nsUniqueId: %08x-22222222-33333333-44444444\n'
+        b'\n'
+    )
+    ruv = (
+        b'dn: nsuniqueid=ffffffff-ffffffff-ffffffff-ffffffff,'
+        b'dc=example,dc=com\n'
+        b'objectClass: top\n'
+        b'objectClass: nsTombstone\n'
+        b'nsUniqueId: ffffffff-ffffffff-ffffffff-ffffffff\n'
+        b'nsds50ruv: {replicageneration} 5f0e0f0a000000040000\n'
+        b'\n'
+    )
+    head = b''.join(entry % (i, i) for i in range(10))
+    tail = b''.join(entry % (i, i) for i in range(10, 20))
+    source = b'version: 1\n\n' + head + ruv + tail
+
+    # small chunks split records and the RUV between reads
+    monkeypatch.setattr(ipa_restore, 'LDIF_FILTER_CHUNK', 64)
+    out = io.BytesIO()
+    read = []
+    ipa_restore.remove_ruv(io.BytesIO(source), out, read.append)
+
+    assert out.getvalue() == b'version: 1\n\n' + head + tail
+    assert read[-1] == len(source)
+
+
 @pytest.mark.parametrize(
     "platform, expected",
     [
@@ -30,6 +30,7 @@ from __future__ import absolute_import
 import os
 import sys
 
+import ldap
 import pytest
 import six
 
@@ -37,6 +38,7 @@ from ipaplatform.paths import paths
 from ipaserver.plugins.ldap2 import ldap2, AUTOBIND_DISABLED
 from ipalib import api, create_api, errors
 from ipapython.dn import DN
+from ipapython.ipaldap import LDAPEntry
 
 if six.PY3:
     unicode = str
@@ -100,6 +102,56 @@ class test_ldap:
         cert = entry_attrs.get('usercertificate')[0]
         assert cert.serial_number is not None
 
+    def test_iter_entries(self):
+        """
+        Test that iter_entries yields the same entries as find_entries
+        """
+        self.conn = ldap2(api)
+        self.conn.connect(autobind=AUTOBIND_DISABLED)
+        base_dn = DN(api.env.container_accounts, api.env.basedn)
+        entries, _truncated = self.conn.find_entries(
+            '(objectclass=*)', ['cn'], base_dn, paged_search=True)
+        iterated = list(self.conn.iter_entries(
+            '(objectclass=*)', ['cn'], base_dn))
+        assert [e.dn for e in iterated] == [e.dn for e in entries]
+
+        # stopping the iteration early must not break the connection
+        it = self.conn.iter_entries('(objectclass=*)', ['cn'], base_dn)
+        next(it)
+        it.close()
+        assert self.conn.get_entry(base_dn, ['cn']).dn == base_dn
+
+        # empty result set does not raise
+        assert list(self.conn.iter_entries(
+            '(cn=doesnotexist)', ['cn'], base_dn)) == []
+
+    def test_add_entries(self):
+        """
+        Test that add_entries reports results in order and per entry
+        """
+        self.conn = ldap2(api)
+        self.conn.connect(autobind=AUTOBIND_DISABLED)
+        base_dn = DN(('cn', 'test-add-entries'), api.env.basedn)
+        dns = [base_dn] + [DN(('cn', 'c%d' % i), base_dn) for i in range(5)]
+        entries = [
+            self.conn.make_entry(dn, objectclass=['top', 'nsContainer'],
+                                 cn=[dn[0].value])
+            for dn in dns + [dns[1]]
+        ]
+        try:
+            results = list(self.conn.add_entries(entries, window=2))
+            assert [e.dn for e, _error in results] == dns + [dns[1]]
+            assert [error for _e, error in results[:-1]] == [None] * 6
+            assert isinstance(results[-1][1], errors.DuplicateEntry)
+            for dn in dns:
+                assert self.conn.get_entry(dn, ['cn']).dn == dn
+        finally:
+            for dn in reversed(dns):
+                try:
+                    self.conn.delete_entry(dn)
+                except errors.NotFound:
+                    pass
+
     def test_Backend(self):
         """
         Test using the ldap2 Backend directly (ala ipa-server-install)
@@ -321,6 +373,23 @@ class test_LDAPEntry:
         e.raw['test'].append(b'second')
         assert e['test'] == ['not list', u'second']
 
+    def test_search_result(self):
+        e = LDAPEntry._from_raw(
+            self.conn, self.dn1, {'cn': [b'test1'], 'sn': [b'a', b'b']})
+        c = e.copy()
+        assert e._nice == {'cn': None, 'sn': None}
+        assert e['CN'] == self.cn1
+        assert e._nice['sn'] is None
+        assert e.generate_modlist() == []
+
+        e['sn'].remove(u'a')
+        e.raw['commonName'].append(b'test2')
+        assert sorted(e.generate_modlist()) == [
+            (ldap.MOD_ADD, 'cn', [b'test2']),
+            (ldap.MOD_DELETE, 'sn', [b'a'])]
+        assert c.raw['sn'] == [b'a', b'b']
+        assert c.generate_modlist() == []
+
     def test_modlist_with_varying_encodings(self):
         """
         Test modlist is correct when only encoding of new value differs
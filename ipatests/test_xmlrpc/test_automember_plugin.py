@@ -477,6 +477,33 @@ class TestAutomemberRebuildGroupMembership(XMLRPC_test):
         group1.attrs.update(member_user=[user1.name])
         group1.retrieve()
 
+    def test_rebuild_membership_in_process(self, user1, automember_group,
+                                           group1):
+        """ Preview and rebuild automember membership for one user in the
+        server process. Check only the missing member is added. """
+        try:
+            set_automember_process_modify_ops(value=b'off')
+            group1.remove_member(dict(user=user1.name))
+        finally:
+            set_automember_process_modify_ops(value=b'on')
+
+        command = automember_group.make_rebuild_command(users=user1.name,
+                                                        dry_run=True)
+        result = command()
+        assert_deepequal({group1.cn: [user1.name]}, result['result'])
+        group1.retrieve()
+
+        command = automember_group.make_rebuild_command(users=user1.name,
+                                                        in_process=True)
+        result = command()
+        assert_deepequal({group1.cn: [user1.name]}, result['result'])
+        group1.attrs.update(member_user=[user1.name])
+        group1.retrieve()
+
+        # nothing is missing anymore
+        result = command()
+        assert_deepequal({}, result['result'])
+
     def test_delete_deps_for_rebuilding_groups(self, user1, manager1, group1,
                                                automember_group):
         """ Delete dependences for this class of tests in desired order """
@@ -21,6 +21,8 @@
 Test the `ipalib.plugins.baseldap` module.
 """
 
+import time
+
 import ldap
 
 from ipapython.dn import DN
@@ -223,3 +225,108 @@ def test_entry_to_dict():
     assert_deepequal(
         baseldap.entry_to_dict(entry, all=True, raw=True),
         the_dict)
+
+
+@pytest.mark.tier0
+def test_get_memberofindirect_batch():
+    """
+    Compare the queries and the values read by the per-entry and the batch
+    lookup of indirect memberships
+    """
+    basedn = DN('dc=example,dc=test')
+    users = [DN(('uid', 'user%d' % i), ('cn', 'users'), basedn)
+             for i in range(300)]
+    others = [DN(('uid', 'other%d' % i), ('cn', 'users'), basedn)
+              for i in range(3000)]
+    big = DN(('cn', 'big'), ('cn', 'groups'), basedn)
+    nested = DN(('cn', 'nested'), ('cn', 'groups'), basedn)
+    groups = {
+        big: {'member': users + others},
+        nested: {'member': [big], 'ipaowner': [users[0]]},
+    }
+
+    class FakeEntry:
+        def __init__(self, dn, **raw):
+            self.dn = dn
+            self.raw = raw
+
+    class FakeBackend:
+        make_filter = ipaldap.LDAPClient.make_filter
+        make_filter_from_attr = ipaldap.LDAPClient.make_filter_from_attr
+        combine_filters = ipaldap.LDAPClient.combine_filters
+        MATCH_ALL = ipaldap.LDAPClient.MATCH_ALL
+        MATCH_ANY = ipaldap.LDAPClient.MATCH_ANY
+
+        def __init__(self):
+            self.queries = 0
+            self.values = 0
+
+        def iter_entries(self, filter, attrs_list, base_dn, size_limit=None,
+                         matched_values=None):
+            # emulates the round trip of a subtree search
+            time.sleep(0.001)
+            self.queries += 1
+            for group_dn, attrs in groups.items():
+                if not any('(%s=%s)' % (attr, dn) in filter
+                           for attr, dns in attrs.items() for dn in dns):
+                    continue
+                raw = {}
+                for attr in attrs_list:
+                    values = [str(dn) for dn in attrs.get(attr, [])]
+                    if matched_values is not None:
+                        values = [v for v in values
+                                  if '(%s=%s)' % (attr, v) in matched_values]
+                    raw[attr] = [v.encode('utf-8') for v in values]
+                    self.values += len(values)
+                yield FakeEntry(group_dn, **raw)
+
+    class FakeObject:
+        indirect_members_chunk_size = 100
+        # pylint: disable=protected-access
+        _iter_entry_chunks = baseldap.LDAPObject._iter_entry_chunks
+        get_memberofindirect = baseldap.LDAPObject.get_memberofindirect
+        get_memberofindirect_batch = (
+            baseldap.LDAPObject.get_memberofindirect_batch)
+
+        def __init__(self):
+            self.backend = FakeBackend()
+            self.api = type('api', (), {})()
+            self.api.env = type('env', (), {'basedn': basedn})()
+
+    def make_entries():
+        return [
+            FakeEntry(dn, memberof=[str(big).encode('utf-8'),
+                                    str(nested).encode('utf-8')])
+            for dn in users
+        ]
+
+    single = FakeObject()
+    single_entries = make_entries()
+    start = time.time()
+    for entry in single_entries:
+        single.get_memberofindirect(entry)
+    single_time = time.time() - start
+
+    batch = FakeObject()
+    batch_entries = make_entries()
+    start = time.time()
+    batch.get_memberofindirect_batch(batch_entries)
+    batch_time = time.time() - start
+
+    for single_entry, batch_entry in zip(single_entries, batch_entries):
+        assert sorted(single_entry.raw['memberof']) == \
+            sorted(batch_entry.raw['memberof'])
+        assert sorted(single_entry.raw.get('memberofindirect', [])) == \
+            sorted(batch_entry.raw.get('memberofindirect', []))
+    # user0 is an owner of the nested group
+    assert 'memberofindirect' not in batch_entries[0].raw
+    assert batch_entries[1].raw['memberof'] == [str(big).encode('utf-8')]
+    assert batch_entries[1].raw['memberofindirect'] == [
+        str(nested).encode('utf-8')]
+
+    assert single.backend.queries == len(users)
+    assert batch.backend.queries == 3
+    # only the member values referencing the entries are transferred,
+    # not the 3300 members of the big group
+    assert batch.backend.values == len(users) + 1
+    assert batch_time < single_time
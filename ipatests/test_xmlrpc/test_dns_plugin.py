@@ -6477,3 +6477,89 @@ class test_dns_type_uri(test_dns):
             },
         ),
     ]
+
+
+@pytest.mark.tier1
+class test_dnszone_import(test_dns):
+    """Test importing resource records from a zone file."""
+
+    @pytest.fixture(autouse=True, scope="class")
+    def dnszone_import_setup(self, dns_setup):
+        try:
+            api.Command['dnszone_add'](zone1, idnssoarname=zone1_rname)
+        except errors.DuplicateEntry:
+            pass
+
+    cleanup_commands = [
+        ('dnszone_del', [zone1], {'continue': True}),
+    ]
+
+    zone_file = (
+        u'$TTL 3600\n'
+        u'@ IN SOA ns1 hostmaster 1 3600 900 1209600 3600\n'
+        u'@ IN MX 10 {name}\n'
+        u'{name} IN A 192.0.2.1\n'
+        u'{name} IN AAAA 2001:db8::1\n'
+        u'www IN CNAME {name}\n'
+    ).format(name=name1)
+
+    tests = [
+        dict(
+            desc='Import zone file into zone %r' % zone1,
+            command=('dnszone_import', [zone1], {'file': zone_file}),
+            expected={
+                'value': zone1_absolute_dnsname,
+                'summary': u'Imported 4 records of 3 names, 0 names failed',
+                'result': {'names': 3, 'records': 4},
+                'failed': {},
+            },
+        ),
+        dict(
+            desc='Retrieve imported record %r' % name1,
+            command=('dnsrecord_show', [zone1, name1_dnsname], {}),
+            expected={
+                'value': name1_dnsname,
+                'summary': None,
+                'result': {
+                    'dn': name1_dn,
+                    'idnsname': [name1_dnsname],
+                    'arecord': [u'192.0.2.1'],
+                    'aaaarecord': [u'2001:db8::1'],
+                },
+            },
+        ),
+        dict(
+            desc='Import the same zone file into zone %r again' % zone1,
+            command=('dnszone_import', [zone1], {'file': zone_file}),
+            expected={
+                'value': zone1_absolute_dnsname,
+                'summary': u'Imported 0 records of 0 names, 2 names failed',
+                'result': {'names': 0, 'records': 0},
+                'failed': {
+                    name1: u'This entry already exists',
+                    u'www': u'This entry already exists',
+                },
+            },
+        ),
+        dict(
+            desc='Try to import NS and MX records of the same name and a '
+                 'name outside of zone %r' % zone1,
+            command=('dnszone_import', [zone1],
+                     {'file': u'$TTL 3600\n'
+                              u'sub IN NS ns.sub\n'
+                              u'sub IN MX 10 mail\n'
+                              u'www.example.invalid. IN A 192.0.2.2\n'}),
+            expected={
+                'value': zone1_absolute_dnsname,
+                'summary': u'Imported 0 records of 0 names, 2 names failed',
+                'result': {'names': 0, 'records': 0},
+                'failed': {
+                    u'sub': u"invalid 'nsrecord': NS record is not allowed "
+                            u"to coexist with an MX record except when "
+                            u"located in a zone root record (RFC 2181, "
+                            u"section 6.1)",
+                    u'www.example.invalid.': u'name is outside of the zone',
+                },
+            },
+        ),
+    ]
@@ -200,6 +200,47 @@ class test_hbactest(XMLRPC_test):
                 nodetail=True
             )
 
+    def test_f_hbactest_bulk_check_rules(self):
+        """
+        Test 'ipa hbactest-bulk' (all enabled IPA rules, detailed output)
+        """
+        ret = api.Command['hbactest_bulk'](
+            user=[self.test_user],
+            targethost=[self.test_host],
+            service=[self.test_service],
+        )
+        assert ret['count'] == 1
+        result = ret['result'][0]
+        assert result['value']
+        for i in [0, 2]:
+            assert self.rule_names[i] in result['matched']
+        for i in [1, 3]:
+            assert self.rule_names[i] not in result['matched']
+
+    def test_f_hbactest_bulk_rule_index_invalidated(self):
+        """
+        Test that 'ipa hbactest-bulk' notices a modified rule
+        """
+        api.Command['hbacrule_disable'](self.rule_names[0])
+        try:
+            ret = api.Command['hbactest_bulk'](
+                user=[self.test_user],
+                targethost=[self.test_host],
+                service=[self.test_service],
+                rules=self.rule_names[:2],
+            )
+            assert ret['result'][0]['matched'] == sorted(self.rule_names[:2])
+
+            ret = api.Command['hbactest_bulk'](
+                user=[self.test_user],
+                targethost=[self.test_host],
+                service=[self.test_service],
+            )
+            assert self.rule_names[0] not in ret['result'][0].get(
+                'matched', [])
+        finally:
+            api.Command['hbacrule_enable'](self.rule_names[0])
+
     def test_g_hbactest_clear_testing_data(self):
         """
         Clear data for HBAC test plugin testing.
@@ -177,6 +177,13 @@ class TestSchemaCommand(XMLRPC_test):
         result = cmd_result["result"]
         assert result.keys() == self.expected_keys
 
+    def test_schema_cached_fp(self):
+        """Test schema command returns the same cached schema repeatedly"""
+        first = self.run_command("schema")["result"]
+        second = self.run_command("schema")["result"]
+        assert first["fingerprint"] == second["fingerprint"]
+        assert first == second
+
     def test_schema_too_many_args(self):
         """Test schema with too many args"""
         with pytest.raises(errors.ZeroArgumentError):